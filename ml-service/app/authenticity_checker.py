@@ -2,19 +2,31 @@
 Image authenticity verification using EXIF metadata and perceptual hashing
 """
 import piexif
-from PIL import Image
-import imagehash
 from datetime import datetime, timedelta
 
+from hamming_index import HammingIndex, load_hash_file
+from image_context import ImageContext
+
+# Near-duplicates of a known fake (re-encoded, resized, lightly cropped)
+# usually land within a few bits of its average_hash
+DEFAULT_FAKE_HASH_DISTANCE = 6
+
 class AuthenticityChecker:
-    def __init__(self):
-        self.known_fake_hashes = set()  # Store hashes of known fake images
+    def __init__(self, max_hash_distance=DEFAULT_FAKE_HASH_DISTANCE):
+        # Packed average_hash of known fake/stock images
+        self.known_fake_hashes = HammingIndex()
+        # Images within this many bits of a known fake are flagged (0 = exact match only)
+        self.max_hash_distance = max_hash_distance
     
-    def check_exif_metadata(self, image_path):
+    @property
+    def version(self):
+        """Changes whenever known fakes are added (they are never removed)"""
+        return len(self.known_fake_hashes)
+    
+    def check_exif_metadata(self, image):
         """Check EXIF metadata for GPS and timestamp"""
         try:
-            img = Image.open(image_path)
-            exif_dict = piexif.load(img.info.get('exif', b''))
+            exif_dict = ImageContext.coerce(image).exif
             
             has_gps = bool(exif_dict.get('GPS'))
             has_timestamp = bool(exif_dict.get('Exif', {}).get(piexif.ExifIFD.DateTimeOriginal))
@@ -26,29 +38,33 @@ class AuthenticityChecker:
                 return True, "Has partial metadata"
             else:
                 return False, "Missing GPS and timestamp metadata"
-                
+        
         except Exception as e:
             # No EXIF data or error reading
             return False, f"No EXIF data: {str(e)}"
     
-    def check_perceptual_hash(self, image_path):
+    def check_perceptual_hash(self, image):
         """Check if image hash matches known fake/stock images"""
         try:
-            img_hash = imagehash.average_hash(Image.open(image_path))
+            packed = ImageContext.coerce(image).packed_hash
             
             # Check against known fake hashes
-            if str(img_hash) in self.known_fake_hashes:
-                return False, "Matches known stock/fake image"
+            match = self.known_fake_hashes.nearest(packed, self.max_hash_distance)
+            if match is not None:
+                _, distance = match
+                if distance == 0:
+                    return False, "Matches known stock/fake image"
+                return False, f"Near-duplicate of known stock/fake image ({distance} bits apart)"
             
             return True, "Unique image hash"
-            
+        
         except Exception as e:
             return True, f"Could not check hash: {str(e)}"
     
-    def check_file_properties(self, image_path):
+    def check_file_properties(self, image):
         """Check basic file properties"""
         try:
-            img = Image.open(image_path)
+            img = ImageContext.coerce(image)
             
             # Check resolution (very low res might be downloaded thumbnail)
             width, height = img.size
@@ -60,30 +76,47 @@ class AuthenticityChecker:
                 return False, f"Unusual format: {img.format}"
             
             return True, "File properties acceptable"
-            
+        
         except Exception as e:
             return False, f"Error checking file: {str(e)}"
     
-    def verify_authenticity(self, image_path):
+    def verify_authenticity(self, image):
         """
-        Main authenticity verification
+        Main authenticity verification (image: ImageContext or file path)
         Returns: (is_authentic, confidence, details)
         """
+        try:
+            image = ImageContext.coerce(image)
+        except Exception:
+            # Unreadable file: every check reports its own error below
+            pass
+        
+        # Checks 1 and 3 depend only on the image bytes, so they are memoized
+        # on the context (and survive in the feature cache); check 2 depends
+        # on the known fakes, which can change between requests
+        def image_checks():
+            return self.check_exif_metadata(image), self.check_file_properties(image)
+        
+        if isinstance(image, ImageContext):
+            exif_result, props_result = image.memo('authenticity_checks', image_checks)
+        else:
+            exif_result, props_result = image_checks()
+        
         checks = []
         scores = []
         
         # Check 1: EXIF metadata
-        has_exif, exif_msg = self.check_exif_metadata(image_path)
+        has_exif, exif_msg = exif_result
         checks.append(exif_msg)
         scores.append(1.0 if has_exif else 0.0)
         
         # Check 2: Perceptual hash
-        unique_hash, hash_msg = self.check_perceptual_hash(image_path)
+        unique_hash, hash_msg = self.check_perceptual_hash(image)
         checks.append(hash_msg)
         scores.append(1.0 if unique_hash else 0.0)
         
         # Check 3: File properties
-        good_props, props_msg = self.check_file_properties(image_path)
+        good_props, props_msg = props_result
         checks.append(props_msg)
         scores.append(1.0 if good_props else 0.0)
         
@@ -95,10 +128,19 @@ class AuthenticityChecker:
         
         return is_authentic, confidence, checks
     
-    def add_known_fake_hash(self, image_path):
+    def add_known_fake_hash(self, image):
         """Add an image hash to known fakes database"""
         try:
-            img_hash = imagehash.average_hash(Image.open(image_path))
-            self.known_fake_hashes.add(str(img_hash))
+            self.known_fake_hashes.add(ImageContext.coerce(image).packed_hash)
         except:
             pass
+    
+    def add_known_fake_hashes(self, hashes):
+        """Add packed hashes to known fakes database, returns how many are known now"""
+        self.known_fake_hashes.add_many(hashes)
+        self.known_fake_hashes.compact()
+        return len(self.known_fake_hashes)
+    
+    def load_known_fakes(self, path):
+        """Bulk-load known fake hashes from a file (see hamming_index for the format)"""
+        return self.add_known_fake_hashes(load_hash_file(path))
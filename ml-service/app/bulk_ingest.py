@@ -0,0 +1,206 @@
+"""
+Streaming bulk ingestion of existing issues from newline-delimited JSON
+
+Records are read in fixed-size chunks, so memory use does not grow with the
+file. Within a chunk, image hashes are taken from the record when present
+('imageHash') and otherwise computed in parallel from the image, and the
+whole chunk is written to the index in one batch. Besides the generator's
+format, records exported from the backend's Issue collection are accepted:
+    {"_id": ..., "imageUrl": ..., "description": ...,
+     "location": {"type": "Point", "coordinates": [longitude, latitude]},
+     "status": "pending", "createdAt": {"$date": ...}}
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import urlopen
+
+from hash_utils import parse_hex_hash
+from issue_fields import STATUSES, parse_timestamp
+
+DEFAULT_CHUNK_SIZE = 5000
+REMOTE_TIMEOUT_SECONDS = 10
+
+
+class IngestProgress:
+    """Progress of a running (or finished) ingest, safe to read from any thread"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self, path=None, total_bytes=0):
+        with self._lock:
+            self.path = path
+            self.state = 'idle' if path is None else 'running'
+            self.total_bytes = total_bytes
+            self.bytes_read = 0
+            self.records = 0
+            self.ingested = 0
+            self.skipped = 0
+            self.hashed = 0
+            self.without_hash = 0
+            self.error = None
+            self.started_at = time.time() if path is not None else None
+            self.finished_at = None
+
+    @property
+    def running(self):
+        return self.state == 'running'
+
+    def update(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def finish(self, error=None):
+        with self._lock:
+            self.state = 'failed' if error else 'done'
+            self.error = error
+            self.finished_at = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0.0
+            return {
+                'state': self.state,
+                'path': self.path,
+                'records': self.records,
+                'ingested': self.ingested,
+                'skipped': self.skipped,
+                'hashed': self.hashed,
+                'without_hash': self.without_hash,
+                'bytes_read': self.bytes_read,
+                'total_bytes': self.total_bytes,
+                'percent': round(100.0 * self.bytes_read / self.total_bytes, 1) if self.total_bytes else None,
+                'elapsed_seconds': round(elapsed, 2),
+                'records_per_second': round(self.records / elapsed, 1) if elapsed > 0 else None,
+                'error': self.error
+            }
+
+
+def iter_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield (lines, bytes_read) for consecutive chunks of a JSONL file"""
+    chunk = []
+    chunk_bytes = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            chunk_bytes += len(line)
+            line = line.strip()
+            if not line:
+                continue
+            chunk.append(line)
+            if len(chunk) >= chunk_size:
+                yield chunk, chunk_bytes
+                chunk = []
+                chunk_bytes = 0
+    if chunk or chunk_bytes:
+        yield chunk, chunk_bytes
+
+
+def normalize_record(record, default_id):
+    """
+    (issue_id, latitude, longitude, description, image_hash_hex, image_url,
+    created_at, status) from a generator or backend record; raises
+    KeyError/ValueError if unusable
+    """
+    issue_id = record.get('id', record.get('_id', default_id))
+    if isinstance(issue_id, dict):
+        issue_id = issue_id.get('$oid', str(issue_id))
+
+    if 'latitude' in record and 'longitude' in record:
+        latitude, longitude = record['latitude'], record['longitude']
+    else:
+        longitude, latitude = record['location']['coordinates']
+    latitude, longitude = float(latitude), float(longitude)
+    if not (-90.0 <= latitude <= 90.0 and -180.0 <= longitude <= 180.0):
+        raise ValueError(f"Invalid coordinates ({latitude}, {longitude})")
+
+    description = record['description']
+    if not isinstance(description, str):
+        raise ValueError(f"Description must be a string, got {type(description).__name__}")
+    image_url = record.get('imageURL') or record.get('imageUrl')
+    created_at = parse_timestamp(record.get('createdAt', record.get('timestamp')))
+    status = record.get('status', 'pending')
+    if status not in STATUSES:
+        raise ValueError(f"Unknown status {status!r}")
+    return (issue_id, latitude, longitude, description, record.get('imageHash'),
+            image_url, created_at, status)
+
+
+def hash_image_url(image_url):
+    """Packed average_hash of a local (file:// or plain path) or http(s) image, or None"""
+    from image_context import ImageContext, compute_packed_hash
+    try:
+        if image_url.startswith(('http://', 'https://')):
+            with urlopen(image_url, timeout=REMOTE_TIMEOUT_SECONDS) as response:
+                return compute_packed_hash(ImageContext(response.read(), source=image_url))
+        return compute_packed_hash(image_url.replace('file://', ''))
+    except Exception:
+        return None
+
+
+def ingest_jsonl(detector, path, chunk_size=DEFAULT_CHUNK_SIZE, workers=None,
+                 fetch_images=True, progress=None):
+    """
+    Stream issues from a JSONL file into detector in batches.
+    fetch_images: hash images of records without 'imageHash' (otherwise
+        they are indexed for location + text only)
+    Returns the final progress snapshot.
+    """
+    progress = progress or IngestProgress()
+    progress.reset(path, os.path.getsize(path))
+    workers = workers or min(32, (os.cpu_count() or 1) * 4)
+    print(f"Ingesting existing issues from {path}...")
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ingest') as pool:
+            for lines, chunk_bytes in iter_chunks(path, chunk_size):
+                ids, latitudes, longitudes, descriptions, hashes, to_fetch = [], [], [], [], [], []
+                created, statuses = [], []
+                skipped = 0
+                for line_number, line in enumerate(lines, start=progress.records + 1):
+                    try:
+                        record = json.loads(line)
+                        issue_id, latitude, longitude, description, image_hash, image_url, \
+                            created_at, status = normalize_record(record, line_number)
+                        packed = parse_hex_hash(image_hash) if image_hash else None
+                    except (ValueError, KeyError, TypeError):
+                        skipped += 1
+                        continue
+                    if packed is None and fetch_images and image_url:
+                        to_fetch.append((len(ids), image_url))
+                    ids.append(issue_id)
+                    latitudes.append(latitude)
+                    longitudes.append(longitude)
+                    descriptions.append(description)
+                    hashes.append(packed)
+                    created.append(created_at)
+                    statuses.append(status)
+
+                # Hash missing images in parallel (decoding releases the GIL)
+                fetched = list(pool.map(hash_image_url, [url for _, url in to_fetch]))
+                for (index, _), packed in zip(to_fetch, fetched):
+                    hashes[index] = packed
+                hashed = sum(1 for packed in fetched if packed is not None)
+
+                if ids:
+                    detector.insert_rows(
+                        ids, latitudes, longitudes, hashes, detector.vectorize(descriptions),
+                        created_at=created, statuses=statuses
+                    )
+                progress.update(
+                    records=len(lines), ingested=len(ids), skipped=skipped, hashed=hashed,
+                    without_hash=sum(1 for h in hashes if h is None), bytes_read=chunk_bytes
+                )
+    except Exception as e:
+        progress.finish(error=str(e))
+        print(f"⚠️  Ingest of {path} failed: {e}")
+        raise
+
+    progress.finish()
+    result = progress.snapshot()
+    print(f"✅ Ingested {result['ingested']} issues ({result['skipped']} skipped) "
+          f"in {result['elapsed_seconds']:.1f} s")
+    return result
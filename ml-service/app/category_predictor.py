@@ -7,8 +7,58 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import LabelEncoder
 import joblib
 import os
-from PIL import Image
 import cv2
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from image_context import ImageContext
+from compiled_forest import CompiledForest
+from micro_batcher import MicroBatcher
+from feature_store import file_digest
+from online_model import OnlineCategoryModel
+
+# Directory (inside the model dir) of the flat, memory-mappable forest
+COMPILED_FOREST_DIR = 'category_forest'
+
+# Length of the color histogram feature vector
+IMAGE_FEATURES = 99
+# Bump when color_histogram_features changes, so stored features are recomputed
+IMAGE_FEATURE_VERSION = 1
+
+def color_histogram_features(img):
+    """Color histogram + mean color features of a 128x128 BGR image"""
+    # Calculate color histograms for each channel
+    hist_features = []
+    for i in range(3):  # BGR channels
+        hist = cv2.calcHist([img], [i], None, [32], [0, 256])
+        hist = cv2.normalize(hist, hist).flatten()
+        hist_features.extend(hist)
+    
+    # Calculate mean color
+    mean_color = cv2.mean(img)[:3]
+    hist_features.extend(mean_color)
+    
+    return np.array(hist_features)
+
+def extract_image_features_from_file(image_path):
+    """Process-pool entry point: features of one image file (zeros if unreadable)"""
+    try:
+        return color_histogram_features(ImageContext.from_path(image_path).bgr_128)
+    except Exception as e:
+        print(f"Error extracting image features: {e}")
+        return np.zeros(IMAGE_FEATURES)
+
+def _safe_file_digest(path):
+    try:
+        return file_digest(path)
+    except OSError:
+        return None
+
+def _resolve_jobs(n_jobs):
+    if n_jobs is None:
+        return 1
+    if n_jobs < 0:
+        return max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+    return max(1, n_jobs)
 
 class CategoryPredictor:
     def __init__(self):
@@ -23,36 +73,21 @@ class CategoryPredictor:
             "Sewer Overflow"
         ]
         self.is_trained = False
+        self.batcher = None
+        self.online = None
+        self.online_min_samples = 0
     
-    def extract_image_features(self, image_path):
-        """Extract simple color histogram features from image"""
+    def extract_image_features(self, image):
+        """Extract simple color histogram features from image (ImageContext or path)"""
         try:
-            # Load image
-            img = cv2.imread(image_path)
-            if img is None:
-                # If file path, try PIL
-                img = np.array(Image.open(image_path))
-                img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
-            
-            # Resize to standard size
-            img = cv2.resize(img, (128, 128))
-            
-            # Calculate color histograms for each channel
-            hist_features = []
-            for i in range(3):  # BGR channels
-                hist = cv2.calcHist([img], [i], None, [32], [0, 256])
-                hist = cv2.normalize(hist, hist).flatten()
-                hist_features.extend(hist)
-            
-            # Calculate mean color
-            mean_color = cv2.mean(img)[:3]
-            hist_features.extend(mean_color)
-            
-            return np.array(hist_features)
+            # Decoded once per context, already resized to 128x128 BGR;
+            # memoized so a feature cache hit skips decoding entirely
+            image = ImageContext.coerce(image)
+            return image.memo('image_features', lambda: color_histogram_features(image.bgr_128))
         except Exception as e:
             print(f"Error extracting image features: {e}")
             # Return zero features if failed
-            return np.zeros(99)
+            return np.zeros(IMAGE_FEATURES)
     
     def extract_text_features(self, text):
         """Extract TF-IDF features from text"""
@@ -60,75 +95,187 @@ class CategoryPredictor:
             return np.zeros(100)
         return self.text_vectorizer.transform([text]).toarray()[0]
     
-    def combine_features(self, image_path, text):
+    def combine_features(self, image, text):
         """Combine image and text features"""
-        img_features = self.extract_image_features(image_path)
+        img_features = self.extract_image_features(image)
         text_features = self.extract_text_features(text)
         return np.concatenate([img_features, text_features])
     
-    def train(self, dataset):
-        """Train the model on dataset"""
+    def combine_features_batch(self, images, texts):
+        """Stacked feature matrix for many issues (one text transform for all)"""
+        img_features = np.array([self.extract_image_features(image) for image in images])
+        if not self.is_trained:
+            text_features = np.zeros((len(texts), 100))
+        else:
+            text_features = self.text_vectorizer.transform(texts).toarray()
+        return np.hstack([img_features, text_features])
+    
+    def extract_image_features_parallel(self, image_paths, n_jobs=None, feature_store=None):
+        """
+        Image feature matrix for many files. Files are keyed by content digest:
+        duplicates are featurized once, features already in feature_store are
+        reused, and the rest are extracted across n_jobs processes.
+        """
+        workers = _resolve_jobs(n_jobs)
+        
+        # Digest every file (I/O bound, threads are enough)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            digests = list(pool.map(_safe_file_digest, image_paths))
+        
+        # One path per digest that still needs featurizing
+        known = feature_store if feature_store is not None else ()
+        todo = {}
+        for path, digest in zip(image_paths, digests):
+            if digest is not None and digest not in known and digest not in todo:
+                todo[digest] = path
+        
+        print(f"  Featurizing {len(todo)} of {len(image_paths)} images with {workers} worker(s)")
+        paths = list(todo.values())
+        if workers > 1 and len(paths) > 1:
+            chunksize = max(1, len(paths) // (workers * 4))
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                computed = list(pool.map(extract_image_features_from_file, paths, chunksize=chunksize))
+        else:
+            computed = [extract_image_features_from_file(path) for path in paths]
+        fresh = dict(zip(todo.keys(), computed))
+        
+        if feature_store is not None and fresh:
+            for digest, features in fresh.items():
+                feature_store.add(digest, features)
+            feature_store.save()
+        
+        # Assemble rows in input order; unreadable files get zero features
+        stored = [digest for digest in set(digests) if digest is not None and digest not in fresh]
+        if stored:
+            fresh.update(zip(stored, feature_store.get_many(stored)))
+        return np.array([
+            fresh[digest] if digest is not None else np.zeros(IMAGE_FEATURES)
+            for digest in digests
+        ])
+    
+    def train(self, dataset, n_jobs=None, feature_store=None):
+        """
+        Train the model on dataset.
+        n_jobs: processes for image featurization and cores for forest fitting
+        feature_store: optional FeatureStore so only new images are featurized
+        """
         print("Training category prediction model...")
         
-        # Extract features
-        X = []
-        y = []
-        
-        for record in dataset:
-            # Get image path (handle file:// URLs)
-            img_path = record['imageURL'].replace('file://', '')
-            
-            # Extract image features
-            img_features = self.extract_image_features(img_path)
-            
-            # Temporarily store for text vectorizer fitting
-            X.append({
-                'img_features': img_features,
-                'text': record['description']
-            })
-            y.append(record['category'])
-        
-        # Fit text vectorizer
-        texts = [x['text'] for x in X]
-        self.text_vectorizer.fit(texts)
+        # Get image paths (handle file:// URLs), texts and labels
+        img_paths = [record['imageURL'].replace('file://', '') for record in dataset]
+        texts = [record['description'] for record in dataset]
+        y = [record['category'] for record in dataset]
         
-        # Now combine features
-        X_combined = []
-        for x in X:
-            text_features = self.text_vectorizer.transform([x['text']]).toarray()[0]
-            combined = np.concatenate([x['img_features'], text_features])
-            X_combined.append(combined)
+        # Extract image features in parallel
+        img_features = self.extract_image_features_parallel(img_paths, n_jobs, feature_store)
         
-        X_combined = np.array(X_combined)
+        # Fit text vectorizer and transform all texts in one call
+        self.text_vectorizer.fit(texts)
+        text_features = self.text_vectorizer.transform(texts).toarray()
+        
+        X_combined = np.hstack([img_features, text_features])
         
         # Encode labels
         y_encoded = self.label_encoder.fit_transform(y)
         
-        # Train model
+        # Train model on all requested cores
+        self.model = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=n_jobs)
         self.model.fit(X_combined, y_encoded)
+        # Serving predicts a few rows at a time, where joblib workers only add overhead
+        self.model.n_jobs = None
         self.is_trained = True
         
         print(f"✅ Model trained on {len(dataset)} samples")
         return self
     
-    def predict(self, image_path, text):
-        """Predict category and confidence"""
+    def predict(self, image, text):
+        """Predict category and confidence (image: ImageContext or file path)"""
+        if self.serving_online:
+            return self.online.predict([self.extract_image_features(image)], [text])[0]
+        
         if not self.is_trained:
             return "Garbage Issue", 0.5
         
         # Extract and combine features
-        features = self.combine_features(image_path, text)
-        features = features.reshape(1, -1)
+        features = self.combine_features(image, text)
         
-        # Predict
-        prediction = self.model.predict(features)[0]
-        probabilities = self.model.predict_proba(features)[0]
+        # Concurrent requests can share one batched forest call
+        if self.batcher is not None:
+            return self.batcher.submit(features)
+        
+        return self.predict_features(features.reshape(1, -1))[0]
+    
+    def predict_batch(self, images, texts):
+        """Predict (category, confidence) for many issues in one forest call"""
+        if self.serving_online:
+            return self.online.predict([self.extract_image_features(image) for image in images], texts)
+        
+        if not self.is_trained:
+            return [("Garbage Issue", 0.5) for _ in images]
+        
+        return self.predict_features(self.combine_features_batch(images, texts))
+    
+    def predict_features(self, features):
+        """
+        (category, confidence) per row of a feature matrix. The label is the
+        argmax of predict_proba, so the forest is only evaluated once.
+        """
+        probabilities = self.model.predict_proba(features)
+        predictions = probabilities.argmax(axis=1)
         
         # Get category and confidence
-        category = self.label_encoder.inverse_transform([prediction])[0]
-        confidence = float(probabilities[prediction])
+        categories = self.label_encoder.inverse_transform(self.model.classes_[predictions])
+        confidences = probabilities[np.arange(len(predictions)), predictions]
         
-        return category, confidence
+        return [(category, float(confidence)) for category, confidence in zip(categories, confidences)]
+    
+    def enable_micro_batching(self, max_batch_size=32, max_wait_ms=5):
+        """Coalesce concurrent predict() calls into batched forest calls"""
+        if self.batcher is None:
+            self.batcher = MicroBatcher(self.predict_features, max_batch_size, max_wait_ms)
+        return self.batcher
+    
+    def enable_online_learning(self, checkpoint_dir, min_samples=100):
+        """
+        Learn from confirmed labels (see learn()) with an OnlineCategoryModel
+        checkpointed in checkpoint_dir. Once it has learned min_samples
+        confirmed labels and has been at least as accurate as the forest on
+        recent feedback, it serves predictions instead of the forest.
+        """
+        if self.online is None:
+            self.online = OnlineCategoryModel(self.categories, checkpoint_dir)
+            self.online.reload()
+        self.online_min_samples = min_samples
+        return self.online
+    
+    @property
+    def serving_online(self):
+        online = self.online
+        return online is not None and online.is_trained and \
+            online.feedback_samples >= self.online_min_samples and online.beats_baseline
+    
+    @property
+    def model_version(self):
+        """Changes whenever predictions may change (the online model learned or reloaded)"""
+        return self.online.version if self.online is not None else 0
+    
+    def learn(self, images, texts, labels):
+        """
+        Update the online model with confirmed labels; returns its new version.
+        images may contain None for issues without a photo. The forest is
+        scored on the labels too, before the online model learns them.
+        """
+        if self.online is None:
+            raise RuntimeError("Online learning is not enabled")
+        features = [self.extract_image_features(image) if image is not None else None for image in images]
+        return self.online.learn(features, texts, labels, baseline=self.forest_labels)
+    
+    def forest_labels(self, image_features, texts):
+        """Forest (or untrained fallback) category per row of image features and text"""
+        if not self.is_trained:
+            return ["Garbage Issue"] * len(texts)
+        text_features = self.text_vectorizer.transform(texts).toarray()
+        return [category for category, _ in self.predict_features(np.hstack([image_features, text_features]))]
     
     def save(self, model_dir='models'):
         """Save trained model"""
@@ -136,16 +283,30 @@ class CategoryPredictor:
         joblib.dump(self.model, os.path.join(model_dir, 'category_model.pkl'))
         joblib.dump(self.text_vectorizer, os.path.join(model_dir, 'text_vectorizer.pkl'))
         joblib.dump(self.label_encoder, os.path.join(model_dir, 'label_encoder.pkl'))
+        self.export_compiled(model_dir)
         print(f"✅ Model saved to {model_dir}")
     
-    def load(self, model_dir='models'):
-        """Load trained model"""
+    def export_compiled(self, model_dir='models'):
+        """Export the forest in the flat array format used for serving"""
+        compiled = CompiledForest.from_sklearn(self.model)
+        compiled.save(os.path.join(model_dir, COMPILED_FOREST_DIR))
+        return compiled
+    
+    def load(self, model_dir='models', compiled=True):
+        """
+        Load trained model. With compiled=True the memory-mapped forest is
+        used when it has been exported, instead of unpickling the sklearn model.
+        """
         try:
-            self.model = joblib.load(os.path.join(model_dir, 'category_model.pkl'))
+            forest_dir = os.path.join(model_dir, COMPILED_FOREST_DIR)
+            if compiled and os.path.exists(os.path.join(forest_dir, 'manifest.json')):
+                self.model = CompiledForest.load(forest_dir)
+            else:
+                self.model = joblib.load(os.path.join(model_dir, 'category_model.pkl'))
             self.text_vectorizer = joblib.load(os.path.join(model_dir, 'text_vectorizer.pkl'))
             self.label_encoder = joblib.load(os.path.join(model_dir, 'label_encoder.pkl'))
             self.is_trained = True
-            print(f"✅ Model loaded from {model_dir}")
+            print(f"✅ Model loaded from {model_dir} ({type(self.model).__name__})")
             return True
         except Exception as e:
             print(f"⚠️  Could not load model: {e}")
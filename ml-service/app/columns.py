@@ -0,0 +1,185 @@
+"""
+Append-friendly NumPy columns for the in-memory issue index
+"""
+import numpy as np
+import scipy.sparse as sp
+
+
+class GrowableArray:
+    """
+    1-D NumPy array with amortized O(1) append (capacity doubling).
+    A wrapped array (e.g. a snapshot memory map shared by several worker
+    processes) stays in place as the base segment and appended values go
+    to a private tail, so growing the column never copies the base.
+    """
+    def __init__(self, dtype, capacity=64):
+        self.dtype = np.dtype(dtype)
+        self._base = np.zeros(0, dtype=self.dtype)
+        self._data = np.zeros(max(1, capacity), dtype=self.dtype)
+        self._size = 0  # filled part of _data
+
+    @classmethod
+    def wrap(cls, array):
+        """Use an existing array as the initial contents, without copying it"""
+        column = cls(array.dtype)
+        column._base = array
+        return column
+
+    def __len__(self):
+        return len(self._base) + self._size
+
+    def _reserve(self, capacity):
+        if capacity <= len(self._data):
+            return
+        new_capacity = max(capacity, 2 * len(self._data))
+        data = np.zeros(new_capacity, dtype=self.dtype)
+        data[:self._size] = self._data[:self._size]
+        self._data = data
+
+    def append(self, value):
+        self._reserve(self._size + 1)
+        self._data[self._size] = value
+        self._size += 1
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.dtype)
+        self._reserve(self._size + len(values))
+        self._data[self._size:self._size + len(values)] = values
+        self._size += len(values)
+
+    def _split(self, index):
+        """(positions, mask in base, base positions, tail positions) of an index"""
+        positions = np.arange(len(self))[index] if isinstance(index, slice) else np.asarray(index)
+        positions = np.flatnonzero(positions) if positions.dtype == bool else positions.astype(np.intp)
+        in_base = positions < len(self._base)
+        return positions, in_base, positions[in_base], positions[~in_base] - len(self._base)
+
+    def __getitem__(self, index):
+        if self._size == 0:
+            return self._base[index]
+        if len(self._base) == 0:
+            return self._data[:self._size][index]
+        if isinstance(index, (int, np.integer)):
+            if index < 0:
+                index += len(self)
+            if index < len(self._base):
+                return self._base[index]
+            return self._data[index - len(self._base)]
+        if isinstance(index, slice) and index.step in (None, 1):
+            start, stop, _ = index.indices(len(self))
+            if stop <= len(self._base):
+                return self._base[start:stop]
+            if start >= len(self._base):
+                return self._data[start - len(self._base):stop - len(self._base)]
+
+        positions, in_base, base_positions, tail_positions = self._split(index)
+        values = np.empty(len(positions), dtype=self.dtype)
+        values[in_base] = self._base[base_positions]
+        values[~in_base] = self._data[tail_positions]
+        return values
+
+    def __setitem__(self, index, value):
+        if isinstance(index, (int, np.integer)):
+            if index < 0:
+                index += len(self)
+            if index < len(self._base):
+                self._base[index] = value
+            else:
+                self._data[index - len(self._base)] = value
+            return
+
+        _, in_base, base_positions, tail_positions = self._split(index)
+        value = np.broadcast_to(np.asarray(value, dtype=self.dtype), in_base.shape)
+        self._base[base_positions] = value[in_base]
+        self._data[tail_positions] = value[~in_base]
+
+    def view(self):
+        """
+        Array of the filled part (no copy, unless values were appended to a
+        wrapped array; then the two segments are concatenated)
+        """
+        if self._size == 0:
+            return self._base
+        if len(self._base) == 0:
+            return self._data[:self._size]
+        return np.concatenate([self._base, self._data[:self._size]])
+
+    @property
+    def nbytes(self):
+        """Bytes held by the column, including spare capacity"""
+        return self._base.nbytes + self._data.nbytes
+
+    @property
+    def shared_nbytes(self):
+        """Bytes of the wrapped base segment (shared when it is a memory map)"""
+        return self._base.nbytes if isinstance(self._base, np.memmap) else 0
+
+
+class GrowableCSR:
+    """Row-appendable CSR matrix (rows are never rewritten in place)"""
+    def __init__(self, n_features, dtype=np.float32):
+        self.n_features = n_features
+        self.data = GrowableArray(dtype)
+        self.indices = GrowableArray(np.int32)
+        self.indptr = GrowableArray(np.int64)
+        self.indptr.append(0)
+
+    @classmethod
+    def wrap(cls, n_features, data, indices, indptr):
+        """Build from existing CSR buffers without copying them"""
+        matrix = cls(n_features, dtype=data.dtype)
+        matrix.data = GrowableArray.wrap(data)
+        matrix.indices = GrowableArray.wrap(indices)
+        matrix.indptr = GrowableArray.wrap(indptr)
+        return matrix
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def append_row(self, indices, values):
+        self.indices.extend(indices)
+        self.data.extend(values)
+        self.indptr.append(len(self.indices))
+
+    def row(self, index):
+        """(indices, values) of one stored row"""
+        start, end = self.indptr[index], self.indptr[index + 1]
+        return self.indices[start:end].copy(), self.data[start:end].copy()
+
+    def extend(self, matrix):
+        """Append every row of a scipy sparse matrix"""
+        matrix = sp.csr_matrix(matrix)
+        offset = len(self.indices)
+        self.indices.extend(matrix.indices)
+        self.data.extend(matrix.data)
+        self.indptr.extend(matrix.indptr[1:] + offset)
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + self.indices.nbytes + self.indptr.nbytes
+
+    @property
+    def shared_nbytes(self):
+        return self.data.shared_nbytes + self.indices.shared_nbytes + self.indptr.shared_nbytes
+
+    def take(self, rows):
+        """scipy CSR matrix of the given rows (gathers only their entries)"""
+        rows = np.asarray(rows, dtype=np.intp)
+        starts = self.indptr[rows].astype(np.int64)
+        lengths = self.indptr[rows + 1].astype(np.int64) - starts
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        # Position of every entry of the selected rows in the stored buffers
+        positions = np.repeat(starts - indptr[:-1], lengths) + np.arange(indptr[-1])
+        return sp.csr_matrix(
+            (self.data[positions], self.indices[positions], indptr),
+            shape=(len(rows), self.n_features)
+        )
+
+    def matrix(self):
+        """scipy CSR view over the stored rows (no copy of unsegmented buffers)"""
+        return sp.csr_matrix(
+            (self.data.view(), self.indices.view(), self.indptr.view()),
+            shape=(len(self), self.n_features),
+            copy=False
+        )
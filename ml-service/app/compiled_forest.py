@@ -0,0 +1,222 @@
+"""
+Compact, memory-mappable random forest format with a vectorized evaluator
+
+All trees are flattened into shared node arrays:
+    feature      int16    split feature per node
+    threshold    float32  split threshold (x <= threshold goes left)
+    left, right  int32    global child indices; leaves point at themselves
+    leaf_slot    int32    row in leaf_proba for leaves, -1 for split nodes
+    leaf_proba   float32  normalized class probabilities per leaf
+    roots        int32    root node of every tree
+
+Because leaves loop back to themselves, evaluation is `max_depth` rounds of
+gather + compare over a (samples x trees) array of node ids, with no
+per-tree Python loop. Files are plain .npy so every uvicorn worker can map
+the same pages instead of unpickling its own copy of the forest.
+"""
+import json
+import os
+import time
+import numpy as np
+
+FOREST_FORMAT = 'civic-compiled-forest'
+FOREST_VERSION = 1
+
+ARRAYS = ['feature', 'threshold', 'left', 'right', 'leaf_slot', 'leaf_proba', 'roots']
+
+
+def _float32_threshold(thresholds):
+    """
+    Largest float32 <= each float64 threshold. sklearn compares float32
+    features against float64 thresholds, and for a float32 x,
+    x <= t64  <=>  x <= round_down_to_float32(t64), so splits stay exact.
+    """
+    rounded = thresholds.astype(np.float32)
+    too_high = rounded.astype(np.float64) > thresholds
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
+
+
+class CompiledForest:
+    """Drop-in for RandomForestClassifier.predict_proba over flat arrays"""
+    def __init__(self, feature, threshold, left, right, leaf_slot, leaf_proba, roots,
+                 classes, n_features, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.leaf_slot = leaf_slot
+        self.leaf_proba = leaf_proba
+        self.roots = roots
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = n_features
+        self.max_depth = max_depth
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAYS)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Flatten a fitted RandomForestClassifier (single output)"""
+        features, thresholds, lefts, rights, slots, probas, roots = [], [], [], [], [], [], []
+        offset = 0
+        leaf_offset = 0
+        max_depth = 0
+
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            is_leaf = tree.children_left == -1
+            node_ids = np.arange(n_nodes)
+
+            # Leaves point at themselves and split on feature 0 (any valid index)
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+
+            leaf_ids = np.flatnonzero(is_leaf)
+            slot = np.full(n_nodes, -1, dtype=np.int64)
+            slot[leaf_ids] = np.arange(len(leaf_ids)) + leaf_offset
+            slots.append(slot)
+
+            # Same normalization as DecisionTreeClassifier.predict_proba
+            values = tree.value[leaf_ids, 0, :].astype(np.float64)
+            normalizer = values.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            probas.append(values / normalizer)
+
+            roots.append(offset)
+            offset += n_nodes
+            leaf_offset += len(leaf_ids)
+            max_depth = max(max_depth, tree.max_depth)
+
+        n_features = model.n_features_in_
+        if n_features > np.iinfo(np.int16).max:
+            raise ValueError(f"Too many features for int16 indices: {n_features}")
+        if offset > np.iinfo(np.int32).max:
+            raise ValueError(f"Too many nodes for int32 indices: {offset}")
+
+        return cls(
+            feature=np.concatenate(features).astype(np.int16),
+            threshold=_float32_threshold(np.concatenate(thresholds)),
+            left=np.concatenate(lefts).astype(np.int32),
+            right=np.concatenate(rights).astype(np.int32),
+            leaf_slot=np.concatenate(slots).astype(np.int32),
+            leaf_proba=np.concatenate(probas).astype(np.float32),
+            roots=np.asarray(roots, dtype=np.int32),
+            classes=model.classes_,
+            n_features=n_features,
+            max_depth=max_depth
+        )
+
+    def predict_proba(self, X):
+        """Class probabilities, same as the source forest's predict_proba"""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], self.n_trees))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        # Average tree probabilities in float64, like sklearn
+        leaf_proba = self.leaf_proba[self.leaf_slot[nodes]]
+        return leaf_proba.sum(axis=1, dtype=np.float64) / self.n_trees
+
+    def predict(self, X):
+        """(labels, probabilities) from a single pass over the forest"""
+        probabilities = self.predict_proba(X)
+        return self.classes_[probabilities.argmax(axis=1)], probabilities
+
+    def save(self, forest_dir):
+        os.makedirs(forest_dir, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(forest_dir, f"{name}.npy"), getattr(self, name))
+        manifest = {
+            'format': FOREST_FORMAT,
+            'version': FOREST_VERSION,
+            'n_trees': self.n_trees,
+            'n_nodes': int(len(self.feature)),
+            'n_features': int(self.n_features_in_),
+            'max_depth': int(self.max_depth),
+            'classes': self.classes_.tolist()
+        }
+        with open(os.path.join(forest_dir, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+    @classmethod
+    def load(cls, forest_dir, mmap=True):
+        """Load a saved forest; with mmap=True the arrays are read-only maps"""
+        with open(os.path.join(forest_dir, 'manifest.json')) as f:
+            manifest = json.load(f)
+        if manifest.get('format') != FOREST_FORMAT or manifest.get('version') != FOREST_VERSION:
+            raise ValueError(f"Unsupported forest format in {forest_dir}")
+
+        mmap_mode = 'r' if mmap else None
+        arrays = {
+            name: np.load(os.path.join(forest_dir, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in ARRAYS
+        }
+        return cls(
+            classes=manifest['classes'],
+            n_features=manifest['n_features'],
+            max_depth=manifest['max_depth'],
+            **arrays
+        )
+
+
+def _sklearn_forest_nbytes(model):
+    """Bytes held by the node arrays of a fitted sklearn forest"""
+    total = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        total += tree.children_left.nbytes + tree.children_right.nbytes
+        total += tree.feature.nbytes + tree.threshold.nbytes + tree.value.nbytes
+        total += tree.impurity.nbytes + tree.n_node_samples.nbytes
+        total += tree.weighted_n_node_samples.nbytes
+    return total
+
+
+def compare_with_sklearn(pickle_path, forest_dir, X):
+    """
+    Check the compiled forest against the pickled sklearn model on X and
+    compare load time, memory and prediction time.
+    """
+    import joblib
+
+    start = time.perf_counter()
+    model = joblib.load(pickle_path)
+    sklearn_load = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compiled = CompiledForest.load(forest_dir)
+    compiled_load = time.perf_counter() - start
+
+    start = time.perf_counter()
+    expected = model.predict_proba(X)
+    sklearn_predict = time.perf_counter() - start
+
+    start = time.perf_counter()
+    labels, probabilities = compiled.predict(X)
+    compiled_predict = time.perf_counter() - start
+
+    return {
+        'samples': int(len(X)),
+        'max_abs_proba_diff': float(np.abs(expected - probabilities).max()) if len(X) else 0.0,
+        'labels_match': bool(np.array_equal(model.predict(X), labels)),
+        'load_seconds': {'sklearn': sklearn_load, 'compiled': compiled_load},
+        'predict_seconds': {'sklearn': sklearn_predict, 'compiled': compiled_predict},
+        'memory_bytes': {
+            'sklearn_pickle_file': os.path.getsize(pickle_path),
+            'sklearn_tree_arrays': _sklearn_forest_nbytes(model),
+            'compiled_arrays': compiled.nbytes
+        }
+    }
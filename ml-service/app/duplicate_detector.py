@@ -1,137 +1,534 @@
 """
 Duplicate detection using location + image + text similarity
 """
+import sys
+import threading
+import time
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import imagehash
-from PIL import Image
+from sklearn.feature_extraction.text import HashingVectorizer
 from geopy.distance import geodesic
 
+from columns import GrowableArray, GrowableCSR
+from hash_utils import hash_similarities, parse_hex_hash
+from image_context import compute_packed_hash
+from issue_fields import OPEN_STATUSES, STATUSES, parse_timestamp, status_code
+from spatial_index import SpatialIndex
+
+# Haversine can differ from the geodesic distance by up to ~0.5%, so the
+# spatial index is queried with a little slack before the exact check
+SPATIAL_QUERY_SLACK = 1.01
+
+# Width of the hashed text feature space
+TEXT_FEATURES = 2 ** 18
+
+# Compact the columns once dead rows outnumber live ones (and this many exist)
+MIN_COMPACT_ROWS = 1024
+
+# Python objects sampled to estimate the size of the id maps
+MEMORY_SAMPLE = 1000
+
 class DuplicateDetector:
-    def __init__(self, location_radius_meters=100, similarity_threshold=0.80):
+    def __init__(self, location_radius_meters=100, similarity_threshold=0.80,
+                 max_age_seconds=None, match_statuses=OPEN_STATUSES):
         self.location_radius = location_radius_meters
         self.similarity_threshold = similarity_threshold
-        self.text_vectorizer = TfidfVectorizer(stop_words='english')
-        self.existing_issues = []
+        # Issues older than this (by creation time) or not in match_statuses
+        # are never duplicate candidates, and evict_expired() drops them
+        self.max_age_seconds = max_age_seconds
+        self.match_statuses = tuple(match_statuses)
+        self._status_matches = np.isin(
+            np.arange(len(STATUSES)), [status_code(status) for status in self.match_statuses]
+        )
+        # Stateless featurizer: inserts never need a fit over the whole corpus
+        self.text_vectorizer = HashingVectorizer(
+            n_features=TEXT_FEATURES, stop_words='english',
+            alternate_sign=False, norm='l2'
+        )
+        # Row-aligned columns; removed issues stay as dead rows
+        self.ids = []
+        self.id_to_row = {}
+        self.latitudes = GrowableArray(np.float64)
+        self.longitudes = GrowableArray(np.float64)
+        self.alive = GrowableArray(bool)
+        # Packed average_hash per row
+        self.image_hashes = GrowableArray(np.uint64)
+        self.has_image_hash = GrowableArray(bool)
+        # Creation time (epoch seconds) and status code per row
+        self.created_at = GrowableArray(np.float64)
+        self.statuses = GrowableArray(np.uint8)
+        # L2-normalized text row per issue
+        self.text_matrix = GrowableCSR(TEXT_FEATURES)
+        self.spatial_index = SpatialIndex(cell_size_meters=location_radius_meters)
+        # Bumped on every insert/update/remove
+        self.version = 0
+        # Issues dropped by evict_expired()
+        self.evicted = 0
+        # Optional IndexJournal recording changes since the last snapshot
+        self.journal = None
+        # Optional callable(latitudes, longitudes, created_at), see watch_inserts()
+        self.insert_listener = None
+        self._lock = threading.RLock()
     
-    def add_existing_issue(self, issue_id, image_path, description, latitude, longitude):
-        """Add an existing issue to the database"""
-        # Calculate perceptual hash
-        try:
-            img_hash = imagehash.average_hash(Image.open(image_path))
-        except:
-            img_hash = None
+    @staticmethod
+    def _key(issue_id):
+        """Ids arrive as ints (dataset) or strings (backend, URL paths)"""
+        return str(issue_id)
+    
+    @property
+    def issue_count(self):
+        return len(self.id_to_row)
+    
+    def vectorize(self, texts):
+        """Text rows for texts (L2-normalized, so dot product == cosine)"""
+        return self.text_vectorizer.transform(texts).astype(np.float32)
+    
+    def add_existing_issue(self, issue_id, image_path, description, latitude, longitude,
+                           image_hash=None, created_at=None, status='pending'):
+        """
+        Add an existing issue to the database (replaces an issue with the same id).
+        image_path may also be an ImageContext; image_hash is an optional
+        precomputed packed average_hash; created_at is in epoch seconds
+        (default: now).
+        """
+        # Featurize outside the lock
+        if image_hash is None and image_path:
+            image_hash = compute_packed_hash(image_path)
+        text_row = self.vectorize([description])
+        
+        return self.insert_row(
+            issue_id, latitude, longitude, image_hash, text_row.indices, text_row.data,
+            created_at, status
+        )
+    
+    def insert_row(self, issue_id, latitude, longitude, image_hash, text_indices, text_values,
+                   created_at=None, status='pending'):
+        """Insert an already featurized issue (replaces an issue with the same id)"""
+        code = status_code(status)
+        if created_at is None:
+            created_at = time.time()
+        
+        with self._lock:
+            previous = self.id_to_row.get(self._key(issue_id))
+            self._remove_row(previous)
+            
+            row = len(self.ids)
+            self.ids.append(issue_id)
+            self.latitudes.append(latitude)
+            self.longitudes.append(longitude)
+            self.alive.append(True)
+            self.image_hashes.append(image_hash if image_hash is not None else 0)
+            self.has_image_hash.append(image_hash is not None)
+            self.created_at.append(created_at)
+            self.statuses.append(code)
+            self.text_matrix.append_row(text_indices, text_values)
+            self.spatial_index.insert(row, latitude, longitude)
+            self.id_to_row[self._key(issue_id)] = row
+            self.version += 1
+            
+            if self.journal is not None:
+                self.journal.record_insert(
+                    issue_id, latitude, longitude, image_hash, text_indices, text_values,
+                    created_at, status
+                )
+            if previous is None and self.insert_listener is not None:
+                self.insert_listener([latitude], [longitude], [created_at])
+            return row
+    
+    def insert_rows(self, issue_ids, latitudes, longitudes, image_hashes, text_rows,
+                    created_at=None, statuses=None):
+        """
+        Bulk insert of already featurized issues under one lock acquisition.
+        image_hashes holds packed hashes or None; text_rows is a sparse
+        matrix from vectorize; created_at (epoch seconds, None = now) and
+        statuses are optional per-row lists. Later ids replace earlier ones,
+        as in insert_row.
+        """
+        if len(issue_ids) == 0:
+            return
+        text_rows = text_rows.tocsr()
+        has_hash = np.array([h is not None for h in image_hashes], dtype=bool)
+        hashes = np.array([h if h is not None else 0 for h in image_hashes], dtype=np.uint64)
+        now = time.time()
+        created_at = [now if t is None else t for t in created_at] if created_at is not None \
+            else [now] * len(issue_ids)
+        statuses = statuses if statuses is not None else ['pending'] * len(issue_ids)
+        codes = np.array([status_code(status) for status in statuses], dtype=np.uint8)
+        
+        with self._lock:
+            start = len(self.ids)
+            rows = np.arange(start, start + len(issue_ids))
+            self.ids.extend(issue_ids)
+            self.latitudes.extend(latitudes)
+            self.longitudes.extend(longitudes)
+            self.alive.extend(np.ones(len(issue_ids), dtype=bool))
+            self.image_hashes.extend(hashes)
+            self.has_image_hash.extend(has_hash)
+            self.created_at.extend(created_at)
+            self.statuses.extend(codes)
+            self.text_matrix.extend(text_rows)
+            self.spatial_index.bulk_insert(rows, latitudes, longitudes)
+            
+            new = np.zeros(len(issue_ids), dtype=bool)
+            for i, (row, issue_id) in enumerate(zip(rows.tolist(), issue_ids)):
+                previous = self.id_to_row.get(self._key(issue_id))
+                new[i] = previous is None
+                self._remove_row(previous)
+                self.id_to_row[self._key(issue_id)] = row
+            self.version += 1
+            
+            if self.journal is not None:
+                for i, issue_id in enumerate(issue_ids):
+                    text_row = text_rows[i]
+                    self.journal.record_insert(
+                        issue_id, latitudes[i], longitudes[i], image_hashes[i],
+                        text_row.indices, text_row.data, created_at[i], statuses[i]
+                    )
+            if self.insert_listener is not None and new.any():
+                self.insert_listener(
+                    np.asarray(latitudes, dtype=np.float64)[new],
+                    np.asarray(longitudes, dtype=np.float64)[new],
+                    np.asarray(created_at, dtype=np.float64)[new]
+                )
+    
+    def watch_inserts(self, listener):
+        """
+        Call listener(latitudes, longitudes, created_at) with the live issues
+        now, then with every newly registered issue (including ones replayed
+        from other workers' journal entries). Updates, re-registrations and
+        snapshot loads are not reported again.
+        """
+        with self._lock:
+            rows = np.flatnonzero(self.alive.view())
+            if len(rows):
+                listener(self.latitudes[rows], self.longitudes[rows], self.created_at[rows])
+            self.insert_listener = listener
+    
+    def update_issue(self, issue_id, image_path=None, description=None, latitude=None,
+                     longitude=None, image_hash=None, status=None):
+        """
+        Update fields of a registered issue, returns False if it is unknown.
+        Issues moved out of match_statuses stop matching immediately.
+        """
+        if image_hash is None and image_path:
+            image_hash = compute_packed_hash(image_path)
+        text_row = self.vectorize([description]) if description is not None else None
         
-        self.existing_issues.append({
-            'id': issue_id,
-            'image_path': image_path,
-            'image_hash': img_hash,
-            'description': description,
-            'latitude': latitude,
-            'longitude': longitude
-        })
+        with self._lock:
+            row = self.id_to_row.get(self._key(issue_id))
+            if row is None:
+                return False
+            
+            # Unchanged fields are carried over from the stored row
+            if image_hash is None and self.has_image_hash[row]:
+                image_hash = int(self.image_hashes[row])
+            if text_row is None:
+                text_indices, text_values = self.text_matrix.row(row)
+            else:
+                text_indices, text_values = text_row.indices, text_row.data
+            
+            self.insert_row(
+                self.ids[row],
+                latitude if latitude is not None else float(self.latitudes[row]),
+                longitude if longitude is not None else float(self.longitudes[row]),
+                image_hash, text_indices, text_values,
+                float(self.created_at[row]),
+                status if status is not None else STATUSES[self.statuses[row]]
+            )
+            return True
+    
+    def export_issue(self, issue_id):
+        """
+        Stored fields of a registered issue as insert_row arguments (after
+        the id), or None if it is unknown
+        """
+        with self._lock:
+            row = self.id_to_row.get(self._key(issue_id))
+            if row is None:
+                return None
+            text_indices, text_values = self.text_matrix.row(row)
+            return (
+                float(self.latitudes[row]), float(self.longitudes[row]),
+                int(self.image_hashes[row]) if self.has_image_hash[row] else None,
+                text_indices, text_values,
+                float(self.created_at[row]), STATUSES[self.statuses[row]]
+            )
+    
+    def remove_issue(self, issue_id):
+        """Remove a registered issue, returns False if it is unknown"""
+        with self._lock:
+            row = self.id_to_row.get(self._key(issue_id))
+            if row is None:
+                return False
+            self._remove_row(row)
+            self.version += 1
+            
+            if self.journal is not None:
+                self.journal.record_remove(issue_id)
+            return True
+    
+    def _remove_row(self, row):
+        if row is None:
+            return
+        self.spatial_index.remove(row)
+        self.id_to_row.pop(self._key(self.ids[row]), None)
+        self.alive[row] = False
+    
+    def _matchable(self, rows, now=None):
+        """Mask of rows whose status and age allow them to match"""
+        rows = np.asarray(rows, dtype=np.intp)
+        mask = self._status_matches[self.statuses[rows]]
+        if self.max_age_seconds is not None:
+            cutoff = (now if now is not None else time.time()) - self.max_age_seconds
+            mask &= self.created_at[rows] >= cutoff
+        return mask
+    
+    def find_nearby_issues(self, latitude, longitude):
+        """Return rows of matchable issues within location_radius, in insertion order"""
+        with self._lock:
+            candidates = self.spatial_index.query(
+                latitude, longitude, self.location_radius * SPATIAL_QUERY_SLACK
+            )
+            rows = sorted(row for row, _ in candidates)
+            
+            nearby = []
+            for row in np.asarray(rows, dtype=np.intp)[self._matchable(rows)].tolist():
+                # Exact distance only for the few candidates the index returned
+                distance = self.calculate_location_distance(
+                    latitude, longitude,
+                    self.latitudes[row], self.longitudes[row]
+                )
+                if distance <= self.location_radius:
+                    nearby.append(row)
+            
+            return nearby
+    
+    def evict_expired(self, now=None):
+        """
+        Remove issues that can no longer match (closed or older than
+        max_age_seconds) and compact the columns once they are mostly dead.
+        Returns the number of issues removed.
+        """
+        with self._lock:
+            live = np.flatnonzero(self.alive.view())
+            expired = live[~self._matchable(live, now)]
+            for row in expired.tolist():
+                issue_id = self.ids[row]
+                self._remove_row(row)
+                if self.journal is not None:
+                    self.journal.record_remove(issue_id)
+            if len(expired):
+                self.evicted += len(expired)
+                self.version += 1
+            
+            dead = len(self.ids) - self.issue_count
+            if dead >= MIN_COMPACT_ROWS and dead > self.issue_count:
+                self.compact()
+            return len(expired)
+    
+    def compact(self):
+        """Rewrite the columns without dead rows, releasing their memory"""
+        with self._lock:
+            rows = np.flatnonzero(self.alive.view())
+            text = self.text_matrix.take(rows)
+            self.load_columns(
+                [self.ids[row] for row in rows],
+                self.latitudes[rows], self.longitudes[rows],
+                self.image_hashes[rows], self.has_image_hash[rows],
+                text.data.astype(np.float32), text.indices.astype(np.int32),
+                text.indptr.astype(np.int64),
+                created_at=self.created_at[rows], statuses=self.statuses[rows]
+            )
     
     def load_existing_issues(self, dataset):
-        """Load existing issues from dataset"""
+        """
+        Load existing issues from dataset. Records carrying an 'imageHash'
+        (hex average_hash) are indexed without opening their image.
+        """
         print(f"Loading {len(dataset)} existing issues...")
-        for record in dataset:
+        for index, record in enumerate(dataset):
             img_path = record['imageURL'].replace('file://', '')
+            image_hash = record.get('imageHash')
             self.add_existing_issue(
-                issue_id=record.get('id', 0),
+                issue_id=record.get('id', index + 1),
                 image_path=img_path,
                 description=record['description'],
                 latitude=record['latitude'],
-                longitude=record['longitude']
+                longitude=record['longitude'],
+                image_hash=parse_hex_hash(image_hash) if image_hash else None,
+                created_at=parse_timestamp(record.get('timestamp')),
+                status=record.get('status', 'pending')
             )
         
-        # Fit text vectorizer
-        if len(self.existing_issues) > 0:
-            descriptions = [issue['description'] for issue in self.existing_issues]
-            self.text_vectorizer.fit(descriptions)
-        
-        print(f"✅ Loaded {len(self.existing_issues)} existing issues")
+        print(f"✅ Loaded {self.issue_count} existing issues")
+    
+    def load_columns(self, ids, latitudes, longitudes, image_hashes, has_image_hash,
+                     text_data, text_indices, text_indptr, created_at=None, statuses=None):
+        """
+        Replace the index with prebuilt (e.g. memory-mapped) columns.
+        All rows are treated as live; without created_at/statuses they are
+        taken as created now and pending.
+        """
+        if created_at is None:
+            created_at = np.full(len(ids), time.time())
+        if statuses is None:
+            statuses = np.zeros(len(ids), dtype=np.uint8)
+        with self._lock:
+            self.ids = list(ids)
+            self.id_to_row = {self._key(issue_id): row for row, issue_id in enumerate(self.ids)}
+            self.latitudes = GrowableArray.wrap(latitudes)
+            self.longitudes = GrowableArray.wrap(longitudes)
+            self.alive = GrowableArray.wrap(np.ones(len(self.ids), dtype=bool))
+            self.image_hashes = GrowableArray.wrap(image_hashes)
+            self.has_image_hash = GrowableArray.wrap(has_image_hash)
+            self.created_at = GrowableArray.wrap(created_at)
+            self.statuses = GrowableArray.wrap(statuses)
+            self.text_matrix = GrowableCSR.wrap(TEXT_FEATURES, text_data, text_indices, text_indptr)
+            self.spatial_index = SpatialIndex(cell_size_meters=self.location_radius)
+            self.spatial_index.bulk_insert(np.arange(len(self.ids)), latitudes, longitudes)
+            self.version += 1
     
     def calculate_location_distance(self, lat1, lon1, lat2, lon2):
         """Calculate distance between two coordinates in meters"""
         return geodesic((lat1, lon1), (lat2, lon2)).meters
     
-    def calculate_image_similarity(self, image_path1, image_path2):
-        """Calculate perceptual hash similarity between images"""
-        try:
-            hash1 = imagehash.average_hash(Image.open(image_path1))
-            hash2 = imagehash.average_hash(Image.open(image_path2))
-            
-            # Calculate similarity (0 = identical, higher = more different)
-            difference = hash1 - hash2
-            
-            # Convert to similarity score (0-1, where 1 is identical)
-            max_difference = 64  # Max possible difference for average hash
-            similarity = 1 - (difference / max_difference)
-            
-            return similarity
-        except Exception as e:
-            print(f"Error calculating image similarity: {e}")
-            return 0.0
+    def calculate_image_similarities(self, query_hash, rows):
+        """
+        Perceptual hash similarity (0-1, where 1 is identical) between the
+        new image and the stored hashes of the given rows, in one XOR+popcount
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+        if query_hash is None or len(rows) == 0:
+            return np.zeros(len(rows))
+        
+        with self._lock:
+            hashes = self.image_hashes[rows]
+            has_hash = self.has_image_hash[rows]
+        
+        similarities = hash_similarities(query_hash, hashes)
+        # Issues whose image could not be hashed never match on image
+        similarities[~has_hash] = 0.0
+        return similarities
     
-    def calculate_text_similarity(self, text1, text2):
-        """Calculate cosine similarity between texts"""
+    def calculate_text_similarities(self, description, rows, query=None):
+        """
+        Cosine similarity between the new description and the stored
+        descriptions of the given rows, as one sparse matrix-vector product
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+        if len(rows) == 0:
+            return np.zeros(len(rows))
+        
         try:
-            if len(self.existing_issues) == 0:
-                return 0.0
-            
-            vectors = self.text_vectorizer.transform([text1, text2])
-            similarity = cosine_similarity(vectors[0:1], vectors[1:2])[0][0]
-            return float(similarity)
+            if query is None:
+                query = self.vectorize([description])
+            with self._lock:
+                candidates = self.text_matrix.take(rows)
+            return (candidates @ query.T).toarray().ravel()
         except Exception as e:
             print(f"Error calculating text similarity: {e}")
-            return 0.0
+            return np.zeros(len(rows))
     
-    def check_duplicate(self, image_path, description, latitude, longitude):
+    def check_duplicate(self, image, description, latitude, longitude):
         """
-        Check if the new issue is a duplicate
+        Check if the new issue is a duplicate (image: ImageContext or file path)
         Returns: (is_duplicate, duplicate_issue_id, similarity_score)
         """
-        if len(self.existing_issues) == 0:
+        if self.issue_count == 0:
             return False, None, 0.0
         
+        # Featurize the new issue once, outside the lock
+        query_hash = compute_packed_hash(image)
+        if query_hash is None:
+            print("Error calculating image similarity: could not hash the new image")
+        query_text = self.vectorize([description])
+        
         best_match = None
         best_similarity = 0.0
         
-        for existing in self.existing_issues:
-            # Step 1: Check location proximity
-            distance = self.calculate_location_distance(
-                latitude, longitude,
-                existing['latitude'], existing['longitude']
-            )
+        # Candidates and their similarities come from one consistent view
+        with self._lock:
+            # Step 1: Only issues within the location radius are candidates
+            rows = self.find_nearby_issues(latitude, longitude)
+            if not rows:
+                return False, None, 0.0
+            candidate_ids = [self.ids[row] for row in rows]
             
-            # Skip if too far
-            if distance > self.location_radius:
-                continue
-            
-            # Step 2: Calculate image similarity
-            img_similarity = self.calculate_image_similarity(image_path, existing['image_path'])
-            
-            # Step 3: Calculate text similarity
-            text_similarity = self.calculate_text_similarity(description, existing['description'])
+            # Step 2: Image similarity against all candidates at once
+            img_similarities = self.calculate_image_similarities(query_hash, rows)
             
+            # Step 3: Text similarity against all candidates at once
+            text_similarities = self.calculate_text_similarities(description, rows, query_text)
+        
+        for issue_id, img_similarity, text_similarity in zip(
+            candidate_ids, img_similarities, text_similarities
+        ):
             # Combined similarity (weighted average)
             combined_similarity = (img_similarity * 0.6 + text_similarity * 0.4)
             
             # Update best match
             if combined_similarity > best_similarity:
                 best_similarity = combined_similarity
-                best_match = existing['id']
+                best_match = issue_id
         
         # Determine if duplicate
-        is_duplicate = best_similarity >= self.similarity_threshold
+        is_duplicate = bool(best_similarity >= self.similarity_threshold)
         
         return is_duplicate, best_match, float(best_similarity)
     
+    def memory_usage(self):
+        """
+        Approximate bytes held by the index: NumPy columns exactly (memory
+        mapped ones included), Python id maps and the spatial index estimated
+        from a sample
+        """
+        with self._lock:
+            columns = {
+                'coordinates': self.latitudes.nbytes + self.longitudes.nbytes,
+                'image_hashes': self.image_hashes.nbytes + self.has_image_hash.nbytes,
+                'metadata': self.alive.nbytes + self.created_at.nbytes + self.statuses.nbytes,
+                'text': self.text_matrix.nbytes
+            }
+            
+            sample = self.ids[::max(1, len(self.ids) // MEMORY_SAMPLE)]
+            id_bytes = np.mean([sys.getsizeof(issue_id) for issue_id in sample]) if sample else 0
+            key_bytes = np.mean([sys.getsizeof(self._key(issue_id)) for issue_id in sample]) if sample else 0
+            columns['ids'] = int(
+                sys.getsizeof(self.ids) + len(self.ids) * id_bytes
+                + sys.getsizeof(self.id_to_row) + len(self.id_to_row) * (key_bytes + 28)
+            )
+            # points: dict entry + (lat, lon) tuple of floats; buckets: one set slot per key
+            points = self.spatial_index.points
+            columns['spatial_index'] = int(
+                sys.getsizeof(points) + len(points) * (sys.getsizeof((0.0, 0.0)) + 2 * 24 + 28 + 16)
+                + sys.getsizeof(self.spatial_index.buckets)
+                + len(self.spatial_index.buckets) * sys.getsizeof(set())
+            )
+            total = sum(columns.values())
+            # Snapshot columns memory-mapped from disk (shared between workers)
+            shared = sum(
+                column.shared_nbytes for column in (
+                    self.latitudes, self.longitudes, self.image_hashes, self.has_image_hash,
+                    self.created_at, self.statuses, self.text_matrix
+                )
+            )
+            return {
+                'total_bytes': total,
+                'shared_bytes': shared,
+                'bytes_per_issue': round(total / self.issue_count, 1) if self.issue_count else 0.0,
+                'rows': len(self.ids),
+                'dead_rows': len(self.ids) - self.issue_count,
+                'columns': columns
+            }
+    
     def get_statistics(self):
         """Get detector statistics"""
         return {
-            'total_issues': len(self.existing_issues),
+            'total_issues': self.issue_count,
             'location_radius': self.location_radius,
-            'similarity_threshold': self.similarity_threshold
+            'similarity_threshold': self.similarity_threshold,
+            'index_version': self.version,
+            'max_age_seconds': self.max_age_seconds,
+            'match_statuses': list(self.match_statuses),
+            'evicted': self.evicted,
+            'memory': self.memory_usage()
         }
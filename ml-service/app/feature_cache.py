@@ -0,0 +1,115 @@
+"""
+Content-addressed LRU cache of per-image derived values
+
+Entries are keyed by the SHA-256 of the image bytes and hold what the
+pipeline derives from an image that depends on nothing else: the category
+color features, the perceptual hash and the image-only authenticity checks.
+A retried request or a re-uploaded photo is seeded from the cache and skips
+decoding entirely.
+"""
+import sys
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# ImageContext memo keys worth keeping across requests
+CACHED_KEYS = ('image_features', 'average_hash', 'packed_hash', 'authenticity_checks')
+
+# Rough per-entry overhead: key string, OrderedDict node, values dict
+ENTRY_OVERHEAD_BYTES = 400
+
+
+def _sizeof(value):
+    """Approximate retained size of a cached value in bytes"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes + 112
+    if isinstance(getattr(value, 'hash', None), np.ndarray):
+        # imagehash.ImageHash (not imported here to keep startup light)
+        return value.hash.nbytes + 160
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(_sizeof(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class FeatureCache:
+    """
+    Thread-safe LRU bounded by an approximate byte budget. attach() seeds an
+    ImageContext with cached values; store() records what the request
+    computed. max_bytes=0 disables the cache.
+    """
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # digest -> (values, size)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def attach(self, image):
+        """Seed image (ImageContext) with cached values; True on a hit"""
+        if not self.enabled:
+            return False
+        digest = image.digest
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self.misses += 1
+                return False
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            values = entry[0]
+        image.seed(values)
+        return True
+
+    def store(self, image):
+        """Cache the values image computed, merged with any existing entry"""
+        if not self.enabled:
+            return
+        values = image.memoized(CACHED_KEYS)
+        if not values:
+            return
+        digest = image.digest
+
+        with self._lock:
+            old = self._entries.pop(digest, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+                values = {**old[0], **values}
+
+            size = ENTRY_OVERHEAD_BYTES + len(digest) + sum(_sizeof(v) for v in values.values())
+            if size > self.max_bytes:
+                return
+            self._entries[digest] = (values, size)
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,138 @@
+"""
+Content-addressed on-disk store of extracted image features
+
+Features are keyed by the SHA-256 digest of the image bytes, so a retrain
+only featurizes images it has not seen before, wherever they are stored.
+Layout:
+    CURRENT                 name of the active generation
+    store-000003/
+        manifest.json       extractor version and feature width
+        keys.npy      (n,)  S64  hex digests
+        features.npy  (n, d)     one feature vector per digest
+Both arrays are memory-mapped on load. A store written by another
+extractor version or width is discarded rather than reused. save() writes
+a new generation and switches CURRENT to it, so readers see either the
+old or the new store, never a mix.
+"""
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+
+from index_snapshot import CURRENT_FILE, current_generation
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """SHA-256 hex digest of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _store_name(generation):
+    return f"store-{generation:06d}"
+
+
+class FeatureStore:
+    """
+    extractor_version identifies the feature extraction code (bump it when
+    the features change); width is the length of a feature vector
+    """
+    def __init__(self, store_dir, extractor_version, width):
+        self.store_dir = store_dir
+        self.extractor_version = extractor_version
+        self.width = width
+        self.keys = np.zeros(0, dtype='S64')
+        self.features = None
+        self.key_to_row = {}
+        self._pending_keys = []
+        self._pending_features = []
+        self.load()
+
+    def __len__(self):
+        return len(self.key_to_row)
+
+    def __contains__(self, digest):
+        return digest in self.key_to_row
+
+    def load(self):
+        generation = current_generation(self.store_dir)
+        if generation == 0:
+            return
+        path = os.path.join(self.store_dir, _store_name(generation))
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
+        if manifest.get('extractor_version') != self.extractor_version or manifest.get('width') != self.width:
+            print(f"⚠️  Discarding feature store {self.store_dir} (extractor "
+                  f"v{manifest.get('extractor_version')}, width {manifest.get('width')}; "
+                  f"expected v{self.extractor_version}, width {self.width})")
+            return
+        self.keys = np.load(os.path.join(path, 'keys.npy'), mmap_mode='r')
+        self.features = np.load(os.path.join(path, 'features.npy'), mmap_mode='r')
+        self.key_to_row = {key.decode(): row for row, key in enumerate(self.keys.tolist())}
+
+    def add(self, digest, features):
+        """Stage features for a digest; call save() to persist"""
+        if digest in self.key_to_row:
+            return
+        self.key_to_row[digest] = len(self.keys) + len(self._pending_keys)
+        self._pending_keys.append(digest)
+        self._pending_features.append(np.asarray(features))
+
+    def get_many(self, digests):
+        """Feature matrix with one row per digest (all must be present)"""
+        rows = [self.key_to_row[digest] for digest in digests]
+        return self._all_features()[rows]
+
+    def _all_features(self):
+        if not self._pending_features:
+            return self.features
+        pending = np.vstack(self._pending_features)
+        if self.features is None:
+            return pending
+        return np.vstack([self.features, pending.astype(self.features.dtype)])
+
+    def save(self):
+        """Write the stored and staged features as a new generation"""
+        if not self._pending_keys:
+            return
+        keys = np.concatenate([
+            np.asarray(self.keys, dtype='S64'),
+            np.asarray(self._pending_keys, dtype='S64')
+        ])
+        features = self._all_features()
+
+        previous = current_generation(self.store_dir)
+        name = _store_name(previous + 1)
+        tmp_dir = os.path.join(self.store_dir, name + '.tmp')
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        np.save(os.path.join(tmp_dir, 'keys.npy'), keys)
+        np.save(os.path.join(tmp_dir, 'features.npy'), features)
+        with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+            json.dump({
+                'extractor_version': self.extractor_version,
+                'width': self.width,
+                'count': int(len(keys))
+            }, f, indent=2)
+        os.rename(tmp_dir, os.path.join(self.store_dir, name))
+
+        current_tmp = os.path.join(self.store_dir, CURRENT_FILE + '.tmp')
+        with open(current_tmp, 'w') as f:
+            f.write(name + '\n')
+        os.replace(current_tmp, os.path.join(self.store_dir, CURRENT_FILE))
+        if previous:
+            # Open memory maps keep the old files alive until closed
+            shutil.rmtree(os.path.join(self.store_dir, _store_name(previous)), ignore_errors=True)
+        for legacy in ('keys.npy', 'features.npy'):  # unversioned layout
+            try:
+                os.unlink(os.path.join(self.store_dir, legacy))
+            except FileNotFoundError:
+                pass
+
+        self._pending_keys = []
+        self._pending_features = []
+        self.load()
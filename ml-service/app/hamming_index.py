@@ -0,0 +1,139 @@
+"""
+Multi-index hashing over packed 64-bit perceptual hashes
+
+Each hash is split into CHUNKS 16-bit substrings. By the pigeonhole
+principle, two hashes within Hamming distance r agree to within
+floor(r / CHUNKS) bits on at least one substring, so a query only probes
+the substring values within that radius (17 per chunk for r < 8, 137 for
+r < 12) in per-chunk sorted tables, then verifies the few candidates
+with a vectorized XOR + popcount.
+
+Known-fake file format: one 16 character hex hash (str(ImageHash)) per
+line, blank lines and '#' comments ignored; or a .npy array of uint64.
+"""
+import itertools
+import threading
+import numpy as np
+
+from hash_utils import HASH_BITS, hamming_distances, parse_hex_hash
+
+CHUNKS = 4
+CHUNK_BITS = HASH_BITS // CHUNKS
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+# New hashes are scanned linearly until this many are pending, then merged
+MAX_PENDING = 1024
+
+
+def _flip_masks(bits, radius):
+    """All bit masks over `bits` bits with at most `radius` bits set"""
+    masks = [0]
+    for r in range(1, radius + 1):
+        for positions in itertools.combinations(range(bits), r):
+            masks.append(sum(1 << p for p in positions))
+    return np.array(masks, dtype=np.uint16)
+
+
+def load_hash_file(path):
+    """Packed hashes from a hex-per-line text file or a .npy uint64 array"""
+    if path.endswith('.npy'):
+        return np.load(path).astype(np.uint64)
+    hashes = []
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                hashes.append(parse_hex_hash(line))
+    return np.array(hashes, dtype=np.uint64)
+
+
+class HammingIndex:
+    """Set of packed hashes with fast "anything within distance r?" queries"""
+    def __init__(self):
+        self.hashes = np.zeros(0, dtype=np.uint64)
+        # Per chunk: sorted substring values and the matching rows of self.hashes
+        self._chunk_keys = [np.zeros(0, dtype=np.uint16) for _ in range(CHUNKS)]
+        self._chunk_rows = [np.zeros(0, dtype=np.int64) for _ in range(CHUNKS)]
+        self._members = set()
+        self._pending = []
+        self._masks = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._members)
+
+    def __contains__(self, packed_hash):
+        return int(packed_hash) in self._members
+
+    def add(self, packed_hash):
+        self.add_many([packed_hash])
+
+    def add_many(self, hashes):
+        """Add packed hashes (duplicates are ignored)"""
+        with self._lock:
+            for value in np.asarray(hashes, dtype=np.uint64).tolist():
+                if value not in self._members:
+                    self._members.add(value)
+                    self._pending.append(value)
+            if len(self._pending) > MAX_PENDING:
+                self._merge()
+
+    def _merge(self):
+        """Fold pending hashes into the sorted chunk tables"""
+        if not self._pending:
+            return
+        self.hashes = np.concatenate([self.hashes, np.array(self._pending, dtype=np.uint64)])
+        self._pending = []
+        for chunk in range(CHUNKS):
+            keys = ((self.hashes >> np.uint64(chunk * CHUNK_BITS)) & np.uint64(CHUNK_MASK)).astype(np.uint16)
+            order = np.argsort(keys, kind='stable')
+            self._chunk_keys[chunk] = keys[order]
+            self._chunk_rows[chunk] = order
+
+    def _probe_masks(self, radius):
+        if radius not in self._masks:
+            self._masks[radius] = _flip_masks(CHUNK_BITS, radius)
+        return self._masks[radius]
+
+    def nearest(self, packed_hash, max_distance):
+        """(hash, distance) of the closest stored hash within max_distance, or None"""
+        if max_distance <= 0:
+            return (int(packed_hash), 0) if int(packed_hash) in self._members else None
+
+        query = np.uint64(packed_hash)
+        masks = self._probe_masks(min(max_distance // CHUNKS, CHUNK_BITS))
+        with self._lock:
+            candidates = []
+            for chunk in range(CHUNKS):
+                keys = self._chunk_keys[chunk]
+                if len(keys) == 0:
+                    break
+                value = np.uint16((int(packed_hash) >> (chunk * CHUNK_BITS)) & CHUNK_MASK)
+                probes = np.unique(masks ^ value)
+                starts = np.searchsorted(keys, probes, side='left')
+                ends = np.searchsorted(keys, probes, side='right')
+                for start, end in zip(starts[starts < ends].tolist(), ends[starts < ends].tolist()):
+                    candidates.append(self._chunk_rows[chunk][start:end])
+
+            stored = self.hashes[np.unique(np.concatenate(candidates))] if candidates else self.hashes[:0]
+            if self._pending:
+                stored = np.concatenate([stored, np.array(self._pending, dtype=np.uint64)])
+
+        if len(stored) == 0:
+            return None
+        distances = hamming_distances(query, stored)
+        best = int(np.argmin(distances))
+        if distances[best] > max_distance:
+            return None
+        return int(stored[best]), int(distances[best])
+
+    def compact(self):
+        """Merge pending hashes now (e.g. after a bulk load)"""
+        with self._lock:
+            self._merge()
+
+    def save(self, path):
+        """Write all hashes as a .npy uint64 array"""
+        with self._lock:
+            self._merge()
+            np.save(path, self.hashes)
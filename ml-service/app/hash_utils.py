@@ -0,0 +1,39 @@
+"""
+Packed 64-bit perceptual hash helpers
+"""
+import numpy as np
+
+HASH_BITS = 64
+
+# Number of set bits for every byte value, used for vectorized popcount
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def pack_hash(img_hash):
+    """Pack an 8x8 ImageHash into a single unsigned 64-bit integer"""
+    bits = np.packbits(np.asarray(img_hash.hash, dtype=bool).flatten())
+    return int.from_bytes(bits.tobytes(), 'big')
+
+
+def popcount64(values):
+    """Count set bits of every element of a uint64 array"""
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    return _POPCOUNT_TABLE[values.view(np.uint8)].reshape(values.shape + (8,)).sum(axis=-1)
+
+
+def hamming_distances(query_hash, hashes):
+    """Hamming distance between one packed hash and an array of packed hashes"""
+    return popcount64(np.bitwise_xor(np.asarray(hashes, dtype=np.uint64), np.uint64(query_hash)))
+
+
+def hash_similarities(query_hash, hashes):
+    """Similarity (0-1, where 1 is identical) of one packed hash against many"""
+    return 1.0 - hamming_distances(query_hash, hashes) / HASH_BITS
+
+
+def parse_hex_hash(hex_hash):
+    """Packed integer from a 16 character hex string (str(ImageHash))"""
+    value = int(hex_hash, 16)
+    if value >> HASH_BITS:
+        raise ValueError(f"Hash does not fit in {HASH_BITS} bits: {hex_hash}")
+    return value
@@ -0,0 +1,133 @@
+"""
+Per-request image context: decode an uploaded image once and lazily derive
+what each pipeline stage needs from it
+"""
+import hashlib
+from io import BytesIO
+import numpy as np
+from PIL import Image
+import imagehash
+import piexif
+import cv2
+
+from hash_utils import pack_hash
+
+# Input size of the category model's color histogram features
+FEATURE_IMAGE_SIZE = (128, 128)
+# average_hash works on an 8x8 grayscale thumbnail
+HASH_SIZE = 8
+
+
+class ImageContext:
+    """
+    Wraps the raw bytes of one image. Every derived value (decoded image,
+    resized BGR array, hash thumbnail, EXIF, ...) is computed on first use and
+    memoized, including failures, so each stage sees the same result without
+    reopening or re-decoding the file.
+    """
+    def __init__(self, data, source=None):
+        self.data = data
+        self.source = source
+        self._memo = {}
+
+    @classmethod
+    def from_path(cls, path):
+        with open(path, 'rb') as f:
+            return cls(f.read(), source=path)
+
+    @classmethod
+    def coerce(cls, image):
+        """Accept either an ImageContext or a file path"""
+        if isinstance(image, cls):
+            return image
+        return cls.from_path(image)
+
+    def memo(self, key, compute):
+        """Return compute() once per context; exceptions are cached and re-raised"""
+        if key not in self._memo:
+            try:
+                self._memo[key] = (True, compute())
+            except Exception as e:
+                self._memo[key] = (False, e)
+        ok, value = self._memo[key]
+        if not ok:
+            raise value
+        return value
+
+    def seed(self, values):
+        """Pre-populate memoized values (e.g. from a feature cache)"""
+        for key, value in values.items():
+            self._memo.setdefault(key, (True, value))
+
+    def memoized(self, keys):
+        """Successfully computed values among keys"""
+        return {
+            key: self._memo[key][1]
+            for key in keys
+            if key in self._memo and self._memo[key][0]
+        }
+
+    @property
+    def digest(self):
+        """SHA-256 hex digest of the raw bytes (content address)"""
+        return self.memo('digest', lambda: hashlib.sha256(self.data).hexdigest())
+
+    @property
+    def image(self):
+        """Opened PIL image (header parsed, pixels decoded on first pixel access)"""
+        return self.memo('image', lambda: Image.open(BytesIO(self.data)))
+
+    @property
+    def format(self):
+        return self.image.format
+
+    @property
+    def size(self):
+        return self.image.size
+
+    @property
+    def rgb(self):
+        """Fully decoded RGB pixels"""
+        return self.memo('rgb', lambda: np.asarray(self.image.convert('RGB')))
+
+    @property
+    def bgr_128(self):
+        """128x128 BGR array used for the category color features"""
+        def compute():
+            bgr = cv2.cvtColor(self.rgb, cv2.COLOR_RGB2BGR)
+            return cv2.resize(bgr, FEATURE_IMAGE_SIZE)
+        return self.memo('bgr_128', compute)
+
+    @property
+    def hash_thumbnail(self):
+        """8x8 grayscale thumbnail (same resampling as imagehash.average_hash)"""
+        def compute():
+            gray = self.image.convert('L').resize((HASH_SIZE, HASH_SIZE), Image.LANCZOS)
+            return np.asarray(gray)
+        return self.memo('hash_thumbnail', compute)
+
+    @property
+    def average_hash(self):
+        """imagehash.ImageHash equal to imagehash.average_hash(image)"""
+        def compute():
+            pixels = self.hash_thumbnail
+            return imagehash.ImageHash(pixels > pixels.mean())
+        return self.memo('average_hash', compute)
+
+    @property
+    def packed_hash(self):
+        """average_hash packed into a 64-bit integer"""
+        return self.memo('packed_hash', lambda: pack_hash(self.average_hash))
+
+    @property
+    def exif(self):
+        """Parsed EXIF dict (raises if the image carries no EXIF)"""
+        return self.memo('exif', lambda: piexif.load(self.image.info.get('exif', b'')))
+
+
+def compute_packed_hash(image):
+    """average_hash of an image (path or ImageContext) as a packed integer, or None"""
+    try:
+        return ImageContext.coerce(image).packed_hash
+    except Exception:
+        return None
@@ -0,0 +1,83 @@
+"""
+Non-blocking image fetching over a shared aiohttp connection pool
+"""
+import asyncio
+import aiohttp
+
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+
+class ImageFetchError(Exception):
+    """Image could not be fetched (bad URL, HTTP error, timeout)"""
+    status_code = 400
+
+
+class ImageTooLargeError(ImageFetchError):
+    """Image exceeds the configured size limit"""
+    status_code = 413
+
+
+class ImageFetcher:
+    """
+    Streams images into memory with a size limit. The original bytes are
+    returned untouched (no re-encode), so EXIF survives for the
+    authenticity check and nothing is written to disk.
+    """
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, timeout_seconds=10, pool_size=100):
+        self.max_bytes = max_bytes
+        self.timeout_seconds = timeout_seconds
+        self.pool_size = pool_size
+        self._session = None
+
+    async def start(self):
+        """Create the shared session (call from the app's startup hook)"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(total=self.timeout_seconds)
+            )
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def fetch(self, url):
+        """Return the raw bytes behind url (http(s):// or file:// for testing)"""
+        if url.startswith('file://'):
+            return await asyncio.to_thread(self._read_file, url[len('file://'):])
+        if not url.startswith(('http://', 'https://')):
+            raise ImageFetchError(f"Unsupported image URL: {url}")
+
+        await self.start()
+        try:
+            async with self._session.get(url) as response:
+                if response.status >= 400:
+                    raise ImageFetchError(f"HTTP {response.status} fetching {url}")
+                if response.content_length is not None and response.content_length > self.max_bytes:
+                    raise ImageTooLargeError(
+                        f"Image is {response.content_length} bytes, limit is {self.max_bytes}"
+                    )
+
+                # Stream so an oversized body is cut off early
+                chunks = []
+                received = 0
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    received += len(chunk)
+                    if received > self.max_bytes:
+                        raise ImageTooLargeError(f"Image exceeds the {self.max_bytes} byte limit")
+                    chunks.append(chunk)
+                return b''.join(chunks)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise ImageFetchError(f"Could not download image: {e}") from e
+
+    def _read_file(self, path):
+        try:
+            with open(path, 'rb') as f:
+                data = f.read(self.max_bytes + 1)
+        except OSError as e:
+            raise ImageFetchError(f"Could not read image: {e}") from e
+        if len(data) > self.max_bytes:
+            raise ImageTooLargeError(f"Image exceeds the {self.max_bytes} byte limit")
+        return data
@@ -0,0 +1,522 @@
+"""
+Versioned on-disk snapshots of the duplicate-detection index
+
+Layout of a snapshot directory:
+    CURRENT                      name of the active snapshot
+    snapshot-000003/             one generation
+        manifest.json            format version, row count, column dtypes
+        ids.json                 issue id per row
+        <column>.npy             coordinates, packed hashes, creation times,
+                                 status codes, CSR text matrix
+    journal-000003.jsonl         changes made since snapshot-000003
+    LOCK, BUILD_LOCK             flock files coordinating worker processes
+
+Columns are loaded with copy-on-write memory maps, so a restart does not
+re-read images or re-featurize text, it only maps the files and replays
+the (short) journal.
+
+Several worker processes can serve from one directory (SharedIndex): they
+map the same snapshot files, so the columns are held once in the page
+cache, and each tails the journal the others append to.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): one process per directory
+    fcntl = None
+
+SNAPSHOT_FORMAT = 'civic-duplicate-index'
+SNAPSHOT_VERSION = 2
+# Version 1 snapshots have no created_at/statuses columns (rows load as
+# created at load time and pending)
+READABLE_VERSIONS = (1, 2)
+CURRENT_FILE = 'CURRENT'
+LOCK_FILE = 'LOCK'
+BUILD_LOCK_FILE = 'BUILD_LOCK'
+
+COLUMNS = [
+    'latitudes', 'longitudes', 'image_hashes', 'has_image_hash',
+    'text_data', 'text_indices', 'text_indptr', 'created_at', 'statuses'
+]
+
+
+def _snapshot_name(generation):
+    return f"snapshot-{generation:06d}"
+
+
+def journal_path(snapshot_dir, generation):
+    return os.path.join(snapshot_dir, f"journal-{generation:06d}.jsonl")
+
+
+def current_generation(snapshot_dir):
+    """Generation of the active snapshot, 0 if there is none"""
+    try:
+        with open(os.path.join(snapshot_dir, CURRENT_FILE)) as f:
+            return int(f.read().strip().rsplit('-', 1)[-1])
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+class DirectoryLock:
+    """
+    Advisory flock on a file in the snapshot directory, across processes.
+    Threads of one process share the flock, so they are serialized by a
+    re-entrant thread lock; the outermost acquisition decides the mode.
+    Take the detector lock first when both are needed.
+    """
+    def __init__(self, directory, name=LOCK_FILE):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._fd = os.open(os.path.join(directory, name), os.O_RDWR | os.O_CREAT, 0o644)
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+
+    def acquire(self, shared=False):
+        self._thread_lock.acquire()
+        self._depth += 1
+        if self._depth == 1 and fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+    @contextmanager
+    def shared(self):
+        self.acquire(shared=True)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @contextmanager
+    def exclusive(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+def acquire_build_lock(snapshot_dir):
+    """
+    Block until this process may build a missing snapshot (the first worker
+    to start builds it, the others then load it). Returns the function that
+    releases the lock, which may be called from any thread.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    fd = os.open(os.path.join(snapshot_dir, BUILD_LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+
+    def release():
+        os.close(fd)  # closing drops the flock
+    return release
+
+
+class IndexJournal:
+    """
+    Append-only JSONL log of index changes made since the last snapshot.
+    With a lock (shared between worker processes), entries are appended
+    under it to the journal of the current generation, which may have been
+    started by another process's snapshot.
+    """
+    def __init__(self, path, fsync=False, lock=None):
+        self.path = path
+        self.fsync = fsync
+        self.lock = lock
+        self.entries = 0
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def record_insert(self, issue_id, latitude, longitude, image_hash, text_indices, text_values,
+                      created_at=None, status='pending'):
+        self._write({
+            'op': 'insert',
+            'id': issue_id,
+            'latitude': float(latitude),
+            'longitude': float(longitude),
+            'image_hash': f"{image_hash:016x}" if image_hash is not None else None,
+            'text_indices': np.asarray(text_indices).tolist(),
+            'text_values': np.asarray(text_values, dtype=np.float32).tolist(),
+            'created_at': float(created_at) if created_at is not None else None,
+            'status': status
+        })
+
+    def record_remove(self, issue_id):
+        self._write({'op': 'remove', 'id': issue_id})
+
+    def _write(self, entry):
+        entry['pid'] = os.getpid()
+        line = (json.dumps(entry, separators=(',', ':')) + '\n').encode('utf-8')
+        if self.lock is None:
+            self._append(line)
+            return
+
+        with self.lock.shared():
+            path = journal_path(self.lock.directory, current_generation(self.lock.directory))
+            if path != self.path:
+                os.close(self._fd)
+                self.path = path
+                self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            self._append(line)
+
+    def _append(self, line):
+        # One write() per entry, so lines of concurrent writers never interleave
+        os.write(self._fd, line)
+        if self.fsync:
+            os.fsync(self._fd)
+        self.entries += 1
+
+    def close(self):
+        if getattr(self, '_fd', None) is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __del__(self):
+        # Journals of evicted region shards are closed once unreferenced
+        self.close()
+
+
+def replay_journal(detector, path, offset=0, skip_pid=None, writers_done=True):
+    """
+    Apply journal entries from byte offset on to the detector, skipping
+    those written by process skip_pid. A trailing line without a newline is
+    left for later while other writers may still be appending; with
+    writers_done it is a crash leftover and gets terminated and skipped.
+    Returns (entries applied, offset after the last complete line).
+    """
+    if not os.path.exists(path):
+        return 0, offset
+
+    applied = 0
+    # Holding the lock keeps other threads' changes (which must be
+    # journaled) out while the journal is detached
+    with detector._lock:
+        journal, detector.journal = detector.journal, None
+        try:
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                for line_number, line in enumerate(f, 1):
+                    if not line.endswith(b'\n'):
+                        if not writers_done:
+                            break
+                        with open(path, 'ab') as out:
+                            out.write(b'\n')
+                        line += b'\n'
+                    offset += len(line)
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A crash can leave a partially written line
+                        print(f"⚠️  Skipping unreadable journal line {line_number} in {path}")
+                        continue
+                    if skip_pid is not None and entry.get('pid') == skip_pid:
+                        continue
+
+                    if entry['op'] == 'insert':
+                        image_hash = entry['image_hash']
+                        detector.insert_row(
+                            entry['id'], entry['latitude'], entry['longitude'],
+                            int(image_hash, 16) if image_hash is not None else None,
+                            np.asarray(entry['text_indices'], dtype=np.int32),
+                            np.asarray(entry['text_values'], dtype=np.float32),
+                            entry.get('created_at'), entry.get('status', 'pending')
+                        )
+                    elif entry['op'] == 'remove':
+                        detector.remove_issue(entry['id'])
+                    applied += 1
+        finally:
+            detector.journal = journal
+    return applied, offset
+
+
+def save_snapshot(detector, snapshot_dir):
+    """
+    Write the live rows of the detector as a new snapshot generation and
+    start an empty journal for it. Returns the new generation.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    # Writers are blocked while the snapshot is taken, so nothing is lost
+    # between the snapshot and the new journal
+    with detector._lock:
+        previous = current_generation(snapshot_dir)
+        generation = previous + 1
+        final_dir = os.path.join(snapshot_dir, _snapshot_name(generation))
+        tmp_dir = final_dir + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        # Dead rows are compacted away
+        rows = np.flatnonzero(detector.alive.view())
+        text = detector.text_matrix.take(rows)
+        columns = {
+            'latitudes': detector.latitudes[rows],
+            'longitudes': detector.longitudes[rows],
+            'image_hashes': detector.image_hashes[rows],
+            'has_image_hash': detector.has_image_hash[rows],
+            'text_data': text.data.astype(np.float32),
+            'text_indices': text.indices.astype(np.int32),
+            'text_indptr': text.indptr.astype(np.int64),
+            'created_at': detector.created_at[rows],
+            'statuses': detector.statuses[rows]
+        }
+        for name, array in columns.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(array))
+
+        with open(os.path.join(tmp_dir, 'ids.json'), 'w') as f:
+            json.dump([detector.ids[row] for row in rows], f)
+
+        manifest = {
+            'format': SNAPSHOT_FORMAT,
+            'version': SNAPSHOT_VERSION,
+            'generation': generation,
+            'count': int(len(rows)),
+            'text_features': detector.text_matrix.n_features,
+            'created_at': datetime.now().isoformat(),
+            'columns': {
+                name: {'dtype': str(array.dtype), 'length': int(len(array))}
+                for name, array in columns.items()
+            }
+        }
+        with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        os.rename(tmp_dir, final_dir)
+        _write_current(snapshot_dir, _snapshot_name(generation))
+
+        # Switch the detector over to the new (empty) journal
+        if detector.journal is not None:
+            detector.journal.close()
+            detector.journal = IndexJournal(journal_path(snapshot_dir, generation), lock=detector.journal.lock)
+
+        # Older generations are no longer needed (open memory maps keep
+        # their files alive until they are closed)
+        if previous:
+            shutil.rmtree(os.path.join(snapshot_dir, _snapshot_name(previous)), ignore_errors=True)
+            try:
+                os.unlink(journal_path(snapshot_dir, previous))
+            except FileNotFoundError:
+                pass
+
+    print(f"✅ Saved duplicate index snapshot {generation} ({len(rows)} issues)")
+    return generation
+
+
+def _write_current(snapshot_dir, name):
+    tmp_path = os.path.join(snapshot_dir, CURRENT_FILE + '.tmp')
+    with open(tmp_path, 'w') as f:
+        f.write(name + '\n')
+    os.replace(tmp_path, os.path.join(snapshot_dir, CURRENT_FILE))
+
+
+def load_snapshot(detector, snapshot_dir, mmap=True, journal=True, lock=None):
+    """
+    Load the active snapshot into the detector and replay its journal.
+    With journal=True further changes are appended to that journal.
+    lock: DirectoryLock shared with other processes using the directory
+    Raises FileNotFoundError if there is no snapshot and ValueError if it
+    was written in an unsupported format.
+    """
+    if lock is not None:
+        # No other process appends or snapshots while the files are read
+        with detector._lock, lock.exclusive():
+            return _load_snapshot(detector, snapshot_dir, mmap, journal, lock)
+    return _load_snapshot(detector, snapshot_dir, mmap, journal, lock)
+
+
+def _load_snapshot(detector, snapshot_dir, mmap, journal, lock):
+    generation = current_generation(snapshot_dir)
+    if generation == 0:
+        raise FileNotFoundError(f"No duplicate index snapshot in {snapshot_dir}")
+
+    path = os.path.join(snapshot_dir, _snapshot_name(generation))
+    with open(os.path.join(path, 'manifest.json')) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != SNAPSHOT_FORMAT or manifest.get('version') not in READABLE_VERSIONS:
+        raise ValueError(
+            f"Unsupported snapshot {manifest.get('format')} v{manifest.get('version')}, "
+            f"expected {SNAPSHOT_FORMAT} v{SNAPSHOT_VERSION}"
+        )
+    if manifest['text_features'] != detector.text_matrix.n_features:
+        raise ValueError("Snapshot was built with a different text feature size")
+
+    # Copy-on-write maps: pages are shared with the page cache until written
+    mmap_mode = 'c' if mmap else None
+    columns = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+        for name in COLUMNS
+        if name in manifest['columns']
+    }
+    with open(os.path.join(path, 'ids.json')) as f:
+        ids = json.load(f)
+
+    detector.load_columns(ids, **columns)
+    replayed, offset = replay_journal(detector, journal_path(snapshot_dir, generation))
+
+    if journal:
+        if detector.journal is not None:
+            detector.journal.close()
+        detector.journal = IndexJournal(journal_path(snapshot_dir, generation), lock=lock)
+
+    print(f"✅ Loaded duplicate index snapshot {generation} "
+          f"({manifest['count']} issues, {replayed} journal entries)")
+    return {
+        'generation': generation,
+        'snapshot_issues': manifest['count'],
+        'journal_entries': replayed,
+        'journal_offset': offset
+    }
+
+
+def _journal_entries(snapshot_dir, generation):
+    """Complete, readable entries of a generation's journal"""
+    try:
+        with open(journal_path(snapshot_dir, generation), 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # still being written
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+    except FileNotFoundError:
+        pass
+
+
+def snapshot_issue_ids(snapshot_dir):
+    """String ids of the issues in the active snapshot and its journal, without loading columns"""
+    generation = current_generation(snapshot_dir)
+    if generation == 0:
+        return set()
+    with open(os.path.join(snapshot_dir, _snapshot_name(generation), 'ids.json')) as f:
+        ids = {str(issue_id) for issue_id in json.load(f)}
+    for entry in _journal_entries(snapshot_dir, generation):
+        if entry['op'] == 'insert':
+            ids.add(str(entry['id']))
+        elif entry['op'] == 'remove':
+            ids.discard(str(entry['id']))
+    return ids
+
+
+def snapshot_locations(snapshot_dir):
+    """
+    (latitudes, longitudes, created_at) of the issues in the active snapshot
+    and its journal, reading only those columns (and the ids when the
+    journal is not empty)
+    """
+    generation = current_generation(snapshot_dir)
+    if generation == 0:
+        return np.zeros(0), np.zeros(0), np.zeros(0)
+    path = os.path.join(snapshot_dir, _snapshot_name(generation))
+    latitudes = np.load(os.path.join(path, 'latitudes.npy'))
+    longitudes = np.load(os.path.join(path, 'longitudes.npy'))
+    try:
+        created_at = np.load(os.path.join(path, 'created_at.npy'))
+    except FileNotFoundError:  # version 1: rows load as created now
+        created_at = np.full(len(latitudes), time.time())
+
+    entries = list(_journal_entries(snapshot_dir, generation))
+    if not entries:
+        return latitudes, longitudes, created_at
+
+    # Replacements and removals: the latest entry per id wins
+    with open(os.path.join(path, 'ids.json')) as f:
+        rows = {str(issue_id): row for row, issue_id in enumerate(json.load(f))}
+    inserted = {}
+    for entry in entries:
+        key = str(entry['id'])
+        rows.pop(key, None)
+        inserted.pop(key, None)
+        if entry['op'] == 'insert':
+            created = entry.get('created_at')
+            inserted[key] = (entry['latitude'], entry['longitude'], created if created is not None else time.time())
+    kept = np.fromiter(rows.values(), dtype=np.intp, count=len(rows))
+    extra = np.array(list(inserted.values()), dtype=np.float64).reshape(-1, 3)
+    return (
+        np.concatenate([latitudes[kept], extra[:, 0]]),
+        np.concatenate([longitudes[kept], extra[:, 1]]),
+        np.concatenate([created_at[kept], extra[:, 2]])
+    )
+
+
+class SharedIndex:
+    """
+    A detector backed by a snapshot directory that several worker
+    processes serve from. Each maps the same snapshot files (one copy in
+    the page cache), journals its own changes under a shared flock and
+    applies the others' with poll(). A snapshot taken by any process makes
+    the others reload from it on their next poll.
+    """
+    def __init__(self, detector, snapshot_dir):
+        self.detector = detector
+        self.snapshot_dir = snapshot_dir
+        self.lock = DirectoryLock(snapshot_dir)
+        self.generation = 0
+        self.offset = 0
+        self.applied = 0
+        self.reloads = 0
+
+    def load(self):
+        """Load the current snapshot (see load_snapshot)"""
+        info = load_snapshot(self.detector, self.snapshot_dir, lock=self.lock)
+        self.generation = info['generation']
+        self.offset = info['journal_offset']
+        return info
+
+    def snapshot(self):
+        """
+        Snapshot the index, including every process's changes, and remap it
+        from the new files; returns the generation
+        """
+        with self.detector._lock, self.lock.exclusive():
+            self.poll()
+            generation = save_snapshot(self.detector, self.snapshot_dir)
+            # Serve from the mapped files too, instead of private copies
+            self.load()
+        return generation
+
+    def poll(self):
+        """Apply changes other processes made since the last poll, returns how many"""
+        with self.detector._lock:
+            generation = current_generation(self.snapshot_dir)
+            if generation == 0:
+                return 0
+            if generation != self.generation:
+                try:
+                    info = self.load()
+                except FileNotFoundError:
+                    return 0  # replaced by an even newer snapshot, retry next poll
+                self.reloads += 1
+                return info['snapshot_issues'] + info['journal_entries']
+
+            path = journal_path(self.snapshot_dir, generation)
+            try:
+                if os.path.getsize(path) <= self.offset:
+                    return 0
+            except FileNotFoundError:
+                return 0
+            applied, self.offset = replay_journal(
+                self.detector, path, self.offset, skip_pid=os.getpid(), writers_done=False
+            )
+            self.applied += applied
+            return applied
+
+    def stats(self):
+        return {
+            'generation': self.generation,
+            'journal_offset': self.offset,
+            'applied_from_other_workers': self.applied,
+            'reloads': self.reloads,
+            'pid': os.getpid()
+        }
@@ -0,0 +1,82 @@
+"""
+Bounded worker pool for the CPU-bound prediction pipeline
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+
+class PoolSaturatedError(Exception):
+    """Every worker is busy and the wait queue is full"""
+    def __init__(self, retry_after_seconds):
+        super().__init__("Inference queue is full")
+        self.retry_after_seconds = retry_after_seconds
+
+
+class InferencePool:
+    """
+    Runs blocking work off the event loop on a fixed number of threads.
+    At most `workers + max_queue` calls are admitted at once; beyond that
+    run() fails fast with PoolSaturatedError so latency cannot grow without
+    bound. Only part of the pipeline releases the GIL (image decoding and
+    resizing in OpenCV/PIL, NumPy array math); the compiled forest traversal,
+    the geodesic distances and the Python glue hold it. Threads therefore
+    overlap decoding with the rest and keep the event loop free, but a single
+    process stays close to one core of Python work; use several worker
+    processes (WEB_CONCURRENCY) to scale across cores.
+    """
+    def __init__(self, workers=None, max_queue=32, retry_after_seconds=1):
+        self.workers = workers or os.cpu_count() or 4
+        self.max_queue = max_queue
+        self.retry_after_seconds = retry_after_seconds
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='inference')
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @property
+    def capacity(self):
+        return self.workers + self.max_queue
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on the pool, or raise PoolSaturatedError"""
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self.rejected += 1
+                raise PoolSaturatedError(self.retry_after_seconds)
+            self._in_flight += 1
+
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+        with self._lock:
+            self.completed += 1
+        return result
+
+    def stats(self):
+        with self._lock:
+            in_flight = self._in_flight
+            return {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'in_flight': in_flight,
+                'queue_depth': max(0, in_flight - self.workers),
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
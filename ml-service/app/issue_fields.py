@@ -0,0 +1,34 @@
+"""
+Issue status and timestamp fields shared by the index, ingest and API
+"""
+from datetime import datetime
+
+# Issue statuses (as in the backend's Issue model), stored as uint8 codes
+STATUSES = ('pending', 'processing', 'resolved', 'rejected')
+OPEN_STATUSES = ('pending', 'processing')
+
+
+def status_code(status):
+    """uint8 code of a status name, raises ValueError for unknown statuses"""
+    try:
+        return STATUSES.index(status)
+    except ValueError:
+        raise ValueError(f"Unknown status {status!r}, expected one of {', '.join(STATUSES)}")
+
+
+def parse_timestamp(value):
+    """
+    Epoch seconds from an ISO 8601 string, epoch seconds/milliseconds or a
+    MongoDB extended JSON {"$date": ...}; None if value is None
+    """
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        value = value.get('$date', value.get('$numberLong'))
+        if isinstance(value, dict):
+            value = int(value['$numberLong'])
+        return parse_timestamp(value)
+    if isinstance(value, (int, float)):
+        # Millisecond timestamps (JavaScript Date.now()) are > 1e11
+        return value / 1000.0 if value > 1e11 else float(value)
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
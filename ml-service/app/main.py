@@ -1,29 +1,216 @@
 """
 ML Microservice API Server
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional, Union
 import os
 import json
-import requests
-from io import BytesIO
-from PIL import Image
-import tempfile
+import asyncio
+import threading
 
-from category_predictor import CategoryPredictor
-from duplicate_detector import DuplicateDetector
-from priority_assigner import PriorityAssigner
-from authenticity_checker import AuthenticityChecker
+from priority_assigner import PriorityAssigner, load_priority_rules
+from hash_utils import parse_hex_hash
+from feature_cache import FeatureCache
+from result_cache import PredictionCache, prediction_key
+from metrics import MetricsRegistry, StageTimings
+from image_fetcher import ImageFetcher, ImageFetchError
+from inference_pool import InferencePool, PoolSaturatedError
+from bulk_ingest import DEFAULT_CHUNK_SIZE, IngestProgress
+from issue_fields import STATUSES, parse_timestamp
+from startup import StartupProgress
 
 # Initialize FastAPI app
 app = FastAPI(title="Civic Issue ML Service", version="1.0.0")
 
-# Initialize ML components
-category_predictor = CategoryPredictor()
-duplicate_detector = DuplicateDetector(location_radius_meters=100, similarity_threshold=0.80)
-priority_assigner = PriorityAssigner()
-authenticity_checker = AuthenticityChecker()
+# Initialize ML components. The heavy ones (OpenCV, scikit-learn, PIL,
+# geopy) are imported and built by load_components() at startup, so this
+# module imports quickly and liveness probes answer right away
+category_predictor = None
+duplicate_detector = None
+authenticity_checker = None
+# index_snapshot.SharedIndex over DUPLICATE_INDEX_DIR, or the
+# RegionalDuplicateIndex (which is also duplicate_detector) when sharded
+shared_index = None
+# Issues within REPEAT_WINDOW_DAYS reported this often nearby raise the priority
+priority_assigner = PriorityAssigner(
+    repeat_window_seconds=float(os.getenv('REPEAT_WINDOW_DAYS', 30)) * 86400,
+    repeat_threshold=int(os.getenv('REPEAT_REPORT_THRESHOLD', 3))
+)
+image_fetcher = ImageFetcher(max_bytes=int(os.getenv('MAX_IMAGE_BYTES', 10 * 1024 * 1024)))
+
+# Per-image features keyed by content digest (retries and re-uploads skip decoding)
+feature_cache = FeatureCache(max_bytes=int(os.getenv('FEATURE_CACHE_BYTES', 64 * 1024 * 1024)))
+
+# Recent /predict results; identical in-flight requests share one computation
+prediction_cache = PredictionCache(
+    ttl_seconds=float(os.getenv('PREDICTION_CACHE_TTL_SECONDS', 30)),
+    max_entries=int(os.getenv('PREDICTION_CACHE_SIZE', 10000))
+)
+
+# Worker pool for CPU-bound inference with a bounded wait queue
+inference_pool = InferencePool(
+    workers=int(os.getenv('INFERENCE_WORKERS', 0)) or None,
+    max_queue=int(os.getenv('INFERENCE_QUEUE_SIZE', 32))
+)
+
+# Largest /predict/batch request
+MAX_PREDICT_BATCH = int(os.getenv('MAX_PREDICT_BATCH', 100))
+
+# Largest /priority/batch request, and the rules table (JSON, see
+# priority_assigner) loaded at startup if present
+MAX_PRIORITY_BATCH = int(os.getenv('MAX_PRIORITY_BATCH', 100000))
+PRIORITY_RULES_PATH = os.getenv('PRIORITY_RULES_PATH', '../data/priority_rules.json')
+
+# Online learning from confirmed labels (POST /feedback): checkpoints go
+# to ONLINE_MODEL_DIR, the online model serves predictions once it has
+# learned ONLINE_MIN_SAMPLES confirmed labels and scores at least as well
+# as the forest on recent feedback, and workers pick up checkpoints
+# written by the others every ONLINE_RELOAD_INTERVAL_SECONDS
+ONLINE_LEARNING = os.getenv('ONLINE_LEARNING', '0') == '1'
+ONLINE_MODEL_DIR = os.getenv('ONLINE_MODEL_DIR', '../models/online')
+ONLINE_MIN_SAMPLES = int(os.getenv('ONLINE_MIN_SAMPLES', 100))
+ONLINE_RELOAD_INTERVAL_SECONDS = float(os.getenv('ONLINE_RELOAD_INTERVAL_SECONDS', 10))
+MAX_FEEDBACK_BATCH = int(os.getenv('MAX_FEEDBACK_BATCH', 100))
+
+# Optional micro-batching of concurrent /predict calls into one forest call
+MICRO_BATCH_WAIT_MS = float(os.getenv('MICRO_BATCH_WAIT_MS', 0))
+
+# Load the model and the index in the background: the server accepts
+# connections immediately and /health/ready turns 200 once loaded
+FAST_START = os.getenv('FAST_START', '0') == '1'
+startup = StartupProgress(['imports', 'category_model', 'duplicate_index'])
+
+# On-disk snapshot + journal of the duplicate index
+DUPLICATE_INDEX_DIR = os.getenv('DUPLICATE_INDEX_DIR', '../data/duplicate_index')
+
+# How often changes other worker processes journaled are applied
+# (uvicorn --workers N share DUPLICATE_INDEX_DIR), 0 disables
+INDEX_SYNC_INTERVAL_MS = float(os.getenv('INDEX_SYNC_INTERVAL_MS', 200))
+
+# Issues the index is rebuilt from when there is no snapshot (.json, or
+# .jsonl for a streaming background ingest)
+DUPLICATE_INDEX_SOURCE = os.getenv('DUPLICATE_INDEX_SOURCE', '../data/training_data.json')
+
+# Known fake/stock image hashes loaded at startup (hex per line or .npy),
+# and how many bits an image may differ from one and still be flagged
+KNOWN_FAKES_PATH = os.getenv('KNOWN_FAKES_PATH', '../data/known_fakes.txt')
+FAKE_HASH_MAX_DISTANCE = int(os.getenv('FAKE_HASH_MAX_DISTANCE', 6))
+
+# Issues older than this many days (0 = no limit) or whose status is not
+# listed (comma separated) stop matching as duplicates; they are dropped
+# from memory every DUPLICATE_EVICTION_INTERVAL_SECONDS
+DUPLICATE_MAX_AGE_DAYS = float(os.getenv('DUPLICATE_MAX_AGE_DAYS', 0))
+DUPLICATE_MATCH_STATUSES = os.getenv('DUPLICATE_MATCH_STATUSES', 'pending,processing').split(',')
+DUPLICATE_EVICTION_INTERVAL_SECONDS = float(os.getenv('DUPLICATE_EVICTION_INTERVAL_SECONDS', 300))
+
+# Geohash precision of per-region index shards (0 = one index for all
+# locations), loaded on first use and evicted LRU beyond the memory budget
+DUPLICATE_REGION_PRECISION = int(os.getenv('DUPLICATE_REGION_PRECISION', 0))
+DUPLICATE_REGION_MEMORY_MB = float(os.getenv('DUPLICATE_REGION_MEMORY_MB', 512))
+
+# Bulk ingest progress (one ingest at a time)
+ingest_progress = IngestProgress()
+ingest_lock = threading.Lock()
+
+# Prometheus metrics (GET /metrics)
+metrics = MetricsRegistry()
+stage_latency = metrics.histogram(
+    'civic_ml_stage_duration_seconds', 'Latency of each prediction stage', ['stage']
+)
+predictions_total = metrics.counter(
+    'civic_ml_predictions_total', 'Issues predicted', ['endpoint']
+)
+errors_total = metrics.counter(
+    'civic_ml_errors_total', 'Failed predictions by HTTP status', ['endpoint', 'status']
+)
+fallbacks_total = metrics.counter(
+    'civic_ml_category_fallbacks_total', 'Low-confidence predictions answered with "Other"'
+)
+duplicate_hits_total = metrics.counter(
+    'civic_ml_duplicate_hits_total', 'Predictions flagged as duplicates'
+)
+metrics.callback(
+    'civic_ml_prediction_cache_events_total', 'Prediction result cache lookups', 'counter',
+    lambda: {
+        'hit': prediction_cache.hits,
+        'miss': prediction_cache.misses,
+        'coalesced': prediction_cache.coalesced
+    },
+    ['result']
+)
+metrics.callback(
+    'civic_ml_feature_cache_events_total', 'Per-image feature cache events', 'counter',
+    lambda: {
+        'hit': feature_cache.hits,
+        'miss': feature_cache.misses,
+        'eviction': feature_cache.evictions
+    },
+    ['event']
+)
+metrics.callback(
+    'civic_ml_feature_cache_bytes', 'Approximate size of the feature cache', 'gauge',
+    lambda: feature_cache.current_bytes
+)
+metrics.callback(
+    'civic_ml_inference_in_flight', 'Pipeline calls running or queued', 'gauge',
+    lambda: inference_pool.stats()['in_flight']
+)
+metrics.callback(
+    'civic_ml_inference_rejected_total', 'Calls rejected with 503 (queue full)', 'counter',
+    lambda: inference_pool.rejected
+)
+metrics.callback(
+    'civic_ml_duplicate_index_issues', 'Issues in the duplicate index', 'gauge',
+    lambda: duplicate_detector.issue_count if duplicate_detector is not None else 0
+)
+metrics.callback(
+    'civic_ml_duplicate_index_evicted_total', 'Issues dropped from the index as closed or expired', 'counter',
+    lambda: duplicate_detector.evicted if duplicate_detector is not None else 0
+)
+region_load_seconds = metrics.histogram(
+    'civic_ml_region_load_seconds', 'Time to load a duplicate index region shard', ['region']
+)
+metrics.callback(
+    'civic_ml_region_shard_events_total', 'Region shard lookups and evictions', 'counter',
+    lambda: {
+        (region, event): stats[event]
+        for region, stats in (
+            shared_index.stats()['regions'].items()
+            if DUPLICATE_REGION_PRECISION > 0 and shared_index is not None else ()
+        )
+        for event in ('hits', 'misses', 'evictions')
+    },
+    ['region', 'event']
+)
+metrics.callback(
+    'civic_ml_online_model_version', 'Checkpoint version of the online category model', 'gauge',
+    lambda: category_predictor.model_version if category_predictor is not None else 0
+)
+metrics.callback(
+    'civic_ml_ready', 'Whether startup has finished (1) or not (0)', 'gauge',
+    lambda: int(startup.ready)
+)
+
+# Add a Server-Timing header with the per-stage breakdown to predictions
+STAGE_TIMING_HEADER = os.getenv('STAGE_TIMING_HEADER', '0') == '1'
+
+# The event loop only keeps weak references to tasks, so the periodic loops
+# are held here until shutdown cancels them
+background_tasks = set()
+
+def start_background_task(coro):
+    """Run coro as a task that is logged if it fails and cancelled on shutdown"""
+    task = asyncio.ensure_future(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_task_done)
+    return task
+
+def background_task_done(task):
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"⚠️  Background task {task.get_coro().__name__} stopped: {task.exception()!r}")
 
 # Load models on startup
 @app.on_event("startup")
@@ -31,22 +218,206 @@ async def load_models():
     """Load trained models"""
     print("🚀 Starting ML Service...")
     
+    # Shared HTTP connection pool for image downloads
+    await image_fetcher.start()
+    
+    if FAST_START:
+        threading.Thread(target=load_components_in_background, name='startup', daemon=True).start()
+    else:
+        await asyncio.to_thread(load_components)
+    
+    if DUPLICATE_EVICTION_INTERVAL_SECONDS > 0:
+        start_background_task(evict_expired_issues())
+    if INDEX_SYNC_INTERVAL_MS > 0:
+        start_background_task(sync_index())
+    if ONLINE_LEARNING and ONLINE_RELOAD_INTERVAL_SECONDS > 0:
+        start_background_task(reload_online_model())
+
+async def sync_index():
+    """Apply index changes made by the other worker processes"""
+    while True:
+        await asyncio.sleep(INDEX_SYNC_INTERVAL_MS / 1000)
+        if not components_ready():
+            continue
+        try:
+            await asyncio.to_thread(shared_index.poll)
+        except Exception as e:
+            print(f"⚠️  Duplicate index sync failed: {e}")
+
+async def reload_online_model():
+    """Switch to online model checkpoints written by the other worker processes"""
+    while True:
+        await asyncio.sleep(ONLINE_RELOAD_INTERVAL_SECONDS)
+        if not components_ready():
+            continue
+        try:
+            if await asyncio.to_thread(category_predictor.online.reload):
+                print(f"🔄 Online category model updated to version {category_predictor.model_version}")
+        except Exception as e:
+            print(f"⚠️  Online model reload failed: {e}")
+
+async def evict_expired_issues():
+    """Periodically drop closed and expired issues from the duplicate index"""
+    while True:
+        await asyncio.sleep(DUPLICATE_EVICTION_INTERVAL_SECONDS)
+        if not components_ready():
+            continue
+        try:
+            evicted = await asyncio.to_thread(duplicate_detector.evict_expired)
+        except Exception as e:
+            print(f"⚠️  Duplicate index eviction failed: {e}")
+            continue
+        if evicted:
+            print(f"🧹 Evicted {evicted} closed/expired issues from the duplicate index")
+
+def load_components():
+    """Import and build the ML components, then load the model and the index"""
+    global category_predictor, duplicate_detector, authenticity_checker, shared_index
+    
+    with startup.stage('imports'):
+        from category_predictor import CategoryPredictor
+        from duplicate_detector import DuplicateDetector
+        from authenticity_checker import AuthenticityChecker
+        
+        category_predictor = CategoryPredictor()
+        def make_detector():
+            return DuplicateDetector(
+                location_radius_meters=100, similarity_threshold=0.80,
+                max_age_seconds=DUPLICATE_MAX_AGE_DAYS * 86400 if DUPLICATE_MAX_AGE_DAYS > 0 else None,
+                match_statuses=[status.strip() for status in DUPLICATE_MATCH_STATUSES if status.strip()]
+            )
+        
+        if DUPLICATE_REGION_PRECISION > 0:
+            from region_index import RegionalDuplicateIndex
+            duplicate_detector = RegionalDuplicateIndex(
+                DUPLICATE_INDEX_DIR, make_detector, precision=DUPLICATE_REGION_PRECISION,
+                memory_budget_bytes=int(DUPLICATE_REGION_MEMORY_MB * 1024 * 1024),
+                load_histogram=region_load_seconds
+            )
+            shared_index = duplicate_detector
+        else:
+            duplicate_detector = make_detector()
+            shared_index = None
+        authenticity_checker = AuthenticityChecker(max_hash_distance=FAKE_HASH_MAX_DISTANCE)
+        if os.path.isfile(KNOWN_FAKES_PATH):
+            known = authenticity_checker.load_known_fakes(KNOWN_FAKES_PATH)
+            print(f"✅ Loaded {known} known fake image hashes")
+        if os.path.isfile(PRIORITY_RULES_PATH):
+            priority_assigner.set_rules(load_priority_rules(PRIORITY_RULES_PATH))
+            print(f"✅ Loaded priority rules from {PRIORITY_RULES_PATH}")
+        if MICRO_BATCH_WAIT_MS > 0:
+            category_predictor.enable_micro_batching(
+                max_batch_size=int(os.getenv('MICRO_BATCH_MAX_SIZE', 32)),
+                max_wait_ms=MICRO_BATCH_WAIT_MS
+            )
+    
     # Try to load pre-trained models
-    model_loaded = category_predictor.load('../models')
+    with startup.stage('category_model'):
+        model_loaded = category_predictor.load(
+            '../models', compiled=os.getenv('CATEGORY_MODEL_FORMAT', 'compiled') == 'compiled'
+        )
+        
+        if not model_loaded:
+            print("⚠️  No pre-trained model found. Run train.py first!")
+        
+        if ONLINE_LEARNING:
+            online = category_predictor.enable_online_learning(ONLINE_MODEL_DIR, ONLINE_MIN_SAMPLES)
+            print(f"✅ Online learning enabled (version {online.version}, "
+                  f"{online.feedback_samples} confirmed labels)")
     
-    if not model_loaded:
-        print("⚠️  No pre-trained model found. Run train.py first!")
+    # Load the duplicate index from its snapshot, building it from the
+    # training data the first time. With several workers the first one to
+    # get here builds it while the others wait, then they all map it
+    from index_snapshot import SharedIndex, acquire_build_lock
     
-    # Load training data for duplicate detection
+    startup.begin('duplicate_index')
+    release_build_lock = acquire_build_lock(DUPLICATE_INDEX_DIR)
     try:
-        with open('../data/training_data.json', 'r') as f:
-            dataset = json.load(f)
-            duplicate_detector.load_existing_issues(dataset)
-    except:
-        print("⚠️  No training data found for duplicate detection")
+        if shared_index is None:
+            shared_index = SharedIndex(duplicate_detector, DUPLICATE_INDEX_DIR)
+        shared_index.load()
+        count_repeat_reports()
+    except (FileNotFoundError, ValueError) as e:
+        print(f"⚠️  {e}, rebuilding duplicate index")
+        count_repeat_reports()
+        if DUPLICATE_INDEX_SOURCE.endswith('.jsonl') and os.path.exists(DUPLICATE_INDEX_SOURCE):
+            # Serve while the issues stream in; the service is ready (and
+            # the index stage done) when the ingest finishes
+            def on_finish(error):
+                release_build_lock()
+                finish_index_stage(error)
+            start_ingest(DUPLICATE_INDEX_SOURCE, DEFAULT_CHUNK_SIZE, True, on_finish=on_finish)
+            return
+        try:
+            with open(DUPLICATE_INDEX_SOURCE, 'r') as f:
+                dataset = json.load(f)
+                duplicate_detector.load_existing_issues(dataset)
+        except:
+            print("⚠️  No training data found for duplicate detection")
+        
+        persist_index()
+    except Exception as e:
+        release_build_lock()
+        startup.fail('duplicate_index', e)
+        raise
     
+    release_build_lock()
+    finish_index_stage(None)
+
+def count_repeat_reports():
+    """Feed the repeat-report counter from the index: its issues now, new ones as they are added"""
+    priority_assigner.repeat_counter.clear()
+    duplicate_detector.watch_inserts(priority_assigner.record_reports)
+
+def finish_index_stage(error):
+    if error is not None:
+        startup.fail('duplicate_index', error)
+        return
+    startup.complete('duplicate_index')
     print("✅ ML Service ready!")
 
+def load_components_in_background():
+    try:
+        load_components()
+    except Exception as e:
+        print(f"❌ Startup failed: {e}")  # reported on /health/ready
+
+def persist_index():
+    """Snapshot the duplicate index and journal the changes made after it"""
+    try:
+        shared_index.snapshot()
+    except OSError as e:
+        print(f"⚠️  Could not persist duplicate index: {e}")
+
+def start_ingest(path: str, chunk_size: int, fetch_images: bool, on_finish=None) -> bool:
+    """
+    Bulk-load a JSONL file in a background thread; False if one is running.
+    on_finish(error) is called when it ends (error is None on success).
+    """
+    from bulk_ingest import ingest_jsonl
+    
+    if not ingest_lock.acquire(blocking=False):
+        return False
+    ingest_progress.reset(path, os.path.getsize(path))
+    
+    def run():
+        error = None
+        try:
+            ingest_jsonl(
+                duplicate_detector, path, chunk_size=chunk_size,
+                fetch_images=fetch_images, progress=ingest_progress
+            )
+            persist_index()
+        except Exception as e:
+            error = e  # also reported through ingest_progress
+        finally:
+            ingest_lock.release()
+        if on_finish is not None:
+            on_finish(error)
+    
+    threading.Thread(target=run, name='bulk-ingest', daemon=True).start()
+    return True
+
 # Request model
 class PredictRequest(BaseModel):
     imageURL: str
@@ -59,98 +430,547 @@ class PredictResponse(BaseModel):
     category: str
     confidence: float
     isDuplicate: bool
-    duplicateIssueId: Optional[int]
+    duplicateIssueId: Optional[Union[int, str]]
     priority: str
     authentic: bool
 
-def download_image(url: str) -> str:
-    """Download image from URL and save to temp file"""
+# Batch prediction models
+class BatchPredictRequest(BaseModel):
+    issues: List[PredictRequest]
+
+class BatchPredictItem(BaseModel):
+    result: Optional[PredictResponse] = None
+    error: Optional[str] = None
+
+class BatchPredictResponse(BaseModel):
+    results: List[BatchPredictItem]
+
+# Batch priority models
+class PriorityItem(BaseModel):
+    category: str
+    description: str
+    latitude: Optional[float] = None  # without coordinates repeat reports are not counted
+    longitude: Optional[float] = None
+    isDuplicate: bool = False
+
+class PriorityBatchRequest(BaseModel):
+    issues: List[PriorityItem]
+
+class PriorityBatchResponse(BaseModel):
+    priorities: List[str]
+
+# Confirmed label models
+class FeedbackItem(BaseModel):
+    description: str
+    category: str  # the confirmed (or corrected) category
+    imageURL: Optional[str] = None  # without an image only the text is learned from
+
+class FeedbackRequest(BaseModel):
+    items: List[FeedbackItem]
+
+class FeedbackResponse(BaseModel):
+    learned: int
+    version: int  # online model version after the update
+    errors: List[Optional[str]]  # per item, e.g. an image that could not be fetched
+
+# Issue registration models
+class IssueRequest(BaseModel):
+    id: Union[int, str]
+    description: str
+    latitude: float
+    longitude: float
+    imageURL: Optional[str] = None
+    imageHash: Optional[str] = None  # hex average_hash, skips the image download
+    status: str = 'pending'
+    createdAt: Optional[Union[float, str]] = None  # ISO 8601 or epoch seconds/ms, default now
+
+class IngestRequest(BaseModel):
+    path: str  # JSONL file readable by the service
+    chunkSize: int = DEFAULT_CHUNK_SIZE
+    fetchImages: bool = True  # hash images of records without imageHash
+
+class KnownFakesRequest(BaseModel):
+    path: Optional[str] = None  # hex-per-line or .npy file readable by the service
+    hashes: List[str] = []  # hex average_hash values
+
+class IssueUpdateRequest(BaseModel):
+    description: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    imageURL: Optional[str] = None
+    imageHash: Optional[str] = None
+    status: Optional[str] = None  # closed statuses stop matching as duplicates
+
+def check_status(status: Optional[str]):
+    """400 for a status the backend's Issue model does not know"""
+    if status is not None and status not in STATUSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown status {status!r}, expected one of {', '.join(STATUSES)}"
+        )
+
+def components_ready() -> bool:
+    """Components loaded; the index may still be streaming in from a bulk ingest"""
+    return startup.is_done('imports', 'category_model') and (
+        startup.is_done('duplicate_index') or ingest_progress.running
+    )
+
+def require_ready():
+    """503 while the service is still starting"""
+    if not components_ready():
+        raise HTTPException(
+            status_code=503,
+            detail="ML service is starting, retry later",
+            headers={"Retry-After": "1"}
+        )
+
+async def fetch_image(url: str) -> 'ImageContext':
+    """Fetch the original image bytes into memory (no temp file, no re-encode)"""
+    from image_context import ImageContext
+    
     try:
-        # Handle file:// URLs (for testing)
-        if url.startswith('file://'):
-            return url.replace('file://', '')
-        
-        # Download from HTTP/HTTPS
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        
-        # Save to temp file
-        img = Image.open(BytesIO(response.content))
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.jpg')
-        img.save(temp_file.name, 'JPEG')
-        temp_file.close()
-        
-        return temp_file.name
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Could not download image: {str(e)}")
+        data = await image_fetcher.fetch(url)
+    except ImageFetchError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return ImageContext(data, source=url)
+
+async def resolve_image_hash(image_url: Optional[str], image_hash: Optional[str]) -> Optional[int]:
+    """Packed image hash from a precomputed hex hash or by fetching the image"""
+    if image_hash:
+        try:
+            return parse_hex_hash(image_hash)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid imageHash: {str(e)}")
+    if image_url:
+        image = await fetch_image(image_url)
+        return await asyncio.to_thread(cached_packed_hash, image)
+    return None
+
+def cached_packed_hash(image: 'ImageContext') -> Optional[int]:
+    """Packed image hash, served from the feature cache when possible"""
+    from image_context import compute_packed_hash
+    
+    feature_cache.attach(image)
+    packed_hash = compute_packed_hash(image)
+    feature_cache.store(image)
+    return packed_hash
+
+def run_pipeline(image: 'ImageContext', description: str, latitude: float, longitude: float,
+                 timings: StageTimings) -> PredictResponse:
+    """CPU-bound prediction stages (runs on the inference pool)"""
+    feature_cache.attach(image)
+    
+    # 1. Category Prediction (includes decoding the image on a cache miss)
+    with timings.stage('category'):
+        category, confidence = category_predictor.predict(image, description)
+    
+    return complete_prediction(image, description, latitude, longitude, category, confidence, timings)
+
+def run_batch_pipeline(images: List['ImageContext'], issues: List[PredictRequest],
+                       timings: StageTimings) -> List[PredictResponse]:
+    """Batch variant: category prediction for all issues in one forest call"""
+    for image in images:
+        feature_cache.attach(image)
+    
+    # 1. Category Prediction
+    with timings.stage('category_batch'):
+        predictions = category_predictor.predict_batch(images, [issue.description for issue in issues])
+    
+    return [
+        complete_prediction(image, issue.description, issue.latitude, issue.longitude,
+                            category, confidence, timings)
+        for image, issue, (category, confidence) in zip(images, issues, predictions)
+    ]
+
+def complete_prediction(image: 'ImageContext', description: str, latitude: float, longitude: float,
+                        category: str, confidence: float, timings: StageTimings) -> PredictResponse:
+    """Stages after category prediction"""
+    # Check confidence threshold
+    if confidence < 0.70:
+        category = "Other"  # Fallback category
+        fallbacks_total.inc()
+    
+    # 2. Duplicate Detection
+    with timings.stage('duplicate'):
+        is_duplicate, duplicate_id, similarity = duplicate_detector.check_duplicate(
+            image, description, latitude, longitude
+        )
+    if is_duplicate:
+        duplicate_hits_total.inc()
+    
+    # 3. Priority Assignment
+    with timings.stage('priority'):
+        priority = priority_assigner.assign_priority(
+            category, description, latitude, longitude, is_duplicate
+        )
+    
+    # 4. Authenticity Check
+    with timings.stage('authenticity'):
+        is_authentic, auth_confidence, auth_details = authenticity_checker.verify_authenticity(image)
+    
+    feature_cache.store(image)
+    
+    return PredictResponse(
+        category=category,
+        confidence=round(confidence, 2),
+        isDuplicate=is_duplicate,
+        duplicateIssueId=duplicate_id,
+        priority=priority,
+        authentic=is_authentic
+    )
+
+def overloaded(e: PoolSaturatedError) -> HTTPException:
+    """Fast rejection while the inference queue is full"""
+    return HTTPException(
+        status_code=503,
+        detail="ML service is overloaded, retry later",
+        headers={"Retry-After": str(e.retry_after_seconds)}
+    )
 
 @app.post("/predict", response_model=PredictResponse)
-async def predict(request: PredictRequest):
+async def predict(request: PredictRequest, response: Response):
     """
     Main prediction endpoint
     """
+    require_ready()
+    timings = StageTimings(stage_latency)
     try:
-        # Download image
-        image_path = download_image(request.imageURL)
-        
-        # 1. Category Prediction
-        category, confidence = category_predictor.predict(image_path, request.description)
-        
-        # Check confidence threshold
-        if confidence < 0.70:
-            category = "Other"  # Fallback category
+        # Fetch image; it is decoded once and shared by every stage
+        with timings.stage('download'):
+            image = await fetch_image(request.imageURL)
         
-        # 2. Duplicate Detection
-        is_duplicate, duplicate_id, similarity = duplicate_detector.check_duplicate(
-            image_path, request.description, request.latitude, request.longitude
-        )
+        # Retries of the same payload against the same duplicate index are
+        # answered from the result cache or join the computation in flight
+        digest = await asyncio.to_thread(lambda: image.digest)
+        key = prediction_key(digest, request.description, request.latitude, request.longitude)
         
-        # 3. Priority Assignment
-        priority = priority_assigner.assign_priority(
-            category, request.description, request.latitude, request.longitude, is_duplicate
+        # Run the CPU-bound stages off the event loop
+        result, outcome = await prediction_cache.get_or_compute(
+            key,
+            (duplicate_detector.version, category_predictor.model_version, authenticity_checker.version),
+            lambda: inference_pool.run(
+                run_pipeline, image, request.description, request.latitude, request.longitude, timings
+            )
         )
-        
-        # 4. Authenticity Check
-        is_authentic, auth_confidence, auth_details = authenticity_checker.verify_authenticity(image_path)
-        
-        # Clean up temp file if it was downloaded
-        if not request.imageURL.startswith('file://'):
-            try:
-                os.unlink(image_path)
-            except:
-                pass
-        
-        # Return response
-        return PredictResponse(
-            category=category,
-            confidence=round(confidence, 2),
-            isDuplicate=is_duplicate,
-            duplicateIssueId=duplicate_id,
-            priority=priority,
-            authentic=is_authentic
-        )
-        
+    
+    except PoolSaturatedError as e:
+        errors_total.inc(endpoint='predict', status='503')
+        raise overloaded(e)
+    except HTTPException as e:
+        errors_total.inc(endpoint='predict', status=str(e.status_code))
+        raise
     except Exception as e:
+        errors_total.inc(endpoint='predict', status='500')
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+    
+    predictions_total.inc(endpoint='predict')
+    if STAGE_TIMING_HEADER:
+        if outcome != 'miss':
+            # The pipeline ran on the timings of the request that computed it
+            timings.mark('cache', outcome)
+        response.headers['Server-Timing'] = timings.server_timing()
+    return result
+
+@app.post("/predict/batch", response_model=BatchPredictResponse)
+async def predict_batch(request: BatchPredictRequest, response: Response):
+    """
+    Predict many issues at once (bulk imports). Items whose image cannot be
+    fetched get an error entry; the rest share one batched model call.
+    """
+    require_ready()
+    if len(request.issues) > MAX_PREDICT_BATCH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_PREDICT_BATCH} issues per batch, got {len(request.issues)}"
+        )
+    
+    timings = StageTimings(stage_latency)
+    
+    # Fetch all images concurrently
+    with timings.stage('download_batch'):
+        fetched = await asyncio.gather(
+            *[fetch_image(issue.imageURL) for issue in request.issues], return_exceptions=True
+        )
+    
+    items = [None] * len(request.issues)
+    ok = []
+    for index, image in enumerate(fetched):
+        if isinstance(image, HTTPException):
+            items[index] = BatchPredictItem(error=image.detail)
+            errors_total.inc(endpoint='predict_batch', status=str(image.status_code))
+        elif isinstance(image, Exception):
+            items[index] = BatchPredictItem(error=f"Could not fetch image: {str(image)}")
+            errors_total.inc(endpoint='predict_batch', status='400')
+        else:
+            ok.append(index)
+    
+    if ok:
+        try:
+            results = await inference_pool.run(
+                run_batch_pipeline, [fetched[i] for i in ok], [request.issues[i] for i in ok], timings
+            )
+        except PoolSaturatedError as e:
+            errors_total.inc(len(ok), endpoint='predict_batch', status='503')
+            raise overloaded(e)
+        except Exception as e:
+            errors_total.inc(len(ok), endpoint='predict_batch', status='500')
+            raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+        for index, result in zip(ok, results):
+            items[index] = BatchPredictItem(result=result)
+        predictions_total.inc(len(ok), endpoint='predict_batch')
+    
+    if STAGE_TIMING_HEADER:
+        response.headers['Server-Timing'] = timings.server_timing()
+    return BatchPredictResponse(results=items)
+
+@app.post("/priority/batch", response_model=PriorityBatchResponse)
+def prioritize_batch(request: PriorityBatchRequest):
+    """
+    Priorities for many issues at once (re-prioritizing the backlog), with
+    the same rules as /predict; runs column-wise over the whole batch
+    """
+    require_ready()
+    if len(request.issues) > MAX_PRIORITY_BATCH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_PRIORITY_BATCH} issues per batch, got {len(request.issues)}"
+        )
+    issues = request.issues
+    priorities = priority_assigner.assign_priorities(
+        [issue.category for issue in issues],
+        [issue.description for issue in issues],
+        [issue.latitude for issue in issues],
+        [issue.longitude for issue in issues],
+        [issue.isDuplicate for issue in issues]
+    )
+    return PriorityBatchResponse(priorities=priorities)
+
+@app.post("/feedback", response_model=FeedbackResponse)
+async def learn_feedback(request: FeedbackRequest):
+    """
+    Confirmed categories for the online model (ONLINE_LEARNING=1). The
+    batch is learned and checkpointed at once; items whose image cannot
+    be fetched are skipped and reported in errors.
+    """
+    require_ready()
+    if category_predictor.online is None:
+        raise HTTPException(status_code=404, detail="Online learning is not enabled")
+    if len(request.items) > MAX_FEEDBACK_BATCH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_FEEDBACK_BATCH} items per batch, got {len(request.items)}"
+        )
+    unknown = sorted({item.category for item in request.items} - set(category_predictor.categories))
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown categories {', '.join(unknown)}, expected one of "
+                   f"{', '.join(category_predictor.categories)}"
+        )
+    
+    async def no_image():
+        return None
+    
+    fetched = await asyncio.gather(
+        *[fetch_image(item.imageURL) if item.imageURL else no_image() for item in request.items],
+        return_exceptions=True
+    )
+    errors = [None] * len(request.items)
+    ok = []
+    for index, image in enumerate(fetched):
+        if isinstance(image, HTTPException):
+            errors[index] = image.detail
+        elif isinstance(image, Exception):
+            errors[index] = f"Could not fetch image: {str(image)}"
+        else:
+            ok.append(index)
+    
+    version = category_predictor.model_version
+    if ok:
+        try:
+            version = await asyncio.to_thread(
+                category_predictor.learn,
+                [fetched[i] for i in ok],
+                [request.items[i].description for i in ok],
+                [request.items[i].category for i in ok]
+            )
+        except ValueError as e:  # e.g. no item with an image has been learned yet
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Learning error: {str(e)}")
+    return FeedbackResponse(learned=len(ok), version=version, errors=errors)
+
+# Issue registration (index updates run in a worker thread, the detector is locked)
+@app.post("/issues")
+async def register_issue(request: IssueRequest):
+    """Register (or replace) an accepted issue for duplicate detection"""
+    require_ready()
+    check_status(request.status)
+    try:
+        created_at = parse_timestamp(request.createdAt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid createdAt: {str(e)}")
+    image_hash = await resolve_image_hash(request.imageURL, request.imageHash)
+    await asyncio.to_thread(
+        duplicate_detector.add_existing_issue,
+        issue_id=request.id,
+        image_path=None,
+        description=request.description,
+        latitude=request.latitude,
+        longitude=request.longitude,
+        image_hash=image_hash,
+        created_at=created_at,
+        status=request.status
+    )
+    return {
+        "id": request.id,
+        "registered": True,
+        "hasImageHash": image_hash is not None,
+        "total_issues": duplicate_detector.issue_count
+    }
+
+@app.put("/issues/{issue_id}")
+async def update_issue(issue_id: str, request: IssueUpdateRequest):
+    """Update a registered issue"""
+    require_ready()
+    check_status(request.status)
+    image_hash = await resolve_image_hash(request.imageURL, request.imageHash)
+    updated = await asyncio.to_thread(
+        duplicate_detector.update_issue,
+        issue_id,
+        description=request.description,
+        latitude=request.latitude,
+        longitude=request.longitude,
+        image_hash=image_hash,
+        status=request.status
+    )
+    if not updated:
+        raise HTTPException(status_code=404, detail=f"Issue {issue_id} is not registered")
+    return {"id": issue_id, "updated": True}
+
+@app.delete("/issues/{issue_id}")
+def remove_issue(issue_id: str):
+    """Remove a registered issue (resolved, deleted or rejected)"""
+    require_ready()
+    if not duplicate_detector.remove_issue(issue_id):
+        raise HTTPException(status_code=404, detail=f"Issue {issue_id} is not registered")
+    return {"id": issue_id, "removed": True, "total_issues": duplicate_detector.issue_count}
+
+@app.post("/index/snapshot")
+def snapshot_index():
+    """Persist the duplicate index and truncate its journal"""
+    require_ready()
+    try:
+        generation = shared_index.snapshot()
+    except OSError as e:
+        raise HTTPException(status_code=500, detail=f"Snapshot failed: {str(e)}")
+    return {"generation": generation, "total_issues": duplicate_detector.issue_count}
+
+@app.post("/index/ingest", status_code=202)
+def ingest_issues(request: IngestRequest):
+    """Start a streaming bulk ingest of existing issues from a JSONL file"""
+    require_ready()
+    if not os.path.isfile(request.path):
+        raise HTTPException(status_code=400, detail=f"No such file: {request.path}")
+    if request.chunkSize < 1:
+        raise HTTPException(status_code=400, detail="chunkSize must be positive")
+    if not start_ingest(request.path, request.chunkSize, request.fetchImages):
+        raise HTTPException(status_code=409, detail="An ingest is already running")
+    return ingest_progress.snapshot()
+
+@app.get("/index/ingest")
+def ingest_status():
+    """Progress of the current (or last) bulk ingest"""
+    return ingest_progress.snapshot()
+
+@app.post("/authenticity/fakes")
+def add_known_fakes(request: KnownFakesRequest):
+    """Bulk-load known fake/stock image hashes from a file and/or a list"""
+    from hamming_index import load_hash_file
+    
+    require_ready()
+    if request.path is not None and not os.path.isfile(request.path):
+        raise HTTPException(status_code=400, detail=f"No such file: {request.path}")
+    try:
+        hashes = [parse_hex_hash(value) for value in request.hashes]
+        if request.path is not None:
+            hashes.extend(load_hash_file(request.path).tolist())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid hash: {str(e)}")
+    
+    before = len(authenticity_checker.known_fake_hashes)
+    total = authenticity_checker.add_known_fake_hashes(hashes)
+    return {"added": total - before, "known_fakes": total}
+
+@app.on_event("shutdown")
+async def close_connections():
+    """Stop the background loops, then close the image download connection pool and the inference pool"""
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await image_fetcher.close()
+    inference_pool.shutdown()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus metrics in the text exposition format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
+    if startup.ready:
+        status = "healthy"
+    else:
+        status = "failed" if startup.failed else "starting"
     return {
-        "status": "healthy",
-        "model_loaded": category_predictor.is_trained,
-        "duplicate_detector_issues": len(duplicate_detector.existing_issues)
+        "status": status,
+        "model_loaded": category_predictor is not None and category_predictor.is_trained,
+        "duplicate_detector_issues": duplicate_detector.issue_count if duplicate_detector is not None else 0,
+        "duplicate_index_ready": startup.is_done('duplicate_index')
     }
 
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe: the process is up and serving HTTP"""
+    return {"status": "alive", "uptime_seconds": startup.snapshot()['uptime_seconds']}
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness probe: 200 once the model and the duplicate index are loaded, 503 before"""
+    progress = startup.snapshot()
+    if ingest_progress.running:
+        progress['ingest'] = ingest_progress.snapshot()
+    return JSONResponse(status_code=200 if progress['ready'] else 503, content=progress)
+
 @app.get("/stats")
 async def get_stats():
     """Get service statistics"""
+    require_ready()
     return {
         "category_model": {
             "trained": category_predictor.is_trained,
-            "categories": category_predictor.categories
+            "categories": category_predictor.categories,
+            "micro_batching": category_predictor.batcher.stats() if category_predictor.batcher else None,
+            "online": {
+                **category_predictor.online.stats(),
+                "serving": category_predictor.serving_online,
+                "min_samples": category_predictor.online_min_samples
+            } if category_predictor.online is not None else None
         },
         "duplicate_detector": duplicate_detector.get_statistics(),
+        "index_sharing": shared_index.stats(),
+        "repeat_reports": {
+            **priority_assigner.repeat_counter.get_statistics(),
+            "threshold": priority_assigner.repeat_threshold
+        },
+        "inference_pool": inference_pool.stats(),
+        "feature_cache": feature_cache.stats(),
+        "prediction_cache": prediction_cache.stats(),
+        "authenticity": {
+            "known_fakes": len(authenticity_checker.known_fake_hashes),
+            "max_hash_distance": authenticity_checker.max_hash_distance
+        },
         "thresholds": {
             "category_confidence": 0.70,
             "duplicate_similarity": 0.80,
@@ -160,4 +980,6 @@ async def get_stats():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Workers share the mapped model and index files (see INDEX_SYNC_INTERVAL_MS)
+    workers = int(os.getenv('WEB_CONCURRENCY', 1))
+    uvicorn.run("main:app" if workers > 1 else app, host="0.0.0.0", port=8000, workers=workers)
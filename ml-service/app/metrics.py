@@ -0,0 +1,169 @@
+"""
+Minimal in-process metrics rendered in the Prometheus text format
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; covers sub-millisecond cache hits up to slow downloads
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labels):
+    labels = list(labels)
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + pairs + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                labels = _format_labels(zip(self.labelnames, key))
+                lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 3)
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                base = list(zip(self.labelnames, key))
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), series):
+                    cumulative += count
+                    labels = _format_labels(base + [('le', _format_value(float(bound)))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(base)
+                lines.append(f"{self.name}_sum{labels} {_format_value(float(series[-2]))}")
+                lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class CallbackMetric:
+    """Counter or gauge whose samples are read from a callback at scrape time"""
+    def __init__(self, name, documentation, metric_type, callback, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.metric_type = metric_type
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        samples = self.callback()
+        if not isinstance(samples, dict):
+            samples = {(): samples}
+        for key, value in sorted(samples.items()):
+            key = key if isinstance(key, tuple) else (key,)
+            labels = _format_labels(zip(self.labelnames, key))
+            lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name, documentation, metric_type, callback, labelnames=()):
+        return self.register(CallbackMetric(name, documentation, metric_type, callback, labelnames))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+class StageTimings:
+    """
+    Durations of the stages of one request. Each stage is also observed in
+    the shared histogram (labelled by stage).
+    """
+    def __init__(self, histogram=None):
+        self.histogram = histogram
+        self.durations = {}
+        self.notes = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+        if self.histogram is not None:
+            self.histogram.observe(seconds, stage=name)
+
+    def mark(self, name, description):
+        """Add an entry without a duration, e.g. how a cached result was served"""
+        self.notes[name] = description
+
+    def server_timing(self):
+        """Value for a Server-Timing response header (milliseconds)"""
+        entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.durations.items()]
+        entries += [f"{name};desc={description}" for name, description in self.notes.items()]
+        return ', '.join(entries)
@@ -0,0 +1,78 @@
+"""
+Dynamic micro-batching of single-row model calls
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Collects feature rows submitted concurrently by worker threads and runs
+    them through predict_fn as one stacked matrix. A batch is flushed when
+    it reaches max_batch_size or max_wait_ms after its first row arrived.
+    predict_fn takes a 2-D array and returns one result per row.
+    """
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=5):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self.batches = 0
+        self.rows = 0
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, features):
+        """Blocking: returns predict_fn's result for this single row"""
+        future = Future()
+        self._queue.put((np.asarray(features), future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+            self._flush(batch)
+
+    def _flush(self, batch):
+        futures = [future for _, future in batch]
+        try:
+            results = self.predict_fn(np.vstack([features for features, _ in batch]))
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        for future, result in zip(futures, results):
+            future.set_result(result)
+        self.batches += 1
+        self.rows += len(batch)
+
+    def stats(self):
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'batches': self.batches,
+            'rows': self.rows,
+            'mean_batch_size': round(self.rows / self.batches, 2) if self.batches else 0.0
+        }
+
+    def close(self):
+        self._queue.put(None)
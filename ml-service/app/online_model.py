@@ -0,0 +1,239 @@
+"""
+Incrementally trained category model for confirmed (admin-corrected) labels
+
+Text goes through a stateless HashingVectorizer, so there is no vocabulary
+to refit, and is stacked with the color histogram image features. A linear
+SGDClassifier (logistic loss) is updated with partial_fit on each batch of
+labels. A batch trains a copy of the serving model which then replaces it,
+so concurrent predictions never see a half-updated model.
+
+Each feedback batch is first predicted by the current online model and by
+a baseline (the forest) and only then learned from, so both are scored on
+labels neither has trained on. Their accuracies are exponentially
+weighted over about the last EVALUATION_HALF_LIFE labels.
+
+Feedback without an image is learned from the mean image features of the
+labels that had one (what a typical photo looks like), not from zeros,
+which serving never produces.
+
+Checkpoints are versioned pickles in checkpoint_dir (online-<version>.pkl)
+with a CURRENT file naming the newest; the last KEEP_CHECKPOINTS are kept.
+Every learned batch is checkpointed under the directory lock, on top of
+the newest checkpoint, so worker processes sharing the directory never
+overwrite each other's updates; reload() picks up newer versions.
+"""
+import copy
+import os
+import threading
+import joblib
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+
+from index_snapshot import CURRENT_FILE, LOCK_FILE, DirectoryLock, current_generation
+
+# Width of the hashed text features
+TEXT_FEATURES = 2 ** 16
+
+# Image features are 96 normalized histogram bins in [0, 1] followed by
+# the mean B, G, R values in [0, 255], scaled to the same range
+MEAN_COLOR_FEATURES = 3
+
+KEEP_CHECKPOINTS = 3
+
+# Labels over which online and baseline accuracy are averaged (half-life)
+EVALUATION_HALF_LIFE = 500
+
+
+def _checkpoint_name(version):
+    return f"online-{version}"
+
+
+class OnlineCategoryModel:
+    def __init__(self, categories, checkpoint_dir=None, alpha=1e-4):
+        self.categories = np.array(categories)
+        self.checkpoint_dir = checkpoint_dir
+        self.alpha = alpha
+        self.text_vectorizer = HashingVectorizer(
+            n_features=TEXT_FEATURES, stop_words='english',
+            alternate_sign=False, norm='l2'
+        )
+        self.model = None  # serving SGDClassifier, replaced (never mutated) by learn()
+        self.version = 0
+        self.samples = 0           # labels learned, including seeding (train.py --online)
+        self.feedback_samples = 0  # confirmed labels learned from feedback
+        # Running mean of the image features of labels that had an image
+        self.image_mean = np.zeros(0)
+        self.image_count = 0
+        # Exponentially weighted hits of the online model and the baseline
+        # on feedback before learning from it, and the weight of the labels scored
+        self.online_hits = 0.0
+        self.baseline_hits = 0.0
+        self.evaluated = 0.0
+        self._lock = threading.Lock()
+        self._dir_lock = None
+        if checkpoint_dir is not None:
+            os.makedirs(checkpoint_dir, exist_ok=True)
+            self._dir_lock = DirectoryLock(checkpoint_dir, LOCK_FILE)
+
+    @property
+    def is_trained(self):
+        return self.model is not None
+
+    @property
+    def accuracy(self):
+        """Weighted accuracy on feedback before learning from it (None until scored)"""
+        return self.online_hits / self.evaluated if self.evaluated else None
+
+    @property
+    def baseline_accuracy(self):
+        return self.baseline_hits / self.evaluated if self.evaluated else None
+
+    @property
+    def beats_baseline(self):
+        """Whether the online model has been at least as accurate as the baseline on recent feedback"""
+        return self.evaluated > 0 and self.online_hits >= self.baseline_hits
+
+    def featurize(self, image_features, texts):
+        """Sparse rows of scaled image features next to hashed text features"""
+        image_features = np.array(image_features, dtype=np.float64).reshape(len(texts), -1)
+        image_features[:, -MEAN_COLOR_FEATURES:] /= 255.0
+        return sp.hstack(
+            [sp.csr_matrix(image_features), self.text_vectorizer.transform(texts)], format='csr'
+        )
+
+    def predict(self, image_features, texts):
+        """(category, confidence) per issue"""
+        model = self.model
+        probabilities = model.predict_proba(self.featurize(image_features, texts))
+        predictions = probabilities.argmax(axis=1)
+        confidences = probabilities[np.arange(len(predictions)), predictions]
+        return [
+            (str(category), float(confidence))
+            for category, confidence in zip(model.classes_[predictions], confidences)
+        ]
+
+    def learn(self, image_features, texts, labels, epochs=1, feedback=True, baseline=None):
+        """
+        Update the model with labels (one partial_fit per epoch) and
+        checkpoint it; returns the new version. image_features rows may be
+        None for issues without an image. feedback=False for seeding, which
+        does not count towards feedback_samples. baseline(image_features,
+        texts) -> labels is scored against the online model on the batch
+        before it is learned. Raises ValueError for a label that is not one
+        of the categories.
+        """
+        unknown = sorted(set(labels) - set(self.categories.tolist()))
+        if unknown:
+            raise ValueError(f"Unknown categories: {', '.join(unknown)}")
+        labels = np.asarray(labels)
+
+        with self._lock:
+            if self._dir_lock is None:
+                return self._learn(image_features, texts, labels, epochs, feedback, baseline)
+            with self._dir_lock.exclusive():
+                self._reload()
+                version = self._learn(image_features, texts, labels, epochs, feedback, baseline)
+                self._save()
+                return version
+
+    def _learn(self, image_features, texts, labels, epochs, feedback, baseline):
+        image_features = self._impute(image_features)
+        X = self.featurize(image_features, texts)
+        if baseline is not None and self.model is not None:
+            decay = 0.5 ** (len(labels) / EVALUATION_HALF_LIFE)
+            online = self.model.classes_[self.model.predict_proba(X).argmax(axis=1)]
+            self.online_hits = self.online_hits * decay + float(np.sum(online == labels))
+            self.baseline_hits = self.baseline_hits * decay + \
+                float(np.sum(np.asarray(baseline(image_features, texts)) == labels))
+            self.evaluated = self.evaluated * decay + len(labels)
+
+        if self.model is None:
+            trainer = SGDClassifier(loss='log_loss', alpha=self.alpha, random_state=42)
+        else:
+            trainer = copy.deepcopy(self.model)
+        for _ in range(epochs):
+            trainer.partial_fit(X, labels, classes=self.categories)
+        self.model = trainer
+        self.samples += len(labels)
+        if feedback:
+            self.feedback_samples += len(labels)
+        self.version += 1
+        return self.version
+
+    def _impute(self, image_features):
+        """Image feature matrix with rows that are None replaced by the running mean"""
+        present = [np.asarray(row, dtype=np.float64) for row in image_features if row is not None]
+        if present:
+            rows = np.vstack(present)
+            if self.image_count == 0:
+                self.image_mean = np.zeros(rows.shape[1])
+            total = self.image_count + len(rows)
+            self.image_mean = self.image_mean + (rows.sum(axis=0) - len(rows) * self.image_mean) / total
+            self.image_count = total
+        if not len(self.image_mean):
+            raise ValueError("No image features to learn from yet")
+        return np.vstack([
+            np.asarray(row, dtype=np.float64) if row is not None else self.image_mean
+            for row in image_features
+        ])
+
+    def _save(self):
+        name = _checkpoint_name(self.version)
+        tmp_path = os.path.join(self.checkpoint_dir, name + '.tmp')
+        joblib.dump(
+            {'model': self.model, 'version': self.version, 'samples': self.samples,
+             'categories': self.categories.tolist(), 'feedback_samples': self.feedback_samples,
+             'image_mean': self.image_mean, 'image_count': self.image_count,
+             'online_hits': self.online_hits, 'baseline_hits': self.baseline_hits,
+             'evaluated': self.evaluated},
+            tmp_path
+        )
+        os.replace(tmp_path, os.path.join(self.checkpoint_dir, name + '.pkl'))
+
+        current_tmp = os.path.join(self.checkpoint_dir, CURRENT_FILE + '.tmp')
+        with open(current_tmp, 'w') as f:
+            f.write(name + '\n')
+        os.replace(current_tmp, os.path.join(self.checkpoint_dir, CURRENT_FILE))
+
+        stale = os.path.join(self.checkpoint_dir, _checkpoint_name(self.version - KEEP_CHECKPOINTS) + '.pkl')
+        if os.path.exists(stale):
+            os.remove(stale)
+
+    def _reload(self):
+        version = current_generation(self.checkpoint_dir)
+        if version <= self.version:
+            return False
+        state = joblib.load(os.path.join(self.checkpoint_dir, _checkpoint_name(version) + '.pkl'))
+        if list(state['categories']) != self.categories.tolist():
+            raise ValueError(f"Checkpoint {version} was trained for other categories")
+        self.model = state['model']
+        self.samples = state['samples']
+        self.version = state['version']
+        self.feedback_samples = state.get('feedback_samples', 0)
+        self.image_mean = state.get('image_mean', np.zeros(0))
+        self.image_count = state.get('image_count', 0)
+        self.online_hits = state.get('online_hits', 0.0)
+        self.baseline_hits = state.get('baseline_hits', 0.0)
+        self.evaluated = state.get('evaluated', 0.0)
+        return True
+
+    def reload(self):
+        """Switch to a newer checkpoint if another process wrote one; returns whether it did"""
+        if self._dir_lock is None or current_generation(self.checkpoint_dir) <= self.version:
+            return False
+        with self._lock:
+            with self._dir_lock.shared():
+                return self._reload()
+
+    def stats(self):
+        return {
+            'version': self.version,
+            'samples': self.samples,
+            'feedback_samples': self.feedback_samples,
+            'trained': self.is_trained,
+            'accuracy': round(self.accuracy, 4) if self.evaluated else None,
+            'baseline_accuracy': round(self.baseline_accuracy, 4) if self.evaluated else None,
+            'checkpoint_dir': self.checkpoint_dir
+        }
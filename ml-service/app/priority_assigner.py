@@ -1,35 +1,182 @@
 """
 Priority assignment based on category, location, and repetition
+
+Rules table (PriorityAssigner(rules=...) or a JSON file, see
+load_priority_rules); missing keys keep their defaults:
+
+    {
+        "category_severity": {"Sewer Overflow": 4, ...},
+        "default_severity": 2,
+        "sensitive_keywords": {"hospital": 1, "nursing home": 1, ...}
+    }
+
+Sensitive keywords match whole words, case-insensitively and with an
+optional plural "s"/"es" ("parks" but not "parking"); the matching
+keyword with the largest value is added to the severity.
 """
+import json
+import re
+import numpy as np
 
-class PriorityAssigner:
-    def __init__(self):
-        # Category severity scores
-        self.category_severity = {
-            "Sewer Overflow": 4,
-            "Water Leakage": 3,
-            "Road Damage / Pothole": 3,
-            "Garbage Issue": 2,
-            "Street Light Failure": 2
-        }
-        
-        # Sensitive location keywords
-        self.sensitive_keywords = [
+from report_counter import RepeatReportCounter
+
+DEFAULT_RULES = {
+    # Category severity scores
+    'category_severity': {
+        "Sewer Overflow": 4,
+        "Water Leakage": 3,
+        "Road Damage / Pothole": 3,
+        "Garbage Issue": 2,
+        "Street Light Failure": 2
+    },
+    'default_severity': 2,
+    # Sensitive location keywords -> levels added
+    'sensitive_keywords': {
+        keyword: 1 for keyword in [
             'hospital', 'school', 'clinic', 'medical', 'emergency',
             'college', 'university', 'kindergarten', 'church', 'temple',
             'mosque', 'playground', 'park', 'elderly', 'nursing home'
         ]
+    }
+}
+
+# Priority by score (severity + bonuses), scores below 3 are Low
+PRIORITY_LEVELS = ("Low", "Medium", "High", "Critical")
+LOWEST_SCORE = 2
+
+
+def load_priority_rules(path):
+    """Rules table from a JSON file"""
+    with open(path, 'r') as f:
+        rules = json.load(f)
+    if not isinstance(rules, dict):
+        raise ValueError(f"{path}: expected a JSON object")
+    return rules
+
+
+def _normalize_keyword(keyword):
+    return ' '.join(keyword.lower().split())
+
+
+def _trie_pattern(words):
+    """
+    Regex alternation of words factored into a character trie, so that the
+    engine tries one branch per position instead of every word
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [
+            (r'\s+' if char == ' ' else re.escape(char)) + build(child)
+            for char, child in sorted(node.items()) if char
+        ]
+        if not branches:
+            return ''
+        optional = '' in node
+        body = branches[0] if len(branches) == 1 and not optional else '(?:' + '|'.join(branches) + ')'
+        return body + ('?' if optional else '')
+
+    return build(trie)
+
+
+def compile_keywords(keywords):
+    """
+    One word-boundary alternation over the (lowercase) keywords, to be run
+    on lowercased text; group 1 is the keyword as written. None if there
+    are no keywords.
+    """
+    if not keywords:
+        return None
+    return re.compile(rf'\b({_trie_pattern({_normalize_keyword(k) for k in keywords})})(?:e?s)?\b')
+
+
+class PriorityAssigner:
+    def __init__(self, repeat_window_seconds=30 * 86400, repeat_threshold=3, repeat_cell_meters=100,
+                 rules=None):
+        self.set_rules(rules or {})
+        
+        # Reports per geo cell over a sliding window; this many earlier
+        # reports nearby raise the priority like a duplicate does
+        self.repeat_counter = RepeatReportCounter(
+            cell_size_meters=repeat_cell_meters, window_seconds=repeat_window_seconds
+        )
+        self.repeat_threshold = repeat_threshold
+    
+    def set_rules(self, rules):
+        """Replace the rules table (keys missing from rules keep their defaults)"""
+        category_severity = dict(rules.get('category_severity', DEFAULT_RULES['category_severity']))
+        default_severity = int(rules.get('default_severity', DEFAULT_RULES['default_severity']))
+        keywords = {
+            _normalize_keyword(keyword): int(levels)
+            for keyword, levels in rules.get('sensitive_keywords', DEFAULT_RULES['sensitive_keywords']).items()
+            if keyword.strip()
+        }
+        self.category_severity = category_severity
+        self.default_severity = default_severity
+        self.sensitive_keywords = keywords
+        # Pattern and its table in one attribute, so a request never mixes two rule sets
+        self._matcher = (compile_keywords(keywords), keywords)
+    
+    def sensitivity_bonus(self, description):
+        """Levels added for sensitive keywords in the description"""
+        pattern, keywords = self._matcher
+        if pattern is None or not description:
+            return 0
+        return max(
+            (self._keyword_level(keywords, m.group(1)) for m in pattern.finditer(description.lower())),
+            default=0
+        )
+    
+    @staticmethod
+    def _keyword_level(keywords, found):
+        """Level of a matched keyword (phrases may have been matched across other whitespace)"""
+        level = keywords.get(found)
+        return level if level is not None else keywords[_normalize_keyword(found)]
     
     def is_sensitive_location(self, description, latitude=None, longitude=None):
         """Check if location is sensitive based on description"""
-        description_lower = description.lower()
-        return any(keyword in description_lower for keyword in self.sensitive_keywords)
+        return self.sensitivity_bonus(description) > 0
+    
+    def sensitivity_bonuses(self, descriptions):
+        """sensitivity_bonus of many descriptions with a single scan of their concatenation"""
+        bonuses = np.zeros(len(descriptions), dtype=np.int64)
+        pattern, keywords = self._matcher
+        if pattern is None or len(descriptions) == 0:
+            return bonuses
+        
+        # Descriptions joined by NUL (which no keyword spans) and lowercased
+        # at once; a match belongs to the description its start falls in.
+        # Offsets come from the lowercased text, as lowercasing can change
+        # lengths.
+        text = '\0'.join(description or '' for description in descriptions).lower()
+        items = text.split('\0')
+        if len(items) != len(descriptions):  # a description contains NUL
+            bonuses[:] = [self.sensitivity_bonus(description) for description in descriptions]
+            return bonuses
+        lengths = np.fromiter((len(item) + 1 for item in items), dtype=np.int64, count=len(items))
+        starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        
+        matches = [(match.start(), match.group(1)) for match in pattern.finditer(text)]
+        if matches:
+            positions, found = zip(*matches)
+            items = np.searchsorted(starts, positions, side='right') - 1
+            np.maximum.at(bonuses, items, [self._keyword_level(keywords, keyword) for keyword in found])
+        return bonuses
+    
+    def record_reports(self, latitudes, longitudes, created_at=None):
+        """Count registered issues (epoch seconds, default now) for calculate_repeat_factor"""
+        self.repeat_counter.record_many(latitudes, longitudes, created_at)
     
-    def calculate_repeat_factor(self, location, existing_issues):
-        """Calculate how many times issues reported from same location"""
-        # This would check against existing_issues database
-        # For now, return 0 (no repeats)
-        return 0
+    def calculate_repeat_factor(self, latitude, longitude, now=None):
+        """How many issues were reported near the location within the repeat window"""
+        if latitude is None or longitude is None:
+            return 0
+        return self.repeat_counter.count(latitude, longitude, now)
     
     def assign_priority(self, category, description, latitude, longitude, is_duplicate=False):
         """
@@ -37,39 +184,56 @@ class PriorityAssigner:
         
         Factors:
         1. Category severity (1-4)
-        2. Sensitive location (+1 level)
-        3. Duplicate/repeated reports (+1 level)
+        2. Sensitive location (+ the keyword's levels, 1 by default)
+        3. Duplicate report, or repeat_threshold earlier reports nearby (+1 level)
         """
         # Get base severity from category
-        base_severity = self.category_severity.get(category, 2)
+        priority_score = self.category_severity.get(category, self.default_severity)
         
-        # Check if sensitive location
-        is_sensitive = self.is_sensitive_location(description, latitude, longitude)
+        # Sensitive location
+        priority_score += self.sensitivity_bonus(description)
         
-        # Calculate final priority score
-        priority_score = base_severity
-        
-        if is_sensitive:
-            priority_score += 1
-        
-        if is_duplicate:
+        if is_duplicate or self.calculate_repeat_factor(latitude, longitude) >= self.repeat_threshold:
             priority_score += 1
         
         # Map score to priority level
-        if priority_score >= 5:
-            return "Critical"
-        elif priority_score >= 4:
-            return "High"
-        elif priority_score >= 3:
-            return "Medium"
-        else:
-            return "Low"
+        return PRIORITY_LEVELS[min(max(priority_score - LOWEST_SCORE, 0), len(PRIORITY_LEVELS) - 1)]
+    
+    def assign_priorities(self, categories, descriptions, latitudes=None, longitudes=None,
+                          is_duplicate=None, now=None):
+        """
+        assign_priority over columns of issues (e.g. re-prioritizing the
+        backlog): one keyword scan for all descriptions and one pass over
+        the repeat counter. Coordinates and is_duplicate are optional.
+        """
+        severity = self.category_severity
+        default = self.default_severity
+        scores = np.fromiter(
+            (severity.get(category, default) for category in categories),
+            dtype=np.int64, count=len(categories)
+        )
+        scores += self.sensitivity_bonuses(descriptions)
+        
+        repeated = np.zeros(len(scores), dtype=bool) if is_duplicate is None \
+            else np.asarray(is_duplicate, dtype=bool).copy()
+        if latitudes is not None and longitudes is not None:
+            # Missing coordinates (None/NaN) count no repeats, as in calculate_repeat_factor
+            latitudes = np.asarray(latitudes, dtype=np.float64)
+            longitudes = np.asarray(longitudes, dtype=np.float64)
+            located = np.isfinite(latitudes) & np.isfinite(longitudes)
+            repeats = np.zeros(len(scores), dtype=np.int64)
+            repeats[located] = self.repeat_counter.count_many(latitudes[located], longitudes[located], now)
+            repeated |= repeats >= self.repeat_threshold
+        scores += repeated
+        
+        levels = np.clip(scores - LOWEST_SCORE, 0, len(PRIORITY_LEVELS) - 1)
+        return np.array(PRIORITY_LEVELS, dtype=object)[levels].tolist()
     
-    def get_priority_explanation(self, category, is_sensitive, is_duplicate):
+    def get_priority_explanation(self, category, is_sensitive, is_duplicate, repeat_count=0):
         """Get explanation for priority assignment"""
         reasons = []
         
-        severity = self.category_severity.get(category, 2)
+        severity = self.category_severity.get(category, self.default_severity)
         if severity >= 4:
             reasons.append(f"{category} is high severity")
         elif severity >= 3:
@@ -80,5 +244,7 @@ class PriorityAssigner:
         
         if is_duplicate:
             reasons.append("Duplicate report increases urgency")
+        elif repeat_count >= self.repeat_threshold:
+            reasons.append(f"Location reported {repeat_count} times recently")
         
         return ", ".join(reasons) if reasons else "Standard priority"
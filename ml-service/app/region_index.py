@@ -0,0 +1,712 @@
+"""
+Duplicate index partitioned into per-region shards
+
+Issues are grouped by the geohash cell of their location. Each region is
+its own DuplicateDetector with its own snapshot directory
+(<root>/regions/<geohash>/, see index_snapshot), loaded on first use and
+evicted least-recently-used when the loaded shards exceed a memory budget.
+A duplicate check only loads the (at most four) regions within the
+location radius of the report, so a fleet serving many cities keeps just
+the busy ones in memory. Evicting a shard loses nothing: its changes are
+already in its journal.
+
+Which region holds each issue is kept in a RegionMap (<root>/region_map/),
+so updates and removals go straight to the issue's shard, and issues
+re-registered elsewhere leave their old region even when it is not loaded.
+"""
+import json
+import math
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+import numpy as np
+
+from index_snapshot import (
+    CURRENT_FILE, DirectoryLock, SharedIndex, current_generation, journal_path,
+    snapshot_issue_ids, snapshot_locations
+)
+from spatial_index import METERS_PER_DEGREE
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Cells must be much larger than the location radius, so that a radius
+# query never spans more than two cells per axis (precision 5 is ~4.9 km)
+MAX_PRECISION = 5
+
+# Same slack as DuplicateDetector's spatial query
+REGION_QUERY_SLACK = 1.01
+
+REGION_MAP_DIR = 'region_map'
+
+
+def geohash(latitude, longitude, precision):
+    """Geohash cell of a coordinate"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        # Bits alternate between longitude and latitude halvings
+        value, value_range = (longitude, lon_range) if even else (latitude, lat_range)
+        mid = (value_range[0] + value_range[1]) / 2
+        if value >= mid:
+            bits = bits * 2 + 1
+            value_range[0] = mid
+        else:
+            bits = bits * 2
+            value_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def _map_name(generation):
+    return f"map-{generation:06d}"
+
+
+class RegionMap:
+    """
+    Issue id (DuplicateDetector._key) -> region of every issue, loaded or
+    not. Persisted like a SharedIndex: a JSON snapshot named by CURRENT and
+    a journal of changes since, which every worker process appends to under
+    a shared flock and tails with poll(). Issues new to the index are
+    journaled with their location and creation time, so the other processes
+    can count them as reports without loading their region.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = DirectoryLock(directory)
+        self.regions = {}
+        self.generation = 0
+        self.offset = 0
+        self._path = None
+        self._fd = None
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.regions)
+
+    def get(self, key):
+        return self.regions.get(key)
+
+    def exists(self):
+        return current_generation(self.directory) > 0 or \
+            os.path.exists(journal_path(self.directory, 0))
+
+    def counts(self):
+        """Issues per region"""
+        with self._lock:
+            return Counter(self.regions.values())
+
+    def load(self):
+        """Read the current snapshot and journal (no reports)"""
+        with self._lock, self.lock.shared():
+            self._load(None)
+
+    def _load(self, reports):
+        generation = current_generation(self.directory)
+        regions = {}
+        if generation:
+            with open(os.path.join(self.directory, _map_name(generation) + '.json')) as f:
+                for region, keys in json.load(f).items():
+                    for key in keys:
+                        regions[key] = region
+        self.regions = regions
+        self.generation = generation
+        self.offset = 0
+        self._replay(reports)
+
+    def _replay(self, reports):
+        """
+        Apply the journal from offset on; reports (a list, or None) collects
+        the locations of the issues other processes added. Entries are
+        applied in order, including this process's own, so the result is
+        the latest state whatever this process already applied.
+        """
+        try:
+            f = open(journal_path(self.directory, self.generation), 'rb')
+        except FileNotFoundError:
+            return
+        pid = os.getpid()
+        with f:
+            f.seek(self.offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # still being written
+                self.offset += len(line)
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if entry['region'] is None:
+                    self.regions.pop(entry['id'], None)
+                else:
+                    self.regions[entry['id']] = entry['region']
+                    if reports is not None and 'at' in entry and entry.get('pid') != pid:
+                        reports.append(entry['at'])
+
+    def assign(self, region, keys, latitudes, longitudes, created_at):
+        """
+        Record that the issues are now in region; returns a mask of those
+        that are new to the index (the rest moved or were re-registered)
+        """
+        with self._lock:
+            new = np.zeros(len(keys), dtype=bool)
+            lines = []
+            for i, key in enumerate(keys):
+                entry = {'id': key, 'region': region, 'pid': os.getpid()}
+                if key not in self.regions:
+                    new[i] = True
+                    entry['at'] = [float(latitudes[i]), float(longitudes[i]), float(created_at[i])]
+                self.regions[key] = region
+                lines.append(json.dumps(entry, separators=(',', ':')) + '\n')
+            self._append(lines)
+            return new
+
+    def remove(self, keys):
+        with self._lock:
+            keys = [key for key in keys if self.regions.pop(key, None) is not None]
+            self._append([
+                json.dumps({'id': key, 'region': None, 'pid': os.getpid()}, separators=(',', ':')) + '\n'
+                for key in keys
+            ])
+
+    def _append(self, lines):
+        if not lines:
+            return
+        with self.lock.shared():
+            path = journal_path(self.directory, current_generation(self.directory))
+            if path != self._path:
+                if self._fd is not None:
+                    os.close(self._fd)
+                self._path = path
+                self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            # One write() per batch, so lines of concurrent writers never interleave
+            os.write(self._fd, ''.join(lines).encode('utf-8'))
+
+    def poll(self):
+        """
+        Apply other processes' changes; returns [latitude, longitude,
+        created_at] of the issues they added
+        """
+        reports = []
+        with self._lock:
+            if current_generation(self.directory) != self.generation:
+                # The previous journal is kept for one more generation, so
+                # its tail is read before switching to the new snapshot
+                self._replay(reports)
+                with self.lock.shared():
+                    self._load(reports)
+            else:
+                self._replay(reports)
+        return reports
+
+    def compact(self):
+        """
+        Fold the journal into a new snapshot (after applying the other
+        processes' changes, which are returned as in poll())
+        """
+        with self._lock, self.lock.exclusive():
+            reports = self.poll()
+            generation = current_generation(self.directory) + 1
+            grouped = {}
+            for key, region in self.regions.items():
+                grouped.setdefault(region, []).append(key)
+            path = os.path.join(self.directory, _map_name(generation) + '.json')
+            with open(path + '.tmp', 'w') as f:
+                json.dump(grouped, f, separators=(',', ':'))
+            os.replace(path + '.tmp', path)
+            tmp_path = os.path.join(self.directory, CURRENT_FILE + '.tmp')
+            with open(tmp_path, 'w') as f:
+                f.write(_map_name(generation) + '\n')
+            os.replace(tmp_path, os.path.join(self.directory, CURRENT_FILE))
+            self.generation = generation
+            self.offset = 0
+
+            for stale in (os.path.join(self.directory, _map_name(generation - 1) + '.json'),
+                          journal_path(self.directory, generation - 2)):
+                try:
+                    os.unlink(stale)
+                except FileNotFoundError:
+                    pass
+            return reports
+
+    def rebuild(self, regions):
+        """Map from {region: ids} (the snapshots of an index written without a map)"""
+        with self._lock:
+            self.regions = {key: region for region, keys in regions.items() for key in keys}
+            self.compact()
+
+
+class RegionalDuplicateIndex:
+    """
+    DuplicateDetector-compatible index over lazily loaded region shards.
+    make_detector() builds an empty DuplicateDetector for a shard;
+    load_histogram (metrics.Histogram) observes shard load times by region.
+    """
+    def __init__(self, root_dir, make_detector, precision=4,
+                 memory_budget_bytes=512 * 1024 * 1024, load_histogram=None):
+        if not 1 <= precision <= MAX_PRECISION:
+            raise ValueError(f"Region precision must be between 1 and {MAX_PRECISION}")
+        self.root_dir = root_dir
+        self.regions_dir = os.path.join(root_dir, 'regions')
+        self.make_detector = make_detector
+        self.precision = precision
+        self.memory_budget = memory_budget_bytes
+        self.load_histogram = load_histogram
+
+        # Featurizer and thresholds are the same for every shard
+        self._template = make_detector()
+        self.location_radius = self._template.location_radius
+        self.similarity_threshold = self._template.similarity_threshold
+
+        self._map = RegionMap(os.path.join(root_dir, REGION_MAP_DIR))
+        self._shards = OrderedDict()  # region -> SharedIndex, least recently used first
+        self._shard_bytes = {}        # region -> memory of the loaded shard
+        self._saved_versions = {}     # region -> shard version at its last load/snapshot
+        self._region_locks = {}       # region -> lock held while loading or folding it
+        self._region_stats = {}
+        # Guards the tables above only, never held during disk I/O
+        self._lock = threading.RLock()
+        # watch_inserts() listener
+        self._insert_listener = None
+        # Versions of evicted shards, so that version never decreases
+        self._version_base = 0
+        self._evicted_base = 0
+
+    # Regions
+
+    def region_of(self, latitude, longitude):
+        return geohash(latitude, longitude, self.precision)
+
+    def _query_regions(self, latitude, longitude):
+        """Regions a circle of location_radius around the point can reach"""
+        dlat = self.location_radius * REGION_QUERY_SLACK / METERS_PER_DEGREE
+        dlon = dlat / max(math.cos(math.radians(min(89.9, abs(latitude) + dlat))), 1e-6)
+        regions = []
+        for lat in (latitude - dlat, latitude, latitude + dlat):
+            for lon in (longitude - dlon, longitude, longitude + dlon):
+                lat = min(90.0, max(-90.0, lat))
+                lon = (lon + 180.0) % 360.0 - 180.0
+                region = self.region_of(lat, lon)
+                if region not in regions:
+                    regions.append(region)
+        return regions
+
+    def _region_dir(self, region):
+        return os.path.join(self.regions_dir, region)
+
+    def _on_disk(self, region):
+        return os.path.exists(os.path.join(self._region_dir(region), CURRENT_FILE))
+
+    def _stats_for(self, region):
+        return self._region_stats.setdefault(region, {
+            'hits': 0, 'misses': 0, 'loads': 0, 'load_seconds': 0.0, 'evictions': 0
+        })
+
+    def _region_lock(self, region):
+        with self._lock:
+            return self._region_locks.setdefault(region, threading.Lock())
+
+    def _cached(self, region):
+        """Loaded detector of a region (counted as a hit), or None"""
+        with self._lock:
+            shared = self._shards.get(region)
+            if shared is None:
+                return None
+            self._stats_for(region)['hits'] += 1
+            self._shards.move_to_end(region)
+            return shared.detector
+
+    def _shard(self, region, create=False):
+        """
+        Detector of a region, loading it if needed; None if the region has no
+        issues and create is False. A load only holds the region's own lock,
+        so the other regions keep serving meanwhile.
+        """
+        detector = self._cached(region)
+        if detector is not None:
+            return detector
+        if not create and not self._on_disk(region):
+            return None
+
+        with self._region_lock(region):
+            detector = self._cached(region)  # loaded by another thread meanwhile
+            if detector is not None:
+                return detector
+
+            start = time.perf_counter()
+            shared = SharedIndex(self.make_detector(), self._region_dir(region))
+            try:
+                shared.load()
+            except FileNotFoundError:
+                # New region: an empty first generation starts its journal
+                shared.snapshot()
+            seconds = time.perf_counter() - start
+            size = shared.detector.memory_usage()['total_bytes']
+
+            with self._lock:
+                stats = self._stats_for(region)
+                stats['misses'] += 1
+                stats['loads'] += 1
+                stats['load_seconds'] += seconds
+                self._shards[region] = shared
+                self._saved_versions[region] = shared.detector.version
+                self._shard_bytes[region] = size
+                evicted = self._over_budget(keep=region)
+            if self.load_histogram is not None:
+                self.load_histogram.observe(seconds, region=region)
+
+        self._fold(evicted)
+        return shared.detector
+
+    def _written(self, region):
+        """Re-measure a shard after it grew and evict others if over budget"""
+        with self._lock:
+            shared = self._shards.get(region)
+        if shared is None:
+            return
+        size = shared.detector.memory_usage()['total_bytes']
+        with self._lock:
+            if self._shards.get(region) is not shared:
+                return
+            self._shard_bytes[region] = size
+            evicted = self._over_budget(keep=region)
+        self._fold(evicted)
+
+    def _over_budget(self, keep):
+        """
+        Unpublish least recently used shards (never keep) until within budget;
+        returns [(region, shard, changed since saved)] for _fold()
+        """
+        evicted = []
+        while sum(self._shard_bytes.values()) > self.memory_budget and len(self._shards) > 1:
+            region = next(r for r in self._shards if r != keep)
+            shared = self._shards.pop(region)
+            detector = shared.detector
+            evicted.append((region, shared, detector.version != self._saved_versions.pop(region, None)))
+            self._version_base += detector.version
+            self._evicted_base += detector.evicted
+            del self._shard_bytes[region]
+            self._stats_for(region)['evictions'] += 1
+        return evicted
+
+    def _fold(self, evicted):
+        """Snapshot evicted shards with changes, so the next load maps a snapshot instead of replaying"""
+        for region, shared, changed in evicted:
+            if changed:
+                with self._region_lock(region):
+                    shared.snapshot()
+
+    def _loaded(self):
+        with self._lock:
+            return list(self._shards.items())
+
+    def _locate(self, issue_id):
+        """Detector of the region holding an issue (from the region map), or None"""
+        region = self._map.get(self._template._key(issue_id))
+        return self._shard(region) if region is not None else None
+
+    def _disk_regions(self):
+        try:
+            return sorted(os.listdir(self.regions_dir))
+        except FileNotFoundError:
+            return []
+
+    def _report(self, latitudes, longitudes, created_at):
+        listener = self._insert_listener
+        if listener is not None and len(latitudes):
+            listener(
+                np.asarray(latitudes, dtype=np.float64),
+                np.asarray(longitudes, dtype=np.float64),
+                np.asarray(created_at, dtype=np.float64)
+            )
+
+    def _report_entries(self, reports):
+        """Report [latitude, longitude, created_at] entries from RegionMap.poll()"""
+        if reports:
+            self._report(*np.asarray(reports, dtype=np.float64).T)
+
+    # DuplicateDetector interface
+
+    @property
+    def issue_count(self):
+        """Issues in every region, loaded or not"""
+        return len(self._map)
+
+    @property
+    def version(self):
+        with self._lock:
+            return self._version_base + sum(shared.detector.version for shared in self._shards.values())
+
+    @property
+    def evicted(self):
+        with self._lock:
+            return self._evicted_base + sum(shared.detector.evicted for shared in self._shards.values())
+
+    def vectorize(self, texts):
+        return self._template.vectorize(texts)
+
+    def add_existing_issue(self, issue_id, image_path, description, latitude, longitude,
+                           image_hash=None, created_at=None, status='pending'):
+        """Add (or replace) an issue in the shard of its region"""
+        region = self.region_of(latitude, longitude)
+        key = self._template._key(issue_id)
+        if created_at is None:
+            created_at = time.time()
+        self._remove_elsewhere([issue_id], region)
+        result = self._shard(region, create=True).add_existing_issue(
+            issue_id, image_path, description, latitude, longitude, image_hash, created_at, status
+        )
+        if self._map.assign(region, [key], [latitude], [longitude], [created_at])[0]:
+            self._report([latitude], [longitude], [created_at])
+        self._written(region)
+        return result
+
+    def _remove_elsewhere(self, issue_ids, region):
+        """Issues re-registered in region leave the region they were in before"""
+        previous = OrderedDict()
+        for issue_id in issue_ids:
+            other = self._map.get(self._template._key(issue_id))
+            if other is not None and other != region:
+                previous.setdefault(other, []).append(issue_id)
+        for other, ids in previous.items():
+            detector = self._shard(other)
+            if detector is not None:
+                for issue_id in ids:
+                    detector.remove_issue(issue_id)
+
+    def insert_rows(self, issue_ids, latitudes, longitudes, image_hashes, text_rows,
+                    created_at=None, statuses=None):
+        """Bulk insert, one DuplicateDetector.insert_rows call per region"""
+        text_rows = text_rows.tocsr()
+        now = time.time()
+        created_at = [now if t is None else t for t in created_at] if created_at is not None \
+            else [now] * len(issue_ids)
+        # Later ids replace earlier ones, even across regions
+        last = {self._template._key(issue_id): i for i, issue_id in enumerate(issue_ids)}
+        groups = OrderedDict()
+        for i in sorted(last.values()):
+            groups.setdefault(self.region_of(latitudes[i], longitudes[i]), []).append(i)
+
+        for region, rows in groups.items():
+            ids = [issue_ids[i] for i in rows]
+            lats = [latitudes[i] for i in rows]
+            lons = [longitudes[i] for i in rows]
+            times = [created_at[i] for i in rows]
+            self._remove_elsewhere(ids, region)
+            self._shard(region, create=True).insert_rows(
+                ids, lats, lons,
+                [image_hashes[i] for i in rows],
+                text_rows[rows], times,
+                [statuses[i] for i in rows] if statuses is not None else None
+            )
+            new = self._map.assign(region, [self._template._key(issue_id) for issue_id in ids], lats, lons, times)
+            self._report(np.asarray(lats)[new], np.asarray(lons)[new], np.asarray(times)[new])
+            self._written(region)
+
+    def update_issue(self, issue_id, image_path=None, description=None, latitude=None,
+                     longitude=None, image_hash=None, status=None):
+        """
+        Update a registered issue, moving it if it changes region. Like
+        updates within a shard, a move is not reported to watch_inserts().
+        """
+        detector = self._locate(issue_id)
+        if detector is None:
+            return False
+        current = detector.export_issue(issue_id)
+        if current is None:
+            return False
+
+        new_latitude = latitude if latitude is not None else current[0]
+        new_longitude = longitude if longitude is not None else current[1]
+        region = self.region_of(new_latitude, new_longitude)
+        target = self._shard(region, create=True)
+        if target is detector:
+            return detector.update_issue(
+                issue_id, image_path, description, latitude, longitude, image_hash, status
+            )
+
+        # Featurize changed fields with the target shard, carry over the rest
+        if image_hash is None and image_path:
+            from image_context import compute_packed_hash
+            image_hash = compute_packed_hash(image_path)
+        _, _, old_hash, text_indices, text_values, created_at, old_status = current
+        if description is not None:
+            text_row = target.vectorize([description])
+            text_indices, text_values = text_row.indices, text_row.data
+        detector.remove_issue(issue_id)
+        target.insert_row(
+            issue_id, new_latitude, new_longitude,
+            image_hash if image_hash is not None else old_hash,
+            text_indices, text_values, created_at,
+            status if status is not None else old_status
+        )
+        self._map.assign(region, [self._template._key(issue_id)], [new_latitude], [new_longitude], [created_at])
+        self._written(region)
+        return True
+
+    def watch_inserts(self, listener):
+        """
+        As DuplicateDetector.watch_inserts, for the issues of every region:
+        those on disk are read from their snapshots (without loading the
+        shards), new ones are reported as this or another process adds them
+        """
+        self._insert_listener = listener
+        # Skip other processes' additions so far, the snapshots include them
+        self._map.poll()
+        for region in self._disk_regions():
+            for attempt in range(3):
+                try:
+                    locations = snapshot_locations(self._region_dir(region))
+                    break
+                except FileNotFoundError:
+                    locations = None  # replaced by a newer snapshot while reading, retry
+            if locations is not None:
+                self._report(*locations)
+
+    def remove_issue(self, issue_id):
+        detector = self._locate(issue_id)
+        removed = detector is not None and detector.remove_issue(issue_id)
+        self._map.remove([self._template._key(issue_id)])
+        return removed
+
+    def check_duplicate(self, image, description, latitude, longitude):
+        """Best match over the regions within reach of the location"""
+        best = (False, None, 0.0)
+        for region in self._query_regions(latitude, longitude):
+            detector = self._shard(region)
+            if detector is None:
+                continue
+            result = detector.check_duplicate(image, description, latitude, longitude)
+            if result[2] > best[2]:
+                best = result
+        return best
+
+    def evict_expired(self, now=None):
+        evicted = 0
+        for _, shared in self._loaded():
+            detector = shared.detector
+            with detector._lock:
+                before = list(detector.id_to_row)
+                count = detector.evict_expired(now)
+                if count:
+                    self._map.remove([key for key in before if key not in detector.id_to_row])
+            evicted += count
+        return evicted
+
+    def load_existing_issues(self, dataset):
+        """Load existing issues from dataset (see DuplicateDetector.load_existing_issues)"""
+        from hash_utils import parse_hex_hash
+        from issue_fields import parse_timestamp
+
+        print(f"Loading {len(dataset)} existing issues...")
+        for index, record in enumerate(dataset):
+            image_hash = record.get('imageHash')
+            self.add_existing_issue(
+                issue_id=record.get('id', index + 1),
+                image_path=record['imageURL'].replace('file://', ''),
+                description=record['description'],
+                latitude=record['latitude'],
+                longitude=record['longitude'],
+                image_hash=parse_hex_hash(image_hash) if image_hash else None,
+                created_at=parse_timestamp(record.get('timestamp')),
+                status=record.get('status', 'pending')
+            )
+        print(f"✅ Loaded {self.issue_count} existing issues in {len(self._shards)} regions")
+
+    def memory_usage(self):
+        loaded = self._loaded()
+        sizes = {region: shared.detector.memory_usage()['total_bytes'] for region, shared in loaded}
+        loaded_issues = sum(shared.detector.issue_count for _, shared in loaded)
+        with self._lock:
+            for region, size in sizes.items():
+                if region in self._shard_bytes:
+                    self._shard_bytes[region] = size
+        total = sum(sizes.values())
+        return {
+            'total_bytes': total,
+            'budget_bytes': self.memory_budget,
+            'bytes_per_issue': round(total / loaded_issues, 1) if loaded_issues else 0.0
+        }
+
+    def get_statistics(self):
+        return {
+            'total_issues': self.issue_count,
+            'location_radius': self.location_radius,
+            'similarity_threshold': self.similarity_threshold,
+            'index_version': self.version,
+            'max_age_seconds': self._template.max_age_seconds,
+            'match_statuses': list(self._template.match_statuses),
+            'evicted': self.evicted,
+            'region_precision': self.precision,
+            'regions_loaded': len(self._shards),
+            'regions_on_disk': len(self._disk_regions()),
+            'memory': self.memory_usage()
+        }
+
+    # SharedIndex interface (main.py drives both the same way)
+
+    def load(self):
+        """
+        Load the region map (shards load on first use); raises
+        FileNotFoundError when there are no regions yet
+        """
+        regions = [region for region in self._disk_regions() if self._on_disk(region)]
+        if not regions:
+            raise FileNotFoundError(f"No region snapshots in {self.regions_dir}")
+        with self._map.lock.exclusive():
+            if not self._map.exists():
+                # Written before the region map existed: built once from the snapshots
+                print(f"Building the region map of {len(regions)} regions...")
+                self._map.rebuild({region: snapshot_issue_ids(self._region_dir(region)) for region in regions})
+            self._map.load()
+        print(f"✅ Found {len(regions)} duplicate index regions ({self.issue_count} issues)")
+        return {'regions': len(regions)}
+
+    def snapshot(self):
+        """Snapshot every loaded region and the region map; returns {region: generation}"""
+        generations = {}
+        for region, shared in self._loaded():
+            with self._region_lock(region):
+                generations[region] = shared.snapshot()
+            with self._lock:
+                if region in self._shards:
+                    self._saved_versions[region] = shared.detector.version
+        self._report_entries(self._map.compact())
+        return generations
+
+    def poll(self):
+        """Apply other workers' changes to the loaded regions and the region map"""
+        applied = sum(shared.poll() for _, shared in self._loaded())
+        self._report_entries(self._map.poll())
+        return applied
+
+    def stats(self):
+        """Per-region cache counters"""
+        counts = self._map.counts()
+        with self._lock:
+            regions = {}
+            for region, stats in sorted(self._region_stats.items()):
+                loaded = region in self._shards
+                regions[region] = {
+                    **stats,
+                    'load_seconds': round(stats['load_seconds'], 4),
+                    'loaded': loaded,
+                    'issues': self._shards[region].detector.issue_count if loaded else counts.get(region, 0),
+                    'bytes': self._shard_bytes.get(region, 0)
+                }
+            return {
+                'precision': self.precision,
+                'loaded': list(self._shards),
+                'budget_bytes': self.memory_budget,
+                'regions': regions,
+                'pid': os.getpid()
+            }
@@ -0,0 +1,234 @@
+"""
+Sliding-window report counts per geo cell
+
+Reports are counted in the same lat/lon grid as SpatialIndex. Each cell
+keeps a small ring of time buckets (window / buckets seconds each) and a
+running total, so recording a report and reading the count around a
+location are O(1) and independent of how many issues exist. Buckets that
+slide out of the window are subtracted lazily when the cell is touched.
+"""
+import math
+import threading
+import time
+import numpy as np
+
+from spatial_index import METERS_PER_DEGREE
+
+# Cells are swept for expired counts once this many reports arrived since
+# the last sweep (or as many as there are cells, whichever is larger)
+MIN_PRUNE_INTERVAL = 4096
+
+# count_many() reads every cell once instead of looking up 9 per location
+# when there are fewer than this many cells per distinct query cell
+DENSE_COUNT_RATIO = 4
+
+
+class _Cell:
+    __slots__ = ('counts', 'stamps', 'total', 'expired_through')
+
+    def __init__(self, buckets):
+        self.counts = [0] * buckets
+        self.stamps = [-1] * buckets  # bucket number held by each slot
+        self.total = 0
+        self.expired_through = -1     # buckets up to here are already subtracted
+
+
+class RepeatReportCounter:
+    """
+    Number of reports near a location within the last window_seconds.
+    A count covers the location's cell and its 8 neighbours, i.e. reports
+    within roughly one to two cell sizes.
+    """
+    def __init__(self, cell_size_meters=100, window_seconds=30 * 86400, buckets=30):
+        self.cell_size_deg = cell_size_meters / METERS_PER_DEGREE
+        self.lon_cells = int(math.ceil(360.0 / self.cell_size_deg))
+        self.window_seconds = window_seconds
+        self.buckets = buckets
+        self.bucket_seconds = window_seconds / buckets
+        self._cells = {}  # (row, col) -> _Cell
+        self._since_prune = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Cells holding counts"""
+        return len(self._cells)
+
+    def _cell(self, latitude, longitude):
+        row = int(math.floor((latitude + 90.0) / self.cell_size_deg))
+        col = int(math.floor((longitude + 180.0) / self.cell_size_deg)) % self.lon_cells
+        return row, col
+
+    def _bucket(self, timestamp):
+        return int(timestamp // self.bucket_seconds)
+
+    def _expire(self, cell, current):
+        """Subtract the buckets of a cell that left the window ending at bucket current"""
+        cutoff = current - self.buckets
+        if cell.expired_through >= cutoff:
+            return
+        if cutoff - cell.expired_through >= self.buckets:
+            # The whole ring is older than the window
+            cell.counts = [0] * self.buckets
+            cell.total = 0
+        else:
+            for bucket in range(cell.expired_through + 1, cutoff + 1):
+                slot = bucket % self.buckets
+                if cell.stamps[slot] == bucket:
+                    cell.total -= cell.counts[slot]
+                    cell.counts[slot] = 0
+        cell.expired_through = cutoff
+
+    def _add(self, key, bucket, count, current):
+        if bucket <= current - self.buckets:
+            return  # already outside the window
+        bucket = min(bucket, current)  # clock skew: future reports count as now
+        cell = self._cells.get(key)
+        if cell is None:
+            cell = self._cells[key] = _Cell(self.buckets)
+        self._expire(cell, current)
+        slot = bucket % self.buckets
+        if cell.stamps[slot] != bucket:
+            if cell.stamps[slot] > bucket:
+                return  # slot reused by a newer bucket, so this one has expired
+            cell.total -= cell.counts[slot]
+            cell.counts[slot] = 0
+            cell.stamps[slot] = bucket
+        cell.counts[slot] += count
+        cell.total += count
+
+    def record(self, latitude, longitude, timestamp=None, now=None):
+        """Count one report (timestamp in epoch seconds, default now)"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            self._add(
+                self._cell(latitude, longitude),
+                self._bucket(timestamp if timestamp is not None else now), 1, self._bucket(now)
+            )
+            self._reported(1, now)
+
+    def record_many(self, latitudes, longitudes, timestamps=None, now=None):
+        """Count many reports at once (cells and buckets are computed vectorized)"""
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        if len(latitudes) == 0:
+            return
+        now = now if now is not None else time.time()
+        timestamps = np.full(len(latitudes), now) if timestamps is None \
+            else np.asarray(timestamps, dtype=np.float64)
+
+        current = self._bucket(now)
+        buckets = np.floor(timestamps / self.bucket_seconds).astype(np.int64)
+        recent = buckets > current - self.buckets
+        rows = np.floor((latitudes[recent] + 90.0) / self.cell_size_deg).astype(np.int64)
+        cols = np.floor((longitudes[recent] + 180.0) / self.cell_size_deg).astype(np.int64) % self.lon_cells
+        groups, counts = np.unique(
+            np.stack([rows, cols, np.minimum(buckets[recent], current)]), axis=1, return_counts=True
+        )
+        with self._lock:
+            for (row, col, bucket), count in zip(groups.T.tolist(), counts.tolist()):
+                self._add((row, col), bucket, count, current)
+            self._reported(len(latitudes), now)
+
+    def count(self, latitude, longitude, now=None):
+        """Reports within the window in the location's cell and its neighbours"""
+        current = self._bucket(now if now is not None else time.time())
+        row, col = self._cell(latitude, longitude)
+        total = 0
+        with self._lock:
+            for d_row in (-1, 0, 1):
+                for d_col in (-1, 0, 1):
+                    cell = self._cells.get((row + d_row, (col + d_col) % self.lon_cells))
+                    if cell is not None:
+                        self._expire(cell, current)
+                        total += cell.total
+        return total
+
+    def count_many(self, latitudes, longitudes, now=None):
+        """count() for many locations; locations sharing a cell are counted once"""
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        if len(latitudes) == 0:
+            return np.zeros(0, dtype=np.int64)
+        current = self._bucket(now if now is not None else time.time())
+        rows = np.floor((latitudes + 90.0) / self.cell_size_deg).astype(np.int64)
+        cols = np.floor((longitudes + 180.0) / self.cell_size_deg).astype(np.int64) % self.lon_cells
+        keys, inverse = np.unique(rows * self.lon_cells + cols, return_inverse=True)
+
+        with self._lock:
+            if len(self._cells) < DENSE_COUNT_RATIO * len(keys):
+                totals = self._neighbour_totals_dense(keys, current)
+            else:
+                totals = self._neighbour_totals(keys, current)
+        return totals[inverse.reshape(-1)]
+
+    def _neighbour_totals(self, keys, current):
+        """Window totals around each cell key, by dictionary lookups"""
+        totals = [0] * len(keys)
+        for i, (row, col) in enumerate(zip((keys // self.lon_cells).tolist(), (keys % self.lon_cells).tolist())):
+            total = 0
+            for d_row in (-1, 0, 1):
+                for d_col in (-1, 0, 1):
+                    cell = self._cells.get((row + d_row, (col + d_col) % self.lon_cells))
+                    if cell is not None:
+                        self._expire(cell, current)
+                        total += cell.total
+            totals[i] = total
+        return np.array(totals, dtype=np.int64)
+
+    def _neighbour_totals_dense(self, keys, current):
+        """Window totals around each cell key, by binary search over all cells (large batches)"""
+        totals = np.zeros(len(keys), dtype=np.int64)
+        if not self._cells:
+            return totals
+        for cell in self._cells.values():
+            self._expire(cell, current)
+        cells = np.array(list(self._cells.keys()), dtype=np.int64)
+        cell_keys = cells[:, 0] * self.lon_cells + cells[:, 1]
+        order = np.argsort(cell_keys)
+        cell_keys = cell_keys[order]
+        cell_totals = np.fromiter(
+            (cell.total for cell in self._cells.values()), dtype=np.int64, count=len(self._cells)
+        )[order]
+
+        rows, cols = keys // self.lon_cells, keys % self.lon_cells
+        for d_row in (-1, 0, 1):
+            for d_col in (-1, 0, 1):
+                neighbours = (rows + d_row) * self.lon_cells + (cols + d_col) % self.lon_cells
+                found = np.minimum(np.searchsorted(cell_keys, neighbours), len(cell_keys) - 1)
+                hit = cell_keys[found] == neighbours
+                totals[hit] += cell_totals[found[hit]]
+        return totals
+
+    def _reported(self, count, now):
+        self._since_prune += count
+        if self._since_prune > max(MIN_PRUNE_INTERVAL, len(self._cells)):
+            self._prune(self._bucket(now))
+
+    def _prune(self, current):
+        empty = []
+        for key, cell in self._cells.items():
+            self._expire(cell, current)
+            if cell.total == 0:
+                empty.append(key)
+        for key in empty:
+            del self._cells[key]
+        self._since_prune = 0
+
+    def prune(self, now=None):
+        """Drop cells without reports in the window, returns how many"""
+        with self._lock:
+            cells = len(self._cells)
+            self._prune(self._bucket(now if now is not None else time.time()))
+            return cells - len(self._cells)
+
+    def clear(self):
+        with self._lock:
+            self._cells = {}
+            self._since_prune = 0
+
+    def get_statistics(self):
+        return {
+            'cells': len(self._cells),
+            'window_seconds': self.window_seconds,
+            'bucket_seconds': self.bucket_seconds
+        }
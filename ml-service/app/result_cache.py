@@ -0,0 +1,113 @@
+"""
+Idempotent /predict results: TTL cache plus single-flight coalescing
+"""
+import asyncio
+import re
+import time
+from collections import OrderedDict
+
+# Coordinates are rounded to ~1 m before keying
+COORDINATE_DECIMALS = 5
+
+
+def normalize_description(description):
+    """Case- and whitespace-insensitive form of a description"""
+    return re.sub(r'\s+', ' ', description).strip().lower()
+
+
+def prediction_key(image_digest, description, latitude, longitude):
+    return (
+        image_digest,
+        normalize_description(description),
+        round(latitude, COORDINATE_DECIMALS),
+        round(longitude, COORDINATE_DECIMALS)
+    )
+
+
+class PredictionCache:
+    """
+    Results are stored with the version they were computed against (the
+    duplicate index, online model and known fakes versions); once any of
+    them changes they no longer match and count as misses.
+    Identical requests that arrive while one is computing await the same
+    task instead of running the pipeline again. Only the event loop touches
+    this object, so it needs no lock. ttl_seconds=0 disables result caching
+    (coalescing still applies).
+    """
+    def __init__(self, ttl_seconds=30, max_entries=10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (version, expires_at, result)
+        self._in_flight = {}  # (key, version) -> asyncio.Task
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidated = 0
+
+    def get(self, key, version):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        entry_version, expires_at, result = entry
+        if entry_version != version or expires_at <= time.monotonic():
+            del self._entries[key]
+            if entry_version != version:
+                self.invalidated += 1
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def put(self, key, version, result):
+        if self.ttl_seconds <= 0:
+            return
+        self._entries[key] = (version, time.monotonic() + self.ttl_seconds, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_compute(self, key, version, compute):
+        """
+        (result, outcome) for (key, version): the cached result ('hit'), the
+        result of an identical call already in flight ('coalesced'), or of
+        compute() (a coroutine function), shared with every identical
+        concurrent caller ('miss')
+        """
+        result = self.get(key, version)
+        if result is not None:
+            self.hits += 1
+            return result, 'hit'
+
+        flight_key = (key, version)
+        task = self._in_flight.get(flight_key)
+        if task is not None:
+            self.coalesced += 1
+            outcome = 'coalesced'
+        else:
+            self.misses += 1
+            outcome = 'miss'
+            # A separate task, so a disconnecting caller cannot cancel the
+            # computation the others are waiting on
+            task = asyncio.ensure_future(compute())
+            self._in_flight[flight_key] = task
+
+            def finished(done):
+                self._in_flight.pop(flight_key, None)
+                if not done.cancelled() and done.exception() is None:
+                    self.put(key, version, done.result())
+            task.add_done_callback(finished)
+
+        return await asyncio.shield(task), outcome
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {
+            'ttl_seconds': self.ttl_seconds,
+            'entries': len(self._entries),
+            'in_flight': len(self._in_flight),
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'invalidated': self.invalidated
+        }
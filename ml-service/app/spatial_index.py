@@ -0,0 +1,103 @@
+"""
+Grid bucket spatial index for radius queries over issue locations
+"""
+import math
+import numpy as np
+
+EARTH_RADIUS_METERS = 6371008.8
+METERS_PER_DEGREE = 111320.0
+
+
+def haversine_meters(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two coordinates in meters"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(min(1.0, math.sqrt(a)))
+
+
+class SpatialIndex:
+    """
+    Buckets points into a fixed lat/lon grid so that a radius query only
+    touches the cells overlapping the search circle instead of every point.
+    """
+    def __init__(self, cell_size_meters=100):
+        self.cell_size_deg = cell_size_meters / METERS_PER_DEGREE
+        self.lon_cells = int(math.ceil(360.0 / self.cell_size_deg))
+        self.buckets = {}  # (row, col) -> set of keys
+        self.points = {}   # key -> (latitude, longitude)
+
+    def __len__(self):
+        return len(self.points)
+
+    def _cell(self, latitude, longitude):
+        row = int(math.floor((latitude + 90.0) / self.cell_size_deg))
+        col = int(math.floor((longitude + 180.0) / self.cell_size_deg)) % self.lon_cells
+        return row, col
+
+    def insert(self, key, latitude, longitude):
+        """Add (or move) a point"""
+        if key in self.points:
+            self.remove(key)
+        self.points[key] = (latitude, longitude)
+        self.buckets.setdefault(self._cell(latitude, longitude), set()).add(key)
+
+    def bulk_insert(self, keys, latitudes, longitudes):
+        """Add many new points at once (cells are computed vectorized)"""
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        rows = np.floor((latitudes + 90.0) / self.cell_size_deg).astype(np.int64)
+        cols = np.floor((longitudes + 180.0) / self.cell_size_deg).astype(np.int64) % self.lon_cells
+        for key, lat, lon, row, col in zip(
+            np.asarray(keys).tolist(), latitudes.tolist(), longitudes.tolist(),
+            rows.tolist(), cols.tolist()
+        ):
+            if key in self.points:
+                self.remove(key)
+            self.points[key] = (lat, lon)
+            self.buckets.setdefault((row, col), set()).add(key)
+
+    def remove(self, key):
+        """Remove a point, returns False if it was not indexed"""
+        point = self.points.pop(key, None)
+        if point is None:
+            return False
+        cell = self._cell(*point)
+        bucket = self.buckets.get(cell)
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self.buckets[cell]
+        return True
+
+    def query(self, latitude, longitude, radius_meters):
+        """
+        Return keys of points within radius_meters (haversine distance).
+        Returns: list of (key, distance_meters)
+        """
+        dlat = radius_meters / METERS_PER_DEGREE
+        cos_lat = math.cos(math.radians(min(89.9, abs(latitude) + dlat)))
+        dlon = min(180.0, dlat / max(cos_lat, 1e-6))
+
+        row_min, _ = self._cell(max(-90.0, latitude - dlat), longitude)
+        row_max, _ = self._cell(min(90.0, latitude + dlat), longitude)
+        col_span = int(math.ceil(dlon / self.cell_size_deg))
+        _, col_center = self._cell(latitude, longitude)
+        if 2 * col_span + 1 >= self.lon_cells:
+            cols = range(self.lon_cells)
+        else:
+            cols = [(col_center + offset) % self.lon_cells for offset in range(-col_span, col_span + 1)]
+
+        results = []
+        for row in range(row_min, row_max + 1):
+            for col in cols:
+                bucket = self.buckets.get((row, col))
+                if not bucket:
+                    continue
+                for key in bucket:
+                    lat2, lon2 = self.points[key]
+                    distance = haversine_meters(latitude, longitude, lat2, lon2)
+                    if distance <= radius_meters:
+                        results.append((key, distance))
+        return results
@@ -0,0 +1,80 @@
+"""
+Startup progress for liveness/readiness probes
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupProgress:
+    """
+    Tracks the named stages of service startup (imports, model, index).
+    Ready once every stage has completed; a failed stage keeps the service
+    unready and is reported with its error.
+    """
+    def __init__(self, stages):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.ready_at = None
+        self.stages = {
+            name: {'state': 'pending', 'seconds': None, 'error': None}
+            for name in stages
+        }
+        self._started = {}
+
+    def begin(self, name):
+        with self._lock:
+            self.stages[name]['state'] = 'running'
+            self._started[name] = time.perf_counter()
+
+    def complete(self, name):
+        with self._lock:
+            self._finish(name, 'done')
+            if all(stage['state'] == 'done' for stage in self.stages.values()):
+                self.ready_at = time.time()
+
+    def fail(self, name, error):
+        with self._lock:
+            self._finish(name, 'failed')
+            self.stages[name]['error'] = str(error)
+
+    @contextmanager
+    def stage(self, name):
+        """Run a block as a stage: begin, then complete or fail"""
+        self.begin(name)
+        try:
+            yield
+        except Exception as e:
+            self.fail(name, e)
+            raise
+        self.complete(name)
+
+    def is_done(self, *names):
+        with self._lock:
+            return all(self.stages[name]['state'] == 'done' for name in names)
+
+    def _finish(self, name, state):
+        stage = self.stages[name]
+        stage['state'] = state
+        started = self._started.pop(name, None)
+        if started is not None:
+            stage['seconds'] = round(time.perf_counter() - started, 3)
+
+    @property
+    def ready(self):
+        return self.ready_at is not None
+
+    @property
+    def failed(self):
+        return any(stage['state'] == 'failed' for stage in self.stages.values())
+
+    def snapshot(self):
+        with self._lock:
+            done = sum(1 for stage in self.stages.values() if stage['state'] == 'done')
+            return {
+                'ready': self.ready_at is not None,
+                'uptime_seconds': round(time.time() - self.started_at, 2),
+                'startup_seconds': round(self.ready_at - self.started_at, 2) if self.ready_at else None,
+                'progress': f"{done}/{len(self.stages)}",
+                'stages': {name: dict(stage) for name, stage in self.stages.items()}
+            }
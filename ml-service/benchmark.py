@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Component micro-benchmarks
+
+Builds seeded synthetic corpora with utils/generate_dataset.py and times the
+ML components on them. Results are written as JSON so runs from different
+commits can be compared:
+
+    python benchmark.py --sizes 1000 10000 100000 --output before.json
+"""
+import sys
+import os
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+import tempfile
+
+import numpy as np
+
+# Add app directory to path
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app')
+sys.path.insert(0, APP_DIR)
+
+from utils.generate_dataset import generate_dataset
+from category_predictor import CategoryPredictor
+from duplicate_detector import DuplicateDetector
+from priority_assigner import PriorityAssigner
+from authenticity_checker import AuthenticityChecker
+from image_context import ImageContext
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the ML service components")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help="Corpus sizes for the duplicate detector (up to 1000000)")
+    parser.add_argument('--spreads', type=float, nargs='+', default=[0.1, 0.01, 0.001],
+                        help="Scatter (degrees) around each city for the density sweep")
+    parser.add_argument('--density-size', type=int, default=10000,
+                        help="Corpus size used for the density sweep")
+    parser.add_argument('--queries', type=int, default=200,
+                        help="Timed calls per measurement")
+    parser.add_argument('--image-pool', type=int, default=8,
+                        help="Distinct images per category in generated corpora")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--work-dir', default=None,
+                        help="Where corpora are generated (default: a temporary directory)")
+    parser.add_argument('--skip-cold-start', action='store_true')
+    parser.add_argument('--output', default='benchmark_results.json')
+    return parser.parse_args()
+
+def summarize(durations):
+    """Latency statistics (milliseconds) for a list of durations in seconds"""
+    durations = np.asarray(durations) * 1000
+    total = durations.sum() / 1000
+    return {
+        'calls': int(len(durations)),
+        'total_seconds': float(total),
+        'mean_ms': float(durations.mean()),
+        'p50_ms': float(np.percentile(durations, 50)),
+        'p95_ms': float(np.percentile(durations, 95)),
+        'p99_ms': float(np.percentile(durations, 99)),
+        'max_ms': float(durations.max()),
+        'per_second': float(len(durations) / total) if total > 0 else None
+    }
+
+def time_calls(fn, args_list):
+    """Call fn(*args) for each args tuple and summarize the latencies"""
+    durations = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        durations.append(time.perf_counter() - start)
+    return summarize(durations)
+
+def build_corpus(size, work_dir, seed, image_pool, spread_degrees=0.1):
+    """Seeded corpus whose records carry precomputed image hashes"""
+    output_dir = os.path.join(work_dir, f"corpus-{size}-{spread_degrees}")
+    start = time.perf_counter()
+    dataset = generate_dataset(
+        num_samples=size, output_dir=output_dir, seed=seed,
+        image_pool=image_pool, spread_degrees=spread_degrees, verbose=False
+    )
+    elapsed = time.perf_counter() - start
+
+    # Hash each pooled image once (hashing is benchmarked separately)
+    hashes = {}
+    for record in dataset:
+        url = record['imageURL']
+        if url not in hashes:
+            hashes[url] = str(ImageContext.from_path(url.replace('file://', '')).average_hash)
+        record['imageHash'] = hashes[url]
+    return dataset, elapsed
+
+def query_args(dataset, count, rng, detector):
+    """Queries near existing issues, with their image hashes already computed"""
+    contexts = {}
+    args = []
+    for record in rng.sample(dataset, min(count, len(dataset))):
+        url = record['imageURL']
+        if url not in contexts:
+            contexts[url] = ImageContext.from_path(url.replace('file://', ''))
+            contexts[url].packed_hash
+        # ~10 m away from the stored issue
+        args.append((
+            contexts[url], record['description'],
+            record['latitude'] + rng.uniform(-1e-4, 1e-4),
+            record['longitude'] + rng.uniform(-1e-4, 1e-4)
+        ))
+    neighbours = [len(detector.find_nearby_issues(a[2], a[3])) for a in args]
+    return args, float(np.mean(neighbours))
+
+def bench_duplicate_detector(dataset, queries, rng):
+    detector = DuplicateDetector(location_radius_meters=100, similarity_threshold=0.80)
+    start = time.perf_counter()
+    detector.load_existing_issues(dataset)
+    load_seconds = time.perf_counter() - start
+
+    args, mean_neighbours = query_args(dataset, queries, rng, detector)
+    return {
+        'issues': len(dataset),
+        'load_existing_issues': {
+            'seconds': load_seconds,
+            'issues_per_second': len(dataset) / load_seconds if load_seconds > 0 else None
+        },
+        'mean_neighbours_within_radius': mean_neighbours,
+        'check_duplicate': time_calls(detector.check_duplicate, args)
+    }
+
+def bench_image_components(dataset, queries, rng):
+    """Category features/prediction and authenticity on freshly decoded images"""
+    # Train on a seeded sample so the numbers don't depend on local models
+    predictor = CategoryPredictor()
+    sample = rng.sample(dataset, min(500, len(dataset)))
+    start = time.perf_counter()
+    predictor.train(sample)
+    train_seconds = time.perf_counter() - start
+
+    # Raw bytes are read up front so only decode + compute is timed
+    image_bytes = {}
+    for record in sample:
+        path = record['imageURL'].replace('file://', '')
+        if path not in image_bytes:
+            with open(path, 'rb') as f:
+                image_bytes[path] = f.read()
+
+    records = [rng.choice(sample) for _ in range(queries)]
+
+    def fresh(record):
+        path = record['imageURL'].replace('file://', '')
+        return ImageContext(image_bytes[path], source=path)
+
+    checker = AuthenticityChecker()
+    return {
+        'train': {'samples': len(sample), 'seconds': train_seconds},
+        'extract_image_features': time_calls(
+            predictor.extract_image_features, [(fresh(r),) for r in records]
+        ),
+        'predict': time_calls(
+            predictor.predict, [(fresh(r), r['description']) for r in records]
+        ),
+        'verify_authenticity': time_calls(
+            checker.verify_authenticity, [(fresh(r),) for r in records]
+        )
+    }
+
+def bench_priority(dataset, queries, rng):
+    assigner = PriorityAssigner()
+    assigner.record_reports([r['latitude'] for r in dataset], [r['longitude'] for r in dataset])
+    args = [
+        (r['category'], r['description'], r['latitude'], r['longitude'], rng.random() < 0.2)
+        for r in (rng.choice(dataset) for _ in range(queries * 10))
+    ]
+    # The same issues as one column-wise call (per-item latency for comparison)
+    start = time.perf_counter()
+    assigner.assign_priorities(*zip(*args))
+    seconds = time.perf_counter() - start
+    return {
+        'assign_priority': time_calls(assigner.assign_priority, args),
+        'assign_priorities': {
+            'items': len(args),
+            'total_seconds': seconds,
+            'per_item_us': seconds / len(args) * 1e6
+        }
+    }
+
+COLD_START_SCRIPT = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+asyncio.run(main.load_models())
+ready = time.perf_counter()
+print(json.dumps({
+    'import_seconds': imported - start,
+    'startup_seconds': ready - imported,
+    'total_seconds': ready - start,
+    'model_loaded': main.category_predictor.is_trained,
+    'duplicate_issues': main.duplicate_detector.issue_count
+}))
+"""
+
+def bench_cold_start(work_dir):
+    """
+    Service cold start in a fresh interpreter: the first run builds the
+    duplicate index snapshot, the second loads it
+    """
+    env = dict(os.environ, DUPLICATE_INDEX_DIR=os.path.join(work_dir, 'cold_start_index'))
+    runs = {}
+    for name in ('without_snapshot', 'with_snapshot'):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-c', COLD_START_SCRIPT],
+            cwd=APP_DIR, env=env, capture_output=True, text=True
+        )
+        wall = time.perf_counter() - start
+        if result.returncode != 0:
+            runs[name] = {'error': result.stderr.strip().splitlines()[-1:]}
+            continue
+        runs[name] = json.loads(result.stdout.strip().splitlines()[-1])
+        runs[name]['process_seconds'] = wall
+    return runs
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='civic-bench-')
+
+    print("=" * 60)
+    print("CIVIC ISSUE ML BENCHMARKS")
+    print("=" * 60)
+    print(f"Working directory: {work_dir}")
+
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'seed': args.seed,
+            'queries': args.queries,
+            'image_pool': args.image_pool
+        },
+        'corpus_generation': {},
+        'duplicate_detector': {'scaling': [], 'density': []}
+    }
+
+    # Duplicate detection vs corpus size
+    for size in sorted(args.sizes):
+        print(f"\n📊 Duplicate detector, {size} issues...")
+        dataset, generate_seconds = build_corpus(size, work_dir, args.seed, args.image_pool)
+        results['corpus_generation'][str(size)] = {'seconds': generate_seconds}
+        entry = bench_duplicate_detector(dataset, args.queries, rng)
+        results['duplicate_detector']['scaling'].append(entry)
+        print(f"  - load: {entry['load_existing_issues']['seconds']:.2f} s, "
+              f"check_duplicate p50: {entry['check_duplicate']['p50_ms']:.2f} ms")
+
+    # Duplicate detection vs neighbourhood density
+    for spread in args.spreads:
+        print(f"\n📍 Duplicate detector, {args.density_size} issues within {spread} degrees...")
+        dataset, _ = build_corpus(args.density_size, work_dir, args.seed, args.image_pool, spread)
+        entry = bench_duplicate_detector(dataset, args.queries, rng)
+        entry['spread_degrees'] = spread
+        results['duplicate_detector']['density'].append(entry)
+        print(f"  - neighbours: {entry['mean_neighbours_within_radius']:.1f}, "
+              f"check_duplicate p50: {entry['check_duplicate']['p50_ms']:.2f} ms")
+
+    # Per-image components on the smallest corpus
+    print("\n🖼️  Category prediction and authenticity...")
+    dataset, _ = build_corpus(min(args.sizes), work_dir, args.seed, args.image_pool)
+    results['image_components'] = bench_image_components(dataset, args.queries, rng)
+    results['priority_assigner'] = bench_priority(dataset, args.queries, rng)
+
+    if not args.skip_cold_start:
+        print("\n🚀 Service cold start...")
+        results['cold_start'] = bench_cold_start(work_dir)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print("\n" + "=" * 60)
+    print(f"✅ Results written to {args.output}")
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
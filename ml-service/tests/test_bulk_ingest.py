@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from bulk_ingest import ingest_jsonl, normalize_record
+from duplicate_detector import DuplicateDetector
+
+
+def write_jsonl(path, records):
+    with open(path, 'w') as f:
+        for record in records:
+            f.write((record if isinstance(record, str) else json.dumps(record)) + '\n')
+
+
+def test_generator_and_backend_records():
+    assert normalize_record(
+        {'id': 'a', 'latitude': 40.7, 'longitude': -74.0, 'description': 'pothole'}, 1
+    )[:4] == ('a', 40.7, -74.0, 'pothole')
+    assert normalize_record(
+        {'_id': {'$oid': 'b'}, 'location': {'type': 'Point', 'coordinates': [-74.0, 40.7]},
+         'description': 'pothole'}, 2
+    )[:4] == ('b', 40.7, -74.0, 'pothole')
+
+
+@pytest.mark.parametrize('description', [None, 42, ['pothole']])
+def test_non_string_description_is_rejected(description):
+    with pytest.raises(ValueError):
+        normalize_record({'id': 'a', 'latitude': 40.7, 'longitude': -74.0, 'description': description}, 1)
+
+
+def test_bad_records_are_skipped_not_fatal(tmp_path):
+    path = str(tmp_path / 'issues.jsonl')
+    write_jsonl(path, [
+        {'id': 'ok-1', 'latitude': 40.7128, 'longitude': -74.006, 'description': 'Garbage pile'},
+        {'id': 'null', 'latitude': 40.7128, 'longitude': -74.006, 'description': None},
+        {'id': 'number', 'latitude': 40.7128, 'longitude': -74.006, 'description': 7},
+        {'id': 'far', 'latitude': 91.0, 'longitude': 0.0, 'description': 'Out of range'},
+        '{"id": "torn", "latitude": 40.7',
+        {'id': 'ok-2', 'latitude': 40.7130, 'longitude': -74.006, 'description': 'Broken street light',
+         'imageHash': 'ffff0000ffff0000'},
+    ])
+    detector = DuplicateDetector()
+    # Small chunks, so the bad records land in different batches
+    result = ingest_jsonl(detector, path, chunk_size=2, fetch_images=False)
+
+    assert result['state'] == 'done'
+    assert (result['records'], result['ingested'], result['skipped']) == (6, 2, 4)
+    assert detector.issue_count == 2
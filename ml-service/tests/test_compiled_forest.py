@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from sklearn.datasets import make_classification
+from sklearn.ensemble import RandomForestClassifier
+
+from compiled_forest import CompiledForest
+
+CATEGORIES = np.array(['Garbage Issue', 'Road Damage / Pothole', 'Street Light Failure', 'Water Leakage'])
+
+
+@pytest.fixture(scope='module')
+def forest():
+    X, y = make_classification(
+        n_samples=800, n_features=16, n_informative=8, n_classes=4, random_state=0
+    )
+    # Coarse columns put many samples exactly on split thresholds
+    X[:, :4] = np.round(X[:, :4], 1)
+    model = RandomForestClassifier(n_estimators=30, min_samples_leaf=2, random_state=0)
+    model.fit(X[:600], CATEGORIES[y[:600]])
+    return model, X
+
+
+def assert_same_predictions(compiled, model, X):
+    expected = model.predict_proba(X)
+    np.testing.assert_allclose(compiled.predict_proba(X), expected, rtol=0, atol=1e-6)
+    labels, probabilities = compiled.predict(X)
+    np.testing.assert_array_equal(probabilities, compiled.predict_proba(X))
+    # Labels must agree unless two classes tie (float32 leaves may break it the other way)
+    top_two = np.sort(expected, axis=1)[:, -2:]
+    clear = top_two[:, 1] - top_two[:, 0] > 1e-6
+    assert clear.mean() > 0.9
+    assert labels[clear].tolist() == model.predict(X)[clear].tolist()
+
+
+def test_matches_sklearn(forest):
+    model, X = forest
+    compiled = CompiledForest.from_sklearn(model)
+    assert compiled.n_trees == len(model.estimators_)
+    assert compiled.classes_.tolist() == model.classes_.tolist()
+    assert_same_predictions(compiled, model, X)
+
+
+def test_matches_sklearn_on_split_thresholds(forest):
+    model, X = forest
+    compiled = CompiledForest.from_sklearn(model)
+    # Samples sitting exactly on (the float32 value of) a split threshold,
+    # and one float32 step above it
+    rows = []
+    for estimator in model.estimators_[:5]:
+        tree = estimator.tree_
+        for node in np.flatnonzero(tree.children_left != -1)[:20]:
+            for value in (np.float32(tree.threshold[node]),
+                          np.nextafter(np.float32(tree.threshold[node]), np.float32(np.inf))):
+                row = X[node % len(X)].astype(np.float32)
+                row[tree.feature[node]] = value
+                rows.append(row)
+    assert_same_predictions(compiled, model, np.array(rows))
+
+
+def test_single_sample(forest):
+    model, X = forest
+    compiled = CompiledForest.from_sklearn(model)
+    np.testing.assert_allclose(compiled.predict_proba(X[0]), model.predict_proba(X[:1]), rtol=0, atol=1e-6)
+
+
+def test_saved_forest_is_memory_mapped(forest, tmp_path):
+    model, X = forest
+    CompiledForest.from_sklearn(model).save(str(tmp_path))
+    loaded = CompiledForest.load(str(tmp_path))
+    assert isinstance(loaded.feature, np.memmap)
+    assert_same_predictions(loaded, model, X)
@@ -0,0 +1,44 @@
+import hashlib
+import os
+
+import numpy as np
+
+from feature_store import FeatureStore, file_digest
+
+
+def test_features_survive_a_reload(tmp_path):
+    store_dir = str(tmp_path / 'features')
+    store = FeatureStore(store_dir, extractor_version=1, width=3)
+    store.add('a' * 64, [1.0, 2.0, 3.0])
+    store.add('b' * 64, [4.0, 5.0, 6.0])
+    store.save()
+    store.add('c' * 64, [7.0, 8.0, 9.0])
+    store.save()
+
+    reloaded = FeatureStore(store_dir, extractor_version=1, width=3)
+    assert len(reloaded) == 3 and 'b' * 64 in reloaded
+    np.testing.assert_array_equal(reloaded.get_many(['c' * 64, 'a' * 64]), [[7.0, 8.0, 9.0], [1.0, 2.0, 3.0]])
+    # Only the current generation is kept
+    assert sorted(os.listdir(store_dir)) == ['CURRENT', 'store-000002']
+
+
+def test_store_from_another_extractor_is_discarded(tmp_path):
+    store_dir = str(tmp_path / 'features')
+    store = FeatureStore(store_dir, extractor_version=1, width=3)
+    store.add('a' * 64, [1.0, 2.0, 3.0])
+    store.save()
+
+    assert len(FeatureStore(store_dir, extractor_version=2, width=3)) == 0
+    assert len(FeatureStore(store_dir, extractor_version=1, width=4)) == 0
+
+    rebuilt = FeatureStore(store_dir, extractor_version=2, width=2)
+    rebuilt.add('b' * 64, [1.0, 2.0])
+    rebuilt.save()
+    assert 'a' * 64 not in FeatureStore(store_dir, extractor_version=2, width=2)
+    assert len(FeatureStore(store_dir, extractor_version=1, width=3)) == 0
+
+
+def test_file_digest(tmp_path):
+    path = tmp_path / 'image.jpg'
+    path.write_bytes(b'\xff\xd8 not really a jpeg')
+    assert file_digest(str(path), chunk_size=4) == hashlib.sha256(b'\xff\xd8 not really a jpeg').hexdigest()
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+import hamming_index
+from authenticity_checker import AuthenticityChecker
+from hamming_index import HammingIndex, load_hash_file
+
+
+def random_hashes(rng, count):
+    return rng.integers(0, 2 ** 63, size=count, dtype=np.uint64) * np.uint64(2) \
+        + rng.integers(0, 2, size=count, dtype=np.uint64)
+
+
+def flip_bits(rng, value, bits):
+    for position in rng.choice(64, size=bits, replace=False):
+        value ^= 1 << int(position)
+    return value
+
+
+def brute_force_distance(stored, query):
+    return min(bin(int(value) ^ query).count('1') for value in stored)
+
+
+@pytest.fixture
+def stored_and_queries():
+    rng = np.random.default_rng(0)
+    stored = random_hashes(rng, 3000)
+    queries = [int(value) for value in random_hashes(rng, 50)]
+    # Near variants of stored hashes at every distance the radii below cover
+    for bits in range(0, 14):
+        for value in rng.choice(stored, size=8):
+            queries.append(flip_bits(rng, int(value), bits))
+    return stored, queries
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_nearest_matches_brute_force(stored_and_queries, compact, monkeypatch):
+    stored, queries = stored_and_queries
+    # Keep everything pending (linear scan) or merge it into the chunk tables
+    monkeypatch.setattr(hamming_index, 'MAX_PENDING', len(stored) + 1)
+    index = HammingIndex()
+    index.add_many(stored)
+    if compact:
+        index.compact()
+    assert len(index) == len(stored)
+
+    for query in queries:
+        best = brute_force_distance(stored, query)
+        for radius in (0, 1, 3, 4, 6, 7, 8, 11, 12):
+            found = index.nearest(query, radius)
+            if best > radius:
+                assert found is None
+            else:
+                value, distance = found
+                assert distance == best
+                assert bin(value ^ query).count('1') == best
+                assert value in index
+
+
+def test_pending_and_merged_hashes_are_both_searched(monkeypatch):
+    monkeypatch.setattr(hamming_index, 'MAX_PENDING', 4)
+    index = HammingIndex()
+    index.add_many([0x0F0F0F0F0F0F0F0F, 0xFFFF000000000000, 0x1234, 0xFFFFFFFFFFFFFFFF, 0x8000000000000000])
+    assert index._pending == []
+    index.add(0x00000000FFFF0000)
+    assert len(index._pending) == 1
+
+    assert index.nearest(0x00000000FFFF0001, 1) == (0x00000000FFFF0000, 1)
+    assert index.nearest(0xFFFF000000000003, 2) == (0xFFFF000000000000, 2)
+    assert index.nearest(0x5555555555555555, 6) is None
+
+
+def test_load_hash_file(tmp_path):
+    text = tmp_path / 'fakes.txt'
+    text.write_text('# stock images\nffff0000ffff0000\n\n0123456789abcdef  # watermark\n')
+    assert load_hash_file(str(text)).tolist() == [0xffff0000ffff0000, 0x0123456789abcdef]
+
+    index = HammingIndex()
+    index.add_many(load_hash_file(str(text)))
+    index.save(str(tmp_path / 'fakes.npy'))
+    assert sorted(load_hash_file(str(tmp_path / 'fakes.npy')).tolist()) == \
+        sorted([0xffff0000ffff0000, 0x0123456789abcdef])
+
+
+def test_checker_version_changes_when_fakes_are_added():
+    checker = AuthenticityChecker()
+    before = checker.version
+    checker.add_known_fake_hashes([0xffff0000ffff0000])
+    assert checker.version != before
+    after = checker.version
+    checker.add_known_fake_hashes([0xffff0000ffff0000])
+    assert checker.version == after
@@ -0,0 +1,41 @@
+import imagehash
+import numpy as np
+import pytest
+from PIL import Image
+
+from hash_utils import HASH_BITS, hamming_distances, hash_similarities, pack_hash
+
+
+@pytest.fixture(scope='module')
+def image_hashes():
+    rng = np.random.default_rng(3)
+    hashes = []
+    for _ in range(60):
+        pixels = rng.integers(0, 256, size=(32, 32, 3), dtype=np.uint8)
+        hashes.append(imagehash.average_hash(Image.fromarray(pixels)))
+    # Near copies: a few bits flipped
+    for base in hashes[:20]:
+        bits = base.hash.copy()
+        flips = rng.choice(bits.size, size=rng.integers(1, 6), replace=False)
+        bits.flat[flips] = ~bits.flat[flips]
+        hashes.append(imagehash.ImageHash(bits))
+    return hashes
+
+
+def test_pack_hash_round_trips_the_hex_form(image_hashes):
+    for img_hash in image_hashes:
+        assert pack_hash(img_hash) == int(str(img_hash), 16)
+
+
+def test_packed_distances_match_imagehash(image_hashes):
+    packed = np.array([pack_hash(h) for h in image_hashes], dtype=np.uint64)
+    for query, query_packed in zip(image_hashes, packed.tolist()):
+        expected = [query - other for other in image_hashes]
+        assert hamming_distances(query_packed, packed).tolist() == expected
+        np.testing.assert_allclose(
+            hash_similarities(query_packed, packed), 1.0 - np.array(expected) / HASH_BITS
+        )
+
+
+def test_distance_extremes():
+    assert hamming_distances(0, np.array([0, 2 ** 64 - 1, 1 << 63], dtype=np.uint64)).tolist() == [0, 64, 1]
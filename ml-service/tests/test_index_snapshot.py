@@ -0,0 +1,113 @@
+import multiprocessing
+import os
+
+import pytest
+
+from duplicate_detector import DuplicateDetector
+from index_snapshot import (
+    SharedIndex, current_generation, journal_path, load_snapshot, replay_journal, save_snapshot
+)
+
+
+def _seed(snapshot_dir):
+    detector = DuplicateDetector()
+    detector.add_existing_issue('seed', None, 'Pothole on Main Street', 40.7128, -74.0060)
+    save_snapshot(detector, snapshot_dir)
+
+
+def _worker(snapshot_dir, commands, replies):
+    """Second process: runs commands sent by the test against its own SharedIndex"""
+    shared = SharedIndex(DuplicateDetector(), snapshot_dir)
+    shared.load()
+    for command, arg in iter(commands.get, None):
+        if command == 'insert':
+            shared.detector.add_existing_issue(arg, None, 'Broken streetlight', 40.7130, -74.0062)
+            replies.put(None)
+        elif command == 'poll':
+            shared.poll()
+            replies.put(sorted(shared.detector.id_to_row))
+        elif command == 'snapshot':
+            replies.put(shared.snapshot())
+
+
+@pytest.fixture
+def worker(tmp_path):
+    _seed(str(tmp_path))
+    context = multiprocessing.get_context('spawn')
+    commands, replies = context.Queue(), context.Queue()
+    process = context.Process(target=_worker, args=(str(tmp_path), commands, replies))
+    process.start()
+
+    def call(command, arg=None):
+        commands.put((command, arg))
+        return replies.get(timeout=60)
+
+    yield call
+    commands.put(None)
+    process.join(timeout=60)
+    assert process.exitcode == 0
+
+
+def test_journal_is_replayed_on_load(tmp_path):
+    _seed(str(tmp_path))
+    detector = DuplicateDetector()
+    load_snapshot(detector, str(tmp_path))
+    detector.add_existing_issue('added', None, 'Water leak', 40.7129, -74.0061)
+    detector.remove_issue('seed')
+    detector.journal.close()
+
+    reloaded = DuplicateDetector()
+    info = load_snapshot(reloaded, str(tmp_path), journal=False)
+    assert info['snapshot_issues'] == 1
+    assert info['journal_entries'] == 2
+    assert sorted(reloaded.id_to_row) == ['added']
+
+
+def test_processes_see_each_others_inserts_and_snapshots(tmp_path, worker):
+    shared = SharedIndex(DuplicateDetector(), str(tmp_path))
+    shared.load()
+
+    worker('insert', 'from-worker')
+    shared.detector.add_existing_issue('from-test', None, 'Graffiti on wall', 40.7127, -74.0059)
+    assert shared.poll() == 1
+    assert sorted(shared.detector.id_to_row) == ['from-test', 'from-worker', 'seed']
+    assert worker('poll') == ['from-test', 'from-worker', 'seed']
+
+    generation = worker('snapshot')
+    assert generation == shared.generation + 1
+    shared.poll()
+    assert shared.generation == generation
+    assert shared.reloads == 1
+    assert sorted(shared.detector.id_to_row) == ['from-test', 'from-worker', 'seed']
+
+    # Both now append to the new generation's journal
+    shared.detector.add_existing_issue('after-snapshot', None, 'Trash overflow', 40.7126, -74.0058)
+    assert 'after-snapshot' in worker('poll')
+
+
+def test_torn_last_journal_line(tmp_path):
+    _seed(str(tmp_path))
+    detector = DuplicateDetector()
+    load_snapshot(detector, str(tmp_path))
+    detector.add_existing_issue('complete', None, 'Water leak', 40.7129, -74.0061)
+    detector.journal.close()
+    path = journal_path(str(tmp_path), current_generation(str(tmp_path)))
+    complete_size = os.path.getsize(path)
+    with open(path, 'ab') as f:
+        f.write(b'{"op": "insert", "id": "torn", "lati')
+
+    # While writers may still be appending the partial line is left alone
+    applied, offset = replay_journal(DuplicateDetector(), path, writers_done=False)
+    assert (applied, offset) == (1, complete_size)
+
+    # On load it is a crash leftover: skipped, and terminated so appends stay readable
+    reloaded = DuplicateDetector()
+    info = load_snapshot(reloaded, str(tmp_path))
+    assert info['journal_entries'] == 1
+    assert sorted(reloaded.id_to_row) == ['complete', 'seed']
+    reloaded.add_existing_issue('appended', None, 'Fallen tree', 40.7125, -74.0057)
+    reloaded.journal.close()
+
+    again = DuplicateDetector()
+    load_snapshot(again, str(tmp_path), journal=False)
+    assert sorted(again.id_to_row) == ['appended', 'complete', 'seed']
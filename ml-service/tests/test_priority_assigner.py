@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from priority_assigner import PriorityAssigner
+
+
+@pytest.fixture
+def assigner():
+    return PriorityAssigner()
+
+
+@pytest.mark.parametrize('description, bonus', [
+    ('Pothole next to the park', 1),
+    ('Broken swings in two PARKS', 1),
+    ('Flooded parking lot', 0),
+    ('Streetlight out near the churches', 1),
+    ('Glass in the schoolyard', 0),
+    ('Garbage behind the preschooler drop-off', 0),
+    ('Leak outside the nursing   home', 1),
+    ('Leak outside the nursing\nhomes', 1),
+    ('Nursing staff parking', 0),
+    ('', 0),
+    (None, 0),
+])
+def test_keywords_match_whole_words(assigner, description, bonus):
+    assert assigner.sensitivity_bonus(description) == bonus
+
+
+def test_custom_levels_take_the_largest_match():
+    assigner = PriorityAssigner(rules={'sensitive_keywords': {'hospital': 2, 'park': 1, 'Fire  Station': 3}})
+    assert assigner.sensitivity_bonus('park by the hospital') == 2
+    assert assigner.sensitivity_bonus('fire station next to the park') == 3
+    assert assigner.sensitivity_bonus('school') == 0
+    assert PriorityAssigner(rules={'sensitive_keywords': {}}).sensitivity_bonus('hospital') == 0
+
+
+def test_batch_bonuses_match_single_items(assigner):
+    descriptions = [
+        'Pothole next to the park', None, '', 'Flooded parking lot', 'Leak at the clinic\0hospital',
+        'İstanbul Street school', 'ǅ İİ near the church', 'nursing\thomes', 'hospitals and schools',
+        'Plain garbage', 'PARK'
+    ]
+    expected = [assigner.sensitivity_bonus(description) for description in descriptions]
+    assert assigner.sensitivity_bonuses(descriptions).tolist() == expected
+    # The same, without the NUL fallback
+    clean = [description for description in descriptions if not description or '\0' not in description]
+    assert assigner.sensitivity_bonuses(clean).tolist() == \
+        [assigner.sensitivity_bonus(description) for description in clean]
+    assert assigner.sensitivity_bonuses([]).tolist() == []
+
+
+def test_batch_priorities_match_single_items(assigner):
+    rng = np.random.default_rng(0)
+    categories = ['Sewer Overflow', 'Water Leakage', 'Garbage Issue', 'Street Light Failure', 'Unknown']
+    words = ['pothole', 'park', 'parking', 'hospital', 'school', 'road', 'nursing home', 'leak']
+    n = 300
+    batch = {
+        'categories': rng.choice(categories, size=n).tolist(),
+        'descriptions': [' '.join(rng.choice(words, size=3)) for _ in range(n)],
+        'latitudes': (40.7128 + rng.uniform(-0.002, 0.002, size=n)).tolist(),
+        'longitudes': (-74.0060 + rng.uniform(-0.002, 0.002, size=n)).tolist(),
+        'is_duplicate': (rng.random(n) < 0.2).tolist(),
+    }
+    batch['latitudes'][0] = None
+    assigner.record_reports(
+        40.7128 + rng.uniform(-0.002, 0.002, size=40), -74.0060 + rng.uniform(-0.002, 0.002, size=40)
+    )
+
+    expected = [
+        assigner.assign_priority(*issue)
+        for issue in zip(batch['categories'], batch['descriptions'], batch['latitudes'],
+                         batch['longitudes'], batch['is_duplicate'])
+    ]
+    assert assigner.assign_priorities(**batch) == expected
+    assert len(set(expected)) > 1
@@ -0,0 +1,103 @@
+import pytest
+
+from duplicate_detector import DuplicateDetector
+from region_index import RegionalDuplicateIndex
+
+NEW_YORK = (40.7128, -74.0060)
+LONDON = (51.5074, -0.1278)
+PARIS = (48.8566, 2.3522)
+DESCRIPTION = 'Large pothole in the middle of the road'
+
+
+@pytest.fixture
+def open_index(tmp_path):
+    def open_index(load=True):
+        index = RegionalDuplicateIndex(str(tmp_path), DuplicateDetector)
+        if load:
+            index.load()
+        return index
+    return open_index
+
+
+def match(index, location):
+    """Id of the best text match at location (no image, so never a duplicate)"""
+    return index.check_duplicate(None, DESCRIPTION, *location)[1]
+
+
+def test_reopen_keeps_every_region(open_index):
+    index = open_index(load=False)
+    index.add_existing_issue(1, None, DESCRIPTION, *NEW_YORK)
+    index.add_existing_issue(2, None, DESCRIPTION, *LONDON)
+    index.snapshot()
+
+    reopened = open_index()
+    assert reopened.issue_count == 2
+    assert reopened.stats()['loaded'] == []  # shards load on first use
+    assert match(reopened, NEW_YORK) == 1
+    assert match(reopened, LONDON) == 2
+
+    reported = []
+    reopened.watch_inserts(lambda lats, lons, created: reported.extend(zip(lats, lons)))
+    assert sorted(reported) == sorted([NEW_YORK, LONDON])
+
+
+def test_reregistration_in_another_region_after_reopen(open_index):
+    index = open_index(load=False)
+    index.add_existing_issue(1, None, DESCRIPTION, *NEW_YORK)
+    index.snapshot()
+
+    # The New York shard is not loaded when the id shows up in London
+    reopened = open_index()
+    reported = []
+    reopened.watch_inserts(lambda lats, lons, created: reported.extend(zip(lats, lons)))
+    reopened.add_existing_issue(1, None, DESCRIPTION, *LONDON)
+    assert reopened.issue_count == 1
+    assert match(reopened, NEW_YORK) is None
+    assert match(reopened, LONDON) == 1
+    assert reported == [NEW_YORK]  # seeded once, the re-registration is not a new report
+    reopened.snapshot()
+
+    again = open_index()
+    assert again.issue_count == 1
+    assert match(again, NEW_YORK) is None
+    assert match(again, LONDON) == 1
+
+
+def test_move_between_regions(open_index):
+    index = open_index(load=False)
+    index.add_existing_issue(1, None, DESCRIPTION, *NEW_YORK)
+    index.add_existing_issue(2, None, DESCRIPTION, *NEW_YORK)
+    reported = []
+    index.watch_inserts(lambda lats, lons, created: reported.extend(zip(lats, lons)))
+
+    assert index.update_issue(1, latitude=PARIS[0], longitude=PARIS[1])
+    assert index.issue_count == 2
+    assert match(index, PARIS) == 1
+    assert match(index, NEW_YORK) == 2
+    assert reported == [NEW_YORK, NEW_YORK]  # moves are not reported
+    index.snapshot()
+
+    reopened = open_index()
+    assert reopened.issue_count == 2
+    assert match(reopened, PARIS) == 1
+    assert match(reopened, NEW_YORK) == 2
+    assert reopened.remove_issue(1)
+    assert reopened.issue_count == 1
+    assert match(reopened, PARIS) is None
+
+
+def test_changes_survive_reopen_without_snapshot(open_index):
+    index = open_index(load=False)
+    index.add_existing_issue(1, None, DESCRIPTION, *NEW_YORK)
+    index.snapshot()
+
+    # Journaled only: shard and region map changes are replayed on load
+    reopened = open_index()
+    reopened.add_existing_issue(1, None, DESCRIPTION, *LONDON)
+    reopened.add_existing_issue(2, None, DESCRIPTION, *PARIS)
+
+    again = open_index()
+    assert again.issue_count == 2
+    assert match(again, NEW_YORK) is None
+    assert match(again, LONDON) == 1
+    assert match(again, PARIS) == 2
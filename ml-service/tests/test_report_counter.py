@@ -0,0 +1,97 @@
+import math
+
+import numpy as np
+import pytest
+
+import report_counter
+from report_counter import RepeatReportCounter
+
+DAY = 86400.0
+
+
+class BruteForceCounter:
+    """Every report kept, the window recomputed from scratch on each count"""
+    def __init__(self, counter):
+        self.counter = counter
+        self.reports = []  # (row, col, bucket)
+
+    def record(self, latitude, longitude, timestamp, now):
+        bucket = min(self.counter._bucket(timestamp), self.counter._bucket(now))
+        self.reports.append((*self.counter._cell(latitude, longitude), bucket))
+
+    def count(self, latitude, longitude, now):
+        current = self.counter._bucket(now)
+        row, col = self.counter._cell(latitude, longitude)
+        lon_cells = self.counter.lon_cells
+        return sum(
+            1 for r, c, bucket in self.reports
+            if abs(r - row) <= 1 and min((c - col) % lon_cells, (col - c) % lon_cells) <= 1
+            and current - self.counter.buckets < bucket <= current
+        )
+
+
+def test_counts_match_brute_force():
+    rng = np.random.default_rng(0)
+    counter = RepeatReportCounter(cell_size_meters=100, window_seconds=30 * DAY)
+    reference = BruteForceCounter(counter)
+    # A ~500 m square, so cells and their neighbours are shared, plus the antimeridian
+    centers = [(40.7128, -74.0060), (-16.5, 179.9995)]
+    now = 1_700_000_000.0
+
+    for step in range(60):
+        now += rng.uniform(0, 2 * DAY)
+        latitude, longitude = centers[step % 2]
+        latitudes = latitude + rng.uniform(-0.0025, 0.0025, size=20)
+        longitudes = (longitude + rng.uniform(-0.0025, 0.0025, size=20) + 180.0) % 360.0 - 180.0
+        # Mostly recent reports, some already outside the window, a few from the future
+        timestamps = now - rng.uniform(-DAY, 40 * DAY, size=20)
+        if step % 3:
+            counter.record_many(latitudes, longitudes, timestamps, now=now)
+        else:
+            for values in zip(latitudes, longitudes, timestamps):
+                counter.record(*values, now=now)
+        for values in zip(latitudes, longitudes, timestamps):
+            reference.record(*values, now=now)
+
+        for latitude, longitude in zip(latitudes[:5], longitudes[:5]):
+            assert counter.count(latitude, longitude, now=now) == reference.count(latitude, longitude, now)
+
+
+@pytest.mark.parametrize('dense_ratio', [0, 10 ** 6])
+def test_count_many_matches_count(dense_ratio, monkeypatch):
+    # Dictionary lookups per cell, or one searchsorted pass over every cell
+    monkeypatch.setattr(report_counter, 'DENSE_COUNT_RATIO', dense_ratio)
+    rng = np.random.default_rng(1)
+    counter = RepeatReportCounter(cell_size_meters=100, window_seconds=30 * DAY)
+    now = 1_700_000_000.0
+    counter.record_many(
+        40.7128 + rng.uniform(-0.01, 0.01, size=2000), -74.0060 + rng.uniform(-0.01, 0.01, size=2000),
+        now - rng.uniform(0, 40 * DAY, size=2000), now=now
+    )
+    latitudes = 40.7128 + rng.uniform(-0.012, 0.012, size=500)
+    longitudes = -74.0060 + rng.uniform(-0.012, 0.012, size=500)
+    later = now + 5 * DAY
+    expected = [counter.count(latitude, longitude, now=later) for latitude, longitude in zip(latitudes, longitudes)]
+    assert counter.count_many(latitudes, longitudes, now=later).tolist() == expected
+    assert counter.count_many([], [], now=later).tolist() == []
+
+
+def test_reports_expire_after_the_window():
+    counter = RepeatReportCounter(cell_size_meters=100, window_seconds=30 * DAY)
+    start = 1_700_000_000.0
+    counter.record(40.7128, -74.0060, timestamp=start, now=start)
+    assert counter.count(40.7128, -74.0060, now=start + 29 * DAY) == 1
+    assert counter.count(40.7128, -74.0060, now=start + 31 * DAY) == 0
+    assert counter.prune(now=start + 31 * DAY) == 1
+    assert len(counter) == 0
+
+
+def test_neighbour_cells_count_but_not_farther_ones():
+    counter = RepeatReportCounter(cell_size_meters=100)
+    now = 1_700_000_000.0
+    step = counter.cell_size_deg
+    row_center = (math.floor((40.7128 + 90.0) / step) + 0.5) * step - 90.0
+    counter.record(row_center, -74.0060, now=now)
+    assert counter.count(row_center + step, -74.0060, now=now) == 1
+    assert counter.count(row_center - step, -74.0060, now=now) == 1
+    assert counter.count(row_center + 2 * step, -74.0060, now=now) == 0
@@ -0,0 +1,109 @@
+import asyncio
+
+from result_cache import PredictionCache, prediction_key
+
+
+def test_key_ignores_case_whitespace_and_coordinate_noise():
+    assert prediction_key('abc', '  Pothole   on MAIN st ', 40.7128001, -74.0060004) == \
+        prediction_key('abc', 'pothole on main st', 40.7128, -74.006)
+    assert prediction_key('abc', 'pothole', 40.7128, -74.006) != \
+        prediction_key('abc', 'pothole', 40.7129, -74.006)
+
+
+def test_result_is_dropped_when_the_version_changes():
+    cache = PredictionCache(ttl_seconds=60)
+    cache.put('key', 1, 'result')
+    assert cache.get('key', 1) == 'result'
+    assert cache.get('key', 2) is None
+    assert cache.invalidated == 1
+    # The stale entry is gone, not just hidden
+    assert cache.get('key', 1) is None
+
+
+def test_results_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('result_cache.time.monotonic', lambda: now[0])
+    cache = PredictionCache(ttl_seconds=30)
+    cache.put('key', 1, 'result')
+    now[0] += 29
+    assert cache.get('key', 1) == 'result'
+    now[0] += 2
+    assert cache.get('key', 1) is None
+    assert cache.invalidated == 0
+
+
+def test_identical_requests_share_one_computation():
+    async def scenario():
+        cache = PredictionCache(ttl_seconds=60)
+        release = asyncio.Event()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await release.wait()
+            return {'category': 'Garbage Issue'}
+
+        waiting = [asyncio.ensure_future(cache.get_or_compute('key', 1, compute)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiting)
+
+        assert len(calls) == 1
+        assert results == [
+            ({'category': 'Garbage Issue'}, 'miss'),
+            ({'category': 'Garbage Issue'}, 'coalesced'),
+            ({'category': 'Garbage Issue'}, 'coalesced')
+        ]
+        assert (cache.misses, cache.coalesced, cache.hits) == (1, 2, 0)
+
+        # Finished: answered from the cache, but not for another version
+        assert await cache.get_or_compute('key', 1, compute) == ({'category': 'Garbage Issue'}, 'hit')
+        assert cache.hits == 1
+        assert (await cache.get_or_compute('key', 2, compute))[1] == 'miss'
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
+
+
+def test_failures_are_shared_but_not_cached():
+    async def scenario():
+        cache = PredictionCache(ttl_seconds=60)
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0)
+            raise RuntimeError('model failed')
+
+        results = await asyncio.gather(
+            cache.get_or_compute('key', 1, compute), cache.get_or_compute('key', 1, compute),
+            return_exceptions=True
+        )
+        assert [type(result) for result in results] == [RuntimeError, RuntimeError]
+        assert len(calls) == 1
+        assert cache.stats()['in_flight'] == 0
+
+        await asyncio.gather(cache.get_or_compute('key', 1, compute), return_exceptions=True)
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    async def scenario():
+        cache = PredictionCache(ttl_seconds=60)
+        release = asyncio.Event()
+
+        async def compute():
+            await release.wait()
+            return 'result'
+
+        first = asyncio.ensure_future(cache.get_or_compute('key', 1, compute))
+        second = asyncio.ensure_future(cache.get_or_compute('key', 1, compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+        assert await second == ('result', 'coalesced')
+        assert cache.get('key', 1) == 'result'
+
+    asyncio.run(scenario())
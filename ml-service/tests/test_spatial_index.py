@@ -0,0 +1,93 @@
+import math
+import random
+
+import pytest
+from geopy.distance import geodesic
+
+from spatial_index import SpatialIndex
+
+RADIUS = 100
+# Same slack DuplicateDetector queries the index with
+SLACK = 1.01
+
+CENTERS = [
+    (40.7128, -74.0060),  # New York
+    (-33.8688, 151.2093),  # Sydney
+    (0.0, 179.9995),       # on the antimeridian
+    (64.1466, -21.9426),   # high latitude (narrow longitude cells)
+]
+
+
+def linear_scan(points, latitude, longitude, radius):
+    """Reference: geodesic distance to every point (0.01 degrees of latitude is over 1 km)"""
+    return sorted(
+        key for key, (lat, lon) in points.items()
+        if abs(lat - latitude) < 0.01 and geodesic((latitude, longitude), (lat, lon)).meters <= radius
+    )
+
+
+def grid_query(index, points, latitude, longitude, radius):
+    """The index with DuplicateDetector's slack, then the exact geodesic check"""
+    return sorted(
+        key for key, _ in index.query(latitude, longitude, radius * SLACK)
+        if geodesic((latitude, longitude), points[key]).meters <= radius
+    )
+
+
+def scatter(rng, center, count, spread_meters):
+    lat, lon = center
+    points = []
+    for _ in range(count):
+        dlat = rng.uniform(-spread_meters, spread_meters) / 111320.0
+        point_lat = lat + dlat
+        meters_per_degree_lon = 111320.0 * max(0.01, math.cos(math.radians(point_lat)))
+        dlon = rng.uniform(-spread_meters, spread_meters) / meters_per_degree_lon
+        point_lon = (lon + dlon + 180.0) % 360.0 - 180.0
+        points.append((point_lat, point_lon))
+    return points
+
+
+@pytest.fixture
+def populated():
+    rng = random.Random(7)
+    index = SpatialIndex(cell_size_meters=RADIUS)
+    points = {}
+    for center in CENTERS:
+        for lat, lon in scatter(rng, center, 200, 400):
+            key = len(points)
+            points[key] = (lat, lon)
+            index.insert(key, lat, lon)
+    return rng, index, points
+
+
+def test_query_matches_linear_geodesic_scan(populated):
+    rng, index, points = populated
+    for center in CENTERS:
+        for lat, lon in scatter(rng, center, 25, 300):
+            assert grid_query(index, points, lat, lon, RADIUS) == linear_scan(points, lat, lon, RADIUS)
+
+
+def test_query_after_removals_and_moves(populated):
+    rng, index, points = populated
+    keys = sorted(points)
+    for key in keys[::3]:
+        assert index.remove(key)
+        del points[key]
+    assert not index.remove(keys[0])
+    for key in keys[1::6]:
+        # Re-inserting a key moves it
+        lat, lon = scatter(rng, CENTERS[0], 1, 400)[0]
+        points[key] = (lat, lon)
+        index.insert(key, lat, lon)
+    assert len(index) == len(points)
+
+    for center in CENTERS:
+        for lat, lon in scatter(rng, center, 25, 300):
+            assert grid_query(index, points, lat, lon, RADIUS) == linear_scan(points, lat, lon, RADIUS)
+
+
+def test_reported_distances_are_close_to_geodesic(populated):
+    _, index, points = populated
+    lat, lon = CENTERS[0]
+    for key, distance in index.query(lat, lon, 3 * RADIUS):
+        assert distance == pytest.approx(geodesic((lat, lon), points[key]).meters, rel=0.005)
@@ -5,33 +5,105 @@ Training script for ML models
 import sys
 import os
 import json
+import argparse
 
 # Add app directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
 
-from utils.generate_dataset import generate_dataset
-from app.category_predictor import CategoryPredictor
+from utils.generate_dataset import generate_dataset, read_jsonl
+from app.category_predictor import (
+    CategoryPredictor, COMPILED_FOREST_DIR, IMAGE_FEATURES, IMAGE_FEATURE_VERSION
+)
+from app.compiled_forest import compare_with_sklearn
+from app.feature_store import FeatureStore
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the civic issue ML models")
+    parser.add_argument('--samples', type=int, default=25,
+                        help="Number of dummy samples to generate")
+    parser.add_argument('--dataset', default=None,
+                        help="Train on an existing dataset (.json or .jsonl) instead of generating one")
+    parser.add_argument('--jobs', type=int, default=-1,
+                        help="Worker processes for feature extraction and training (-1 = all cores)")
+    parser.add_argument('--feature-store', default=os.path.join('data', 'feature_store'),
+                        help="Directory of cached image features ('' to disable)")
+    parser.add_argument('--online', action='store_true',
+                        help="Also train the online model (models/online) on the dataset, "
+                             "continuing from its newest checkpoint (it still needs "
+                             "ONLINE_MIN_SAMPLES confirmed labels before it serves)")
+    parser.add_argument('--online-epochs', type=int, default=5,
+                        help="Passes over the dataset for --online")
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
+    
     print("=" * 60)
     print("CIVIC ISSUE ML MODEL TRAINING")
     print("=" * 60)
     
-    # Step 1: Generate dummy dataset
-    print("\n📊 Step 1: Generating dummy dataset...")
-    dataset = generate_dataset(num_samples=25, output_dir='data')
+    # Step 1: Generate dummy dataset (or load an existing one)
+    if args.dataset:
+        print(f"\n📊 Step 1: Loading dataset from {args.dataset}...")
+        if args.dataset.endswith('.jsonl'):
+            dataset = list(read_jsonl(args.dataset))
+        else:
+            with open(args.dataset, 'r') as f:
+                dataset = json.load(f)
+    else:
+        print("\n📊 Step 1: Generating dummy dataset...")
+        dataset = generate_dataset(num_samples=args.samples, output_dir='data')
     
     # Step 2: Train category prediction model
     print("\n🤖 Step 2: Training category prediction model...")
+    feature_store = FeatureStore(args.feature_store, IMAGE_FEATURE_VERSION, IMAGE_FEATURES) \
+        if args.feature_store else None
     predictor = CategoryPredictor()
-    predictor.train(dataset)
+    predictor.train(dataset, n_jobs=args.jobs, feature_store=feature_store)
     
     # Step 3: Save model
     print("\n💾 Step 3: Saving trained model...")
     predictor.save('models')
     
-    # Step 4: Test prediction
-    print("\n🧪 Step 4: Testing model...")
+    if args.online:
+        print("\n📈 Step 3b: Training online model...")
+        online = predictor.enable_online_learning(os.path.join('models', 'online'))
+        version = online.learn(
+            predictor.extract_image_features_parallel(
+                [record['imageURL'].replace('file://', '') for record in dataset], args.jobs, feature_store
+            ),
+            [record['description'] for record in dataset],
+            [record['category'] for record in dataset],
+            epochs=args.online_epochs,
+            feedback=False  # seeding does not count towards ONLINE_MIN_SAMPLES
+        )
+        print(f"✅ Online model version {version} ({online.samples} samples)")
+    
+    # Step 4: Check the compiled (serving) forest against sklearn
+    print("\n⚡ Step 4: Checking compiled forest...")
+    features = predictor.combine_features_batch(
+        [record['imageURL'].replace('file://', '') for record in dataset],
+        [record['description'] for record in dataset]
+    )
+    report = compare_with_sklearn(
+        os.path.join('models', 'category_model.pkl'),
+        os.path.join('models', COMPILED_FOREST_DIR),
+        features
+    )
+    memory = report['memory_bytes']
+    print(f"  - Max probability difference: {report['max_abs_proba_diff']:.2e}")
+    print(f"  - Labels match sklearn: {report['labels_match']}")
+    print(f"  - Load time: sklearn {report['load_seconds']['sklearn'] * 1000:.1f} ms, "
+          f"compiled {report['load_seconds']['compiled'] * 1000:.1f} ms")
+    print(f"  - Predict time ({report['samples']} rows): "
+          f"sklearn {report['predict_seconds']['sklearn'] * 1000:.1f} ms, "
+          f"compiled {report['predict_seconds']['compiled'] * 1000:.1f} ms")
+    print(f"  - Memory: pickle {memory['sklearn_pickle_file'] / 1024:.0f} KB, "
+          f"sklearn trees {memory['sklearn_tree_arrays'] / 1024:.0f} KB, "
+          f"compiled {memory['compiled_arrays'] / 1024:.0f} KB")
+    
+    # Step 5: Test prediction
+    print("\n🧪 Step 5: Testing model...")
     test_sample = dataset[0]
     img_path = test_sample['imageURL'].replace('file://', '')
     category, confidence = predictor.predict(img_path, test_sample['description'])
@@ -3,11 +3,17 @@ Generate dummy dataset for ML model training
 """
 import os
 import json
+import math
 import random
+import shutil
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 import piexif
+import imagehash
 
 # Categories
 CATEGORIES = [
@@ -64,7 +70,26 @@ LOCATIONS = [
     (26.715791, 83.421169),   # Gorakhpur
 ]
 
-def generate_synthetic_image(category, index, output_dir):
+# Variations appended to descriptions
+VARIATIONS = ["", " Please fix urgently", " Reported by citizen", " Needs immediate attention"]
+
+METERS_PER_DEGREE = 111320.0
+
+def random_location(spread_degrees=0.1, rng=random):
+    """Random point within spread_degrees of one of the sample cities"""
+    lat, lng = rng.choice(LOCATIONS)
+    lat += rng.uniform(-spread_degrees, spread_degrees)
+    lng += rng.uniform(-spread_degrees, spread_degrees)
+    return lat, lng
+
+def offset_location(lat, lng, sigma_meters, rng=random):
+    """Point scattered around (lat, lng) with a Gaussian of sigma_meters"""
+    lat += rng.gauss(0, sigma_meters) / METERS_PER_DEGREE
+    lng += rng.gauss(0, sigma_meters) / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+    return lat, lng
+
+def generate_synthetic_image(category, index, output_dir, spread_degrees=0.1, rng=random,
+                             location=None):
     """Generate a simple synthetic image with category label"""
     # Create image with category-specific color
     colors = {
@@ -79,10 +104,10 @@ def generate_synthetic_image(category, index, output_dir):
     draw = ImageDraw.Draw(img)
     
     # Add some random shapes to simulate variety
-    for _ in range(random.randint(5, 15)):
-        x1, y1 = random.randint(0, 600), random.randint(0, 440)
-        x2, y2 = x1 + random.randint(20, 100), y1 + random.randint(20, 100)
-        shape_color = tuple(random.randint(0, 255) for _ in range(3))
+    for _ in range(rng.randint(5, 15)):
+        x1, y1 = rng.randint(0, 600), rng.randint(0, 440)
+        x2, y2 = x1 + rng.randint(20, 100), y1 + rng.randint(20, 100)
+        shape_color = tuple(rng.randint(0, 255) for _ in range(3))
         draw.rectangle([x1, y1, x2, y2], fill=shape_color)
     
     # Add text label
@@ -94,9 +119,7 @@ def generate_synthetic_image(category, index, output_dir):
     filepath = os.path.join(output_dir, filename)
     
     # Add EXIF GPS data
-    lat, lng = random.choice(LOCATIONS)
-    lat += random.uniform(-0.1, 0.1)
-    lng += random.uniform(-0.1, 0.1)
+    lat, lng = location if location is not None else random_location(spread_degrees, rng)
     
     exif_dict = {
         "GPS": {
@@ -120,13 +143,25 @@ def _convert_to_degrees(value):
     seconds = int((abs_value - degrees - minutes/60) * 3600 * 100)
     return ((degrees, 1), (minutes, 1), (seconds, 100))
 
-def generate_dataset(num_samples=25, output_dir='data'):
-    """Generate complete dummy dataset"""
+def generate_dataset(num_samples=25, output_dir='data', seed=None, image_pool=None,
+                     spread_degrees=0.1, verbose=True):
+    """
+    Generate complete dummy dataset
+    seed: makes the dataset reproducible
+    image_pool: at most this many images per category, reused by later
+        records (each record still gets its own location); lets large
+        corpora be generated without writing one image per issue
+    spread_degrees: how far issues scatter around each city (density)
+    """
+    if seed is not None:
+        random.seed(seed)
+    
     # Create output directory
     images_dir = os.path.join(output_dir, 'images')
     os.makedirs(images_dir, exist_ok=True)
     
     dataset = []
+    pool = {category: [] for category in CATEGORIES}
     
     print(f"Generating {num_samples} samples...")
     
@@ -134,15 +169,19 @@ def generate_dataset(num_samples=25, output_dir='data'):
         # Select random category
         category = random.choice(CATEGORIES)
         
-        # Generate image
-        filename, lat, lng = generate_synthetic_image(category, i, images_dir)
+        # Generate image (or reuse one from the pool)
+        if image_pool is None or len(pool[category]) < image_pool:
+            filename, lat, lng = generate_synthetic_image(category, i, images_dir, spread_degrees)
+            pool[category].append(filename)
+        else:
+            filename = random.choice(pool[category])
+            lat, lng = random_location(spread_degrees)
         
         # Select random description
         description = random.choice(DESCRIPTIONS[category])
         
         # Add some variation to description
-        variations = ["", " Please fix urgently", " Reported by citizen", " Needs immediate attention"]
-        description += random.choice(variations)
+        description += random.choice(VARIATIONS)
         
         # Create record
         record = {
@@ -156,7 +195,8 @@ def generate_dataset(num_samples=25, output_dir='data'):
         }
         
         dataset.append(record)
-        print(f"  [{i+1}/{num_samples}] Generated: {category}")
+        if verbose:
+            print(f"  [{i+1}/{num_samples}] Generated: {category}")
     
     # Save dataset to JSON
     dataset_file = os.path.join(output_dir, 'training_data.json')
@@ -176,5 +216,170 @@ def generate_dataset(num_samples=25, output_dir='data'):
     
     return dataset
 
+def make_clusters(count, seed, spread_degrees=0.1):
+    """Seeded hotspot centers around the sample cities, with Zipf-like weights"""
+    rng = random.Random(seed)
+    centers = [random_location(spread_degrees, rng) for _ in range(count)]
+    weights = [1.0 / (rank + 1) for rank in range(count)]
+    return centers, weights
+
+def _generate_shard(job):
+    """
+    Write one shard of records to its own JSONL file (process pool worker).
+    Output depends only on (seed, shard), so shards can run in any order.
+    """
+    (shard, start, count, output_dir, images_dir, seed, centers, weights,
+     cluster_radius_meters, duplicate_rate, image_pool, include_hashes, reference_time) = job
+    rng = random.Random(seed * 1000003 + shard)
+    pool = {category: [] for category in CATEGORIES}
+    # Recent records of this shard that planted duplicates can copy
+    recent = deque(maxlen=1000)
+    duplicates = 0
+    
+    shard_path = os.path.join(output_dir, f"part-{shard:05d}.jsonl")
+    with open(shard_path, 'w') as f:
+        for index in range(start, start + count):
+            if recent and rng.random() < duplicate_rate:
+                # Same image and category, a few meters away, reworded
+                original = rng.choice(recent)
+                category = original['category']
+                image_url, image_hash = original['imageURL'], original.get('imageHash')
+                lat, lng = offset_location(original['latitude'], original['longitude'], 15, rng)
+                duplicate_of = original['id']
+                duplicates += 1
+            else:
+                category = rng.choice(CATEGORIES)
+                center = rng.choices(centers, weights)[0]
+                lat, lng = offset_location(center[0], center[1], cluster_radius_meters, rng)
+                duplicate_of = None
+                
+                if image_pool is None or len(pool[category]) < image_pool:
+                    filename, _, _ = generate_synthetic_image(
+                        category, index, images_dir, rng=rng, location=(lat, lng)
+                    )
+                    image_path = os.path.abspath(os.path.join(images_dir, filename))
+                    image_hash = str(imagehash.average_hash(Image.open(image_path))) if include_hashes else None
+                    pool[category].append((image_path, image_hash))
+                else:
+                    image_path, image_hash = rng.choice(pool[category])
+                image_url = f"file://{image_path}"
+            
+            record = {
+                "id": index + 1,
+                "imageURL": image_url,
+                "description": rng.choice(DESCRIPTIONS[category]) + rng.choice(VARIATIONS),
+                "latitude": lat,
+                "longitude": lng,
+                "category": category,
+                "timestamp": (reference_time - timedelta(days=rng.randint(0, 30))).isoformat()
+            }
+            if image_hash is not None:
+                record["imageHash"] = image_hash
+            if duplicate_of is not None:
+                record["duplicateOf"] = duplicate_of
+            
+            f.write(json.dumps(record) + "\n")
+            recent.append(record)
+    
+    return shard, count, duplicates
+
+def generate_dataset_stream(num_samples, output_dir='data', seed=0, shard_size=10000, workers=None,
+                            clusters=500, cluster_radius_meters=200, duplicate_rate=0.05,
+                            image_pool=None, include_hashes=False, reference_time=None):
+    """
+    Generate a large dataset as newline-delimited JSON (output_dir/issues.jsonl)
+    without holding it in memory. Shards are rendered across a process pool;
+    each is seeded from (seed, shard), so the output is identical for any
+    number of workers.
+    clusters / cluster_radius_meters: issues gather around this many hotspots
+        (Gaussian spread), hotspot popularity falls off like 1/rank
+    duplicate_rate: share of records re-reporting an earlier issue of the
+        same shard (same image, ~15 m away); they carry "duplicateOf"
+    image_pool: cap on distinct images per category per shard
+    include_hashes: add the hex average_hash as "imageHash"
+    reference_time: timestamps are drawn from the 30 days before it
+        (default: today at midnight)
+    """
+    images_dir = os.path.join(output_dir, 'images')
+    shards_dir = os.path.join(output_dir, 'shards')
+    os.makedirs(images_dir, exist_ok=True)
+    os.makedirs(shards_dir, exist_ok=True)
+    
+    if reference_time is None:
+        reference_time = datetime.combine(datetime.now().date(), datetime.min.time())
+    centers, weights = make_clusters(clusters, seed)
+    
+    jobs = [
+        (shard, start, min(shard_size, num_samples - start), shards_dir, images_dir, seed,
+         centers, weights, cluster_radius_meters, duplicate_rate, image_pool, include_hashes,
+         reference_time)
+        for shard, start in enumerate(range(0, num_samples, shard_size))
+    ]
+    
+    print(f"Generating {num_samples} samples in {len(jobs)} shard(s)...")
+    output_path = os.path.join(output_dir, 'issues.jsonl')
+    done = 0
+    duplicates = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor, open(output_path, 'wb') as out:
+        # map() yields in shard order, so shards are appended as soon as
+        # every earlier one is finished
+        for shard, count, planted in executor.map(_generate_shard, jobs):
+            shard_path = os.path.join(shards_dir, f"part-{shard:05d}.jsonl")
+            with open(shard_path, 'rb') as f:
+                shutil.copyfileobj(f, out)
+            os.remove(shard_path)
+            done += count
+            duplicates += planted
+            print(f"  [{done}/{num_samples}] shard {shard} written")
+    os.rmdir(shards_dir)
+    
+    print(f"\n✅ Dataset generated successfully!")
+    print(f"   - Images: {images_dir}")
+    print(f"   - Records: {output_path}")
+    print(f"   - Total samples: {done} ({duplicates} planted duplicates)")
+    return output_path
+
+def read_jsonl(path):
+    """Iterate over the records of a newline-delimited JSON file"""
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic civic issue dataset")
+    parser.add_argument('--samples', type=int, default=25)
+    parser.add_argument('--output-dir', default='data')
+    parser.add_argument('--stream', action='store_true',
+                        help="Parallel, sharded generation to issues.jsonl")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--shard-size', type=int, default=10000)
+    parser.add_argument('--clusters', type=int, default=500)
+    parser.add_argument('--cluster-radius', type=float, default=200, help="Meters")
+    parser.add_argument('--duplicate-rate', type=float, default=0.05)
+    parser.add_argument('--image-pool', type=int, default=None,
+                        help="Reuse at most this many images per category (per shard)")
+    parser.add_argument('--hashes', action='store_true', help="Include imageHash in records")
+    parser.add_argument('--reference-date', default=None,
+                        help="ISO date timestamps are drawn before (default: today)")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    generate_dataset(num_samples=25, output_dir='data')
+    args = parse_args()
+    if args.stream:
+        generate_dataset_stream(
+            args.samples, output_dir=args.output_dir,
+            seed=args.seed if args.seed is not None else 0,
+            shard_size=args.shard_size, workers=args.workers,
+            clusters=args.clusters, cluster_radius_meters=args.cluster_radius,
+            duplicate_rate=args.duplicate_rate, image_pool=args.image_pool,
+            include_hashes=args.hashes,
+            reference_time=datetime.fromisoformat(args.reference_date) if args.reference_date else None
+        )
+    else:
+        generate_dataset(
+            num_samples=args.samples, output_dir=args.output_dir,
+            seed=args.seed, image_pool=args.image_pool
+        )